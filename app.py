@@ -1,11 +1,14 @@
 import streamlit as st
 import os
-import tempfile
+import time
+import queue
 import pandas as pd
-from src.extractors.llm_extractor import LLMExtractor
-from src.processors.whisper_engine import WhisperTranscriber
-from src.processors.vosk_engine import VoskTranscriber
-from src.processors.wav2vec_engine import Wav2VecTranscriber
+from src.extractors.registry import available_providers
+from src.processors.registry import available_engines
+from src.jobs import JobManager, DONE as JOB_DONE, ERROR as JOB_ERROR
+from src.processors.pool import ModelPool, DEFAULT_BUDGET_MB
+from src.utils import VOSK_SAMPLE_RATE
+from src.profiling import profiling_from_env, summarize_dir, span, PROFILE_DIR_ENV
 
 from dotenv import load_dotenv
 load_dotenv()
@@ -48,12 +51,12 @@ with st.expander("⚙️ Configurações do Modelo", expanded=True):
         st.markdown("**1. Transcrição de Áudio (ASR)**")
         engine_choice = st.selectbox(
             "Escolha o Modelo de Transcrição:", 
-            ["Whisper", "Wav2Vec2", "Vosk"]
+            available_engines()
         )
 
     with col_config_2:
         st.markdown("**2. Extração de Texto (LLM)**")
-        provider_choice = st.selectbox("Escolha o LLM:", ["Llama 3", "Google Gemini (gemini-2.5-flash)", "GPT-4o-mini"])
+        provider_choice = st.selectbox("Escolha o LLM:", available_providers())
         
         api_key = None
         if provider_choice == "Llama 3":
@@ -69,68 +72,143 @@ with st.expander("⚙️ Configurações do Modelo", expanded=True):
             if not api_key:
                 api_key = st.text_input("Insira sua OpenAI API Key:", type="password")
 
-model_instance = None
+        stream_extraction = st.checkbox("Mostrar as linhas da tabela conforme chegam", value=True)
 
+# Transcrições rodam em processos worker (cada um com seu pool de modelos, limitado por
+# ASR_MEMORY_BUDGET_MB e pré-carregado via ASR_PRELOAD) e extrações num pool de threads:
+# áudio longo de um usuário não trava a sessão dos demais.
 @st.cache_resource
-def load_whisper():
-    return WhisperTranscriber(model_size="base")
+def get_job_manager():
+    return JobManager(num_workers=int(os.getenv("APP_JOB_WORKERS", "2")))
 
-@st.cache_resource
-def load_wav2vec():
-    print("DEBUG: Iniciando carga do Wav2Vec2...")
-    return Wav2VecTranscriber()
+job_manager = get_job_manager()
+
+# PROFILE_DIR liga o profiling no app e nos workers (que herdam a variável de ambiente)
+profiler = profiling_from_env()
+if profiler.enabled:
+    with st.sidebar.expander("⏱️ Tempo por etapa"):
+        etapas = summarize_dir(os.environ[PROFILE_DIR_ENV])
+        if etapas:
+            st.dataframe(pd.DataFrame(etapas), hide_index=True, use_container_width=True)
+        else:
+            st.caption("Nenhuma etapa registrada ainda.")
 
+# A transcrição ao vivo precisa da engine no próprio processo do app (o áudio chega
+# frame a frame pelo navegador); o pool é separado do dos workers e, por padrão, menor.
 @st.cache_resource
-def load_vosk():
-    return VoskTranscriber(model_path="models/vosk-model-small-pt-0.3")
-
-try:
-    if engine_choice == "Whisper":
-        with st.spinner("Carregando Whisper na memória..."):
-            model_instance = load_whisper()
-    elif "Wav2Vec2" in engine_choice: 
-        with st.spinner("Carregando Wav2Vec2 na memória..."):
-            model_instance = load_wav2vec()
-    elif engine_choice == "Vosk":
-        with st.spinner("Carregando Vosk na memória..."):
-            model_instance = load_vosk()
-except Exception as e:
-    st.error(f"Erro crítico ao carregar modelo: {e}")
+def get_live_pool():
+    return ModelPool(budget_mb=float(os.getenv("ASR_LIVE_BUDGET_MB", DEFAULT_BUDGET_MB / 2)))
+
+residentes = [
+    f"{m['name']} ({m['bytes'] / 1024**2:.0f} MB)"
+    for loaded in job_manager.loaded_models().values()
+    for m in loaded
+]
+if residentes:
+    st.caption(f"Modelos em memória nos workers: {', '.join(residentes)}")
 
 st.divider()
 
+for chave in ("transcribed_text", "transcription_job", "extraction_job", "extraction_data", "live_text"):
+    if chave not in st.session_state:
+        st.session_state[chave] = None
+
+# Algum job desta sessão ainda em andamento: a página se atualiza sozinha até terminar
+aguardando = False
+
+COLUNAS_QA = {
+    "pergunta": st.column_config.TextColumn("Pergunta", width="medium"),
+    "resposta": st.column_config.TextColumn("Resposta", width="large"),
+    "categoria": st.column_config.TextColumn("Tag", width="small"),
+    "citacao_exata": st.column_config.TextColumn("Evidência (Fonte)", width="large")
+}
+
 def mostrar_processamento_audio(audio_file_input):
     """
     Renderiza o player de áudio e o botão de transcrição.
     """
-    if model_instance is None:
-        st.error("O modelo de transcrição não foi carregado!")
-        st.info("Verifique se você baixou a pasta do Vosk corretamente em 'models/' ou se o Whisper instalou.")
-        return 
-
     st.audio(audio_file_input)
+
+    auto_extract = st.checkbox(
+        "Extrair a tabela automaticamente ao fim da transcrição",
+        key=f"auto_{audio_file_input.name}",
+    )
     
     if st.button("Iniciar Transcrição", key=f"btn_{audio_file_input.name}", type="primary"):
-        with st.spinner(f"Processando com {engine_choice}..."):
-            try:
-                with tempfile.NamedTemporaryFile(delete=False, suffix=".tmp") as tmp_file:
-                    tmp_file.write(audio_file_input.getvalue())
-                    tmp_path = tmp_file.name
-
-                text = model_instance.transcribe(tmp_path)
-                
-                st.session_state.transcribed_text = text
-                os.remove(tmp_path)
+        extract = None
+        if auto_extract:
+            if api_key:
+                extract = {"provider": provider_choice, "api_key": api_key, "stream": stream_extraction}
+            else:
+                st.warning("Sem API Key configurada: a extração não será encadeada.")
+
+        st.session_state.transcription_job = job_manager.submit_transcription(
+            engine_choice, audio_file_input.getvalue(), extract=extract
+        )
+        st.session_state.extraction_job = None
+        st.session_state.extraction_data = None
+        st.rerun()
+
+def transcrever_ao_vivo():
+    """
+    Captura o microfone via streamlit-webrtc e mostra as hipóteses enquanto são
+    reconhecidas (parciais em itálico). O texto final fica em live_text.
+    """
+    try:
+        import av
+        from streamlit_webrtc import webrtc_streamer, WebRtcMode
+    except ImportError:
+        st.info("O modo ao vivo requer o pacote streamlit-webrtc: pip install streamlit-webrtc")
+        return
+
+    ctx = webrtc_streamer(
+        key="live_asr",
+        mode=WebRtcMode.SENDONLY,
+        audio_receiver_size=512,
+        media_stream_constraints={"audio": True, "video": False},
+    )
+    placeholder = st.empty()
+
+    if not (ctx.state.playing and ctx.audio_receiver):
+        if st.session_state.live_text:
+            placeholder.container(border=True).write(st.session_state.live_text)
+            if st.button("Usar esta transcrição", type="primary"):
+                st.session_state.transcribed_text = st.session_state.live_text
+                st.session_state.extraction_data = None
                 st.rerun()
+        return
 
-            except Exception as e:
-                st.error(f"Erro: {e}")
+    resampler = av.AudioResampler(format="s16", layout="mono", rate=VOSK_SAMPLE_RATE)
 
-if "transcribed_text" not in st.session_state:
-    st.session_state.transcribed_text = None
+    def pcm_chunks():
+        while ctx.state.playing:
+            try:
+                frames = ctx.audio_receiver.get_frames(timeout=1)
+            except queue.Empty:
+                continue
+            for frame in frames:
+                with span("resample", source="webrtc"):
+                    saidas = resampler.resample(frame)
+                for out in saidas:
+                    yield out.to_ndarray().tobytes()
+
+    finais = []
+    st.session_state.live_text = ""
+    live_pool = get_live_pool()
+    # O "Auto" carrega as engines que escolhe no próprio pool do modo ao vivo (e no seu orçamento)
+    opcoes = {"pool": live_pool} if engine_choice == "Auto" else {}
+    with live_pool.lease(engine_choice, **opcoes) as engine:
+        for hyp in engine.transcribe_stream(pcm_chunks()):
+            parcial = ""
+            if hyp["final"]:
+                finais.append(hyp["text"])
+                st.session_state.live_text = " ".join(finais)
+            else:
+                parcial = hyp["text"]
+            texto = st.session_state.live_text + (f" _{parcial}_" if parcial else "")
+            placeholder.container(border=True).markdown(texto or "_Ouvindo..._")
 
 tab1, tab2, tab3 = st.tabs(["Upload de Arquivo", "Gravar Áudio", "Texto Manual"])
-audio_file = None
 
 with tab1:
     uploaded_file = st.file_uploader("Arraste seu arquivo aqui", type=["wav", "mp3", "m4a", "ogg"])
@@ -138,10 +216,17 @@ with tab1:
         mostrar_processamento_audio(uploaded_file)
 
 with tab2:
-    recorded_audio = st.audio_input("Clique para gravar")
+    modo = st.radio(
+        "Modo de gravação:", ["Gravar e transcrever", "Ao vivo (texto parcial)"], horizontal=True
+    )
+    if modo == "Gravar e transcrever":
+        recorded_audio = st.audio_input("Clique para gravar")
 
-    if recorded_audio:
-        mostrar_processamento_audio(recorded_audio)
+        if recorded_audio:
+            mostrar_processamento_audio(recorded_audio)
+    else:
+        st.caption("Vosk mostra o texto palavra a palavra; as demais engines, em blocos de ~5s.")
+        transcrever_ao_vivo()
 
 with tab3:
     st.markdown("Digite ou cole o texto aqui:")
@@ -150,32 +235,22 @@ with tab3:
     if st.button("Usar este texto", type="primary"):
         if manual_input.strip():
             st.session_state.transcribed_text = manual_input
+            st.session_state.extraction_data = None
             st.rerun()
 
-if audio_file and model_instance:
-    st.audio(audio_file)
-    
-    col_btn, col_info = st.columns([1, 4])
-    with col_btn:
-        process_btn = st.button("Iniciar Transcrição", type="primary", use_container_width=True)
-    
-    if process_btn:
-        with st.spinner(f"Processando áudio com {engine_choice}..."):
-            try:
-                with tempfile.NamedTemporaryFile(delete=False, suffix=".tmp") as tmp_file:
-                    tmp_file.write(audio_file.getvalue())
-                    tmp_path = tmp_file.name
-
-                # Transcrição
-                text = model_instance.transcribe(tmp_path)
-                
-                # Salva no estado e limpa
-                st.session_state.transcribed_text = text
-                os.remove(tmp_path)
-                st.rerun()
-
-            except Exception as e:
-                st.error(f"Erro durante o processamento: {e}")
+if st.session_state.transcription_job:
+    job = job_manager.status(st.session_state.transcription_job)
+    if job is None or job["status"] == JOB_ERROR:
+        st.error(f"Erro: {job['error'] if job else 'job não encontrado'}")
+        st.info("Verifique se você baixou a pasta do Vosk corretamente em 'models/' ou se o Whisper instalou.")
+        st.session_state.transcription_job = None
+    elif job["status"] == JOB_DONE:
+        st.session_state.transcribed_text = job["result"]
+        st.session_state.extraction_job = job["follow_up"]
+        st.session_state.transcription_job = None
+    else:
+        st.progress(job["progress"], text=f"Processando com {job['engine']}: {job['message']}")
+        aguardando = True
 
 if st.session_state.transcribed_text:
     st.divider()
@@ -183,43 +258,50 @@ if st.session_state.transcribed_text:
     st.container(border=True).write(st.session_state.transcribed_text)
 
     st.subheader("Extração de Conhecimento")
-    
+
     if st.button("Extrair Tabela de Perguntas & Respostas", type="primary"):
         if not api_key:
             st.warning("Você precisa configurar a API Key na aba de configurações (topo da página) primeiro.")
         else:
-            with st.spinner("O LLM está analisando o contexto..."):
-                try:
-                    if "Llama 3" in provider_choice:
-                        prov_str = "groq"
-                    elif "Gemini" in provider_choice:
-                        prov_str = "gemini"
-                    else:
-                        prov_str = "openai"
-                    
-                    extractor = LLMExtractor(api_key=api_key, provider=prov_str)
-                    data = extractor.extract_info(st.session_state.transcribed_text)
-                    
-                    if data:
-                        df = pd.DataFrame(data)
-                        st.success("Extração concluída!")
-                        
-                        st.dataframe(
-                            df, 
-                            use_container_width=True, 
-                            hide_index=True,
-                            column_config={
-                                "pergunta": st.column_config.TextColumn("Pergunta", width="medium"),
-                                "resposta": st.column_config.TextColumn("Resposta", width="large"),
-                                "categoria": st.column_config.TextColumn("Tag", width="small"),
-                                "citacao_exata": st.column_config.TextColumn("Evidência (Fonte)", width="large")
-                            }
-                        )
-                        
-                        csv = df.to_csv(index=False).encode('utf-8')
-                        st.download_button("Baixar CSV", csv, "extração.csv", "text/csv")
-                    else:
-                        st.info("O modelo não encontrou informações factuais suficientes para criar perguntas.")
-                        
-                except Exception as e:
-                    st.error(f"Erro na API do LLM: {e}")
\ No newline at end of file
+            st.session_state.extraction_job = job_manager.submit_extraction(
+                st.session_state.transcribed_text, provider_choice, api_key, stream=stream_extraction
+            )
+            st.session_state.extraction_data = None
+
+    if st.session_state.extraction_job:
+        job = job_manager.status(st.session_state.extraction_job)
+        if job is None or job["status"] == JOB_ERROR:
+            st.error(f"Erro na API do LLM: {job['error'] if job else 'job não encontrado'}")
+            st.session_state.extraction_job = None
+        elif job["status"] == JOB_DONE:
+            st.session_state.extraction_data = job["result"]
+            st.session_state.extraction_job = None
+        else:
+            st.progress(job["progress"], text=job["message"])
+            if job["result"]:
+                # Extração em streaming: linhas já recebidas enquanto o modelo gera as demais
+                st.dataframe(pd.DataFrame(job["result"]), use_container_width=True, hide_index=True,
+                             column_config=COLUNAS_QA)
+            aguardando = True
+
+    data = st.session_state.extraction_data
+    if data is not None:
+        if data:
+            df = pd.DataFrame(data)
+            st.success("Extração concluída!")
+            
+            st.dataframe(
+                df, 
+                use_container_width=True, 
+                hide_index=True,
+                column_config=COLUNAS_QA
+            )
+            
+            csv = df.to_csv(index=False).encode('utf-8')
+            st.download_button("Baixar CSV", csv, "extração.csv", "text/csv")
+        else:
+            st.info("O modelo não encontrou informações factuais suficientes para criar perguntas.")
+
+if aguardando:
+    time.sleep(0.5)
+    st.rerun()
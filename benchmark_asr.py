@@ -1,132 +1,464 @@
 import os
+import csv
 import time
 import argparse
+import queue
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
 import pandas as pd
-import jiwer
 import sys
-import librosa
-from bert_score import score
 import logging
-import unicodedata
-import re
 
 logging.getLogger("transformers").setLevel(logging.ERROR)
 logging.getLogger("absl").setLevel(logging.ERROR)
 
 try:
-    from src.processors.vosk_engine import VoskTranscriber
-    from src.processors.whisper_engine import WhisperTranscriber
-    from src.processors.wav2vec_engine import Wav2VecTranscriber
+    from src.processors.registry import available_engines, build_engine
+    from src.processors.cached import CachedTranscriber
+    from src.utils import format_import_report
+    from src.cache import LRUCache, DEFAULT_CACHE_DIR
+    from src.audio import load_audio
+    from src.metrics import NormalizedReference, score_pairs
+    from src.bertscore import StreamingBERTScorer
+    from src.profiling import PROFILE_DIR_ENV, enable_profiling, profiling_from_env, profiler, span, summarize_dir
+    from src.results_store import ResultsStore, DEFAULT_RESULTS_DIR
 except ImportError as e:
     print(e)
     sys.exit(1)
 
-_re_spaces = re.compile(r"\s+")
-def normalize_text_for_wer(text: str) -> str:
+def decode_audio(path):
+    """Decodifica o áudio uma única vez (float32 Mono 16kHz); None se falhar."""
+    try:
+        return load_audio(path)
+    except Exception as e:
+        print(f"\n[AVISO] Falha ao decodificar {path}: {e}")
+        return None
+
+
+RESULT_COLUMNS = ["Arquivo", "Modelo", "Referencia", "Hipotese", "WER", "CER", "RTF"]
+
+# Argumentos de cada engine no benchmark (as demais usam os padrões do registro)
+WAV2VEC_MODEL_ID = "models/wav2vec-pt-br" if os.path.exists("models/wav2vec-pt-br") else "jonatasgrosman/wav2vec2-large-xlsr-53-portuguese"
+ENGINE_OPTIONS = {
+    "Wav2Vec2": {"model_id": WAV2VEC_MODEL_ID},
+    "Wav2Vec2 (int8)": {"model_id": WAV2VEC_MODEL_ID},
+    "Wav2Vec2 (streaming)": {"model_id": WAV2VEC_MODEL_ID},
+}
+
+# Pares (fp32, quantizado) comparados lado a lado com --quantized
+QUANTIZED_PAIRS = [("Wav2Vec2", "Wav2Vec2 (int8)")]
+
+def carregar_modelos(nomes, use_cache=False, threads=None):
+    """
+    Constrói só as engines pedidas; cada uma importa suas dependências ao ser criada.
+    threads limita as threads de reconhecimento do Vosk (ex: núcleos por worker).
+    """
+    modelos = {}
+    for nome in nomes:
+        try:
+            print(f"Carregando {nome}...")
+            opcoes = dict(ENGINE_OPTIONS.get(nome, {}))
+            if nome == "Vosk" and threads:
+                opcoes["workers"] = threads
+            modelos[nome] = build_engine(nome, **opcoes)
+        except Exception as e:
+            print(f"Falha ao carregar {nome}:", e)
+
+    if use_cache:
+        cache = LRUCache(db_path=os.path.join(DEFAULT_CACHE_DIR, "transcricoes.sqlite"))
+        modelos = {nome: CachedTranscriber(engine, cache) for nome, engine in modelos.items()}
+
+    return modelos
+
+def memoria_modelos(modelos) -> dict:
+    """Bytes residentes de cada engine carregada (Transcriber.memory_footprint)."""
+    memoria = {}
+    for nome, engine in modelos.items():
+        try:
+            memoria[nome] = engine.memory_footprint()
+        except Exception:
+            pass
+    return memoria
+
+def utilizacao_threads(modelos):
+    """Utilização por thread das engines com pool de recognizers (Vosk)."""
+    linhas = []
+    for nome, engine in modelos.items():
+        engine = getattr(engine, "engine", engine)  # CachedTranscriber
+        for st in getattr(engine, "utilization", list)():
+            linhas.append({"Modelo": nome, **st})
+    return pd.DataFrame(linhas)
+
+def avaliar_lote(lote, modelos, batch_size=1):
     """
-    Normalização simples e segura para WER:
-    - converte para str, lower
-    - remove caracteres de controle
-    - remove pontuação (mantém letras e dígitos)
-    - normaliza acentuação (NFC)
-    - colapsa espaços
-    Retorna uma string pronta para passar ao jiwer.wer()
+    Roda as engines pendentes sobre um lote de (arquivo, samples, referência, duração, pendentes)
+    e retorna as linhas de resultado na ordem arquivo -> modelo.
+    Os áudios do lote são decodificados uma vez e descartados em seguida.
     """
-    if text is None:
-        return ""
-    s = str(text).lower()
-    # Normalize unicode (compose)
-    s = unicodedata.normalize("NFC", s)
-    # Remove control chars
-    s = "".join(ch for ch in s if unicodedata.category(ch)[0] != "C")
-    # Remove punctuation: category starting with 'P'
-    s = "".join(ch for ch in s if not unicodedata.category(ch).startswith("P"))
-    # Replace non-breaking spaces etc -> normal space
-    s = s.replace("\u00A0", " ")
-    # Collapse multiple spaces
-    s = _re_spaces.sub(" ", s).strip()
-    return s
-
-def normalize_text_for_cer(text: str) -> str:
+    por_item = {}
+    # Normalização feita uma vez por referência, não uma vez por (referência, engine)
+    refs_norm = [NormalizedReference(it[2]) for it in lote]
+
+    for nome, engine in modelos.items():
+        indices = [i for i, it in enumerate(lote) if nome in it[4]]
+        if not indices:
+            continue
+        sub = [lote[i] for i in indices]
+
+        try:
+            start = time.time()
+            if batch_size > 1:
+                hyps = engine.transcribe_batch([it[1] for it in sub], batch_size=batch_size)
+            else:
+                hyps = [engine.transcribe_array(it[1]) for it in sub]
+            tempo_lote = time.time() - start
+            # Em cache hits vale o tempo de inferência registrado na transcrição original
+            tempo_lote = getattr(engine, "last_inference_seconds", tempo_lote)
+        except Exception as e:
+            nomes = ", ".join(it[0] for it in sub)
+            print(f"\nErro com modelo {nome} ao processar {nomes}: {e}")
+            continue
+
+        # Tempo do lote rateado proporcionalmente à duração de cada áudio
+        duracao_lote = sum(it[3] for it in sub)
+
+        # Uma chamada ao jiwer por engine/lote; referências já normalizadas
+        hyps = ["" if hyp is None else str(hyp).strip() for hyp in hyps]
+        try:
+            with span("metrics", engine=nome):
+                scores = score_pairs([refs_norm[i] for i in indices], hyps)
+        except Exception as e:
+            print(f"\nErro calculando WER/CER para {nome}: {e}")
+            scores = {"wer": [1.0] * len(indices), "cer": [None] * len(indices)}
+
+        rtf = tempo_lote / duracao_lote
+
+        for i, hyp, wer, cer in zip(indices, hyps, scores["wer"], scores["cer"]):
+            filename, _, ref, _, _ = lote[i]
+
+            por_item[(i, nome)] = {
+                "Arquivo": filename,
+                "Modelo": nome,
+                "Referencia": ref,
+                "Hipotese": hyp,
+                "WER": wer,
+                "CER": cer,
+                "RTF": rtf
+            }
+
+    return [
+        por_item[(i, nome)]
+        for i in range(len(lote))
+        for nome in modelos
+        if (i, nome) in por_item
+    ]
+
+def processar_shard(shard, modelos, batch_size=1):
     """
-    Normalização leve para CER: lower + strip + collapse spaces + unicode normalize.
-    We keep more characters so CER is measured on characters.
+    Decodifica os arquivos de um shard de (arquivo, caminho, referência, pendentes)
+    e avalia as engines pendentes de cada um.
     """
-    if text is None:
-        return ""
-    s = str(text).lower()
-    s = unicodedata.normalize("NFC", s)
-    # Remove control chars
-    s = "".join(ch for ch in s if unicodedata.category(ch)[0] != "C")
-    # Collapse spaces
-    s = _re_spaces.sub(" ", s).strip()
-    return s
-
-def get_audio_duration(path):
-    """Retorna a duração em segundos (librosa)."""
+    lote = []
+    for filename, abs_path, ref, pendentes in shard:
+        # Mesmo buffer decodificado alimenta todas as engines e o cálculo do RTF,
+        # de modo que o tempo medido é só de inferência
+        audio = decode_audio(abs_path)
+        duracao_audio = audio.duration if audio is not None else 0.0
+        if duracao_audio <= 0:
+            print(f"\n[AVISO] Duração inválida (0): {abs_path}")
+            continue
+        lote.append((filename, audio.samples, ref, duracao_audio, pendentes))
+
+    if not lote:
+        return []
+    return avaliar_lote(lote, modelos, batch_size)
+
+# Estado de cada processo worker: uma instância de cada engine por processo
+_worker_modelos = None
+_worker_batch_size = 1
+
+def _init_worker(nomes, use_cache, batch_size, threads):
+    global _worker_modelos, _worker_batch_size
     try:
-        return float(librosa.get_duration(path=path))
-    except Exception:
-        return 0.0
+        import torch
+        # Evita que N workers disputem todos os núcleos cada um
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+    profiling_from_env()
+    _worker_modelos = carregar_modelos(nomes, use_cache, threads)
+    _worker_batch_size = batch_size
+
+def _run_shard(shard):
+    rows = processar_shard(shard, _worker_modelos, _worker_batch_size)
+    profiler.flush()
+    return rows, memoria_modelos(_worker_modelos)
+
+class ResultsWriter:
+    """
+    Anexa cada linha (Arquivo, Modelo) ao CSV parcial assim que fica pronta,
+    para que uma interrupção não perca o que já foi calculado.
+    """
 
+    def __init__(self, path):
+        self.path = path
+        novo = not os.path.exists(path) or os.path.getsize(path) == 0
+        self._file = open(path, "a", newline="", encoding="utf-8")
+        self._writer = csv.DictWriter(self._file, fieldnames=RESULT_COLUMNS)
+        if novo:
+            self._writer.writeheader()
+            self._file.flush()
+
+    def write(self, rows):
+        for row in rows:
+            self._writer.writerow(row)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        self._file.close()
+
+def pares_concluidos(path) -> set:
+    """Pares (Arquivo, Modelo) já presentes no CSV parcial."""
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return set()
+    try:
+        # Leitura completa, como a do final da execução: o que passa aqui não quebra lá
+        prev = pd.read_csv(path)
+        pares = set(zip(prev["Arquivo"].astype(str), prev["Modelo"].astype(str)))
+    except Exception as e:
+        # Novas linhas não podem ser anexadas ao arquivo ilegível: ele é posto de lado
+        backup = f"{path}.corrompido-{time.strftime('%Y%m%d-%H%M%S')}"
+        os.replace(path, backup)
+        print(f"[AVISO] CSV parcial ilegível ({e}); movido para '{backup}', recomeçando do zero.")
+        return set()
+    return pares
+
+def comparar_quantizacao(final_df):
+    """Diferença de WER/CER, speedup de RTF e redução de memória de cada par (fp32, int8)."""
+    por_modelo = final_df.set_index("Modelo")
+    linhas = []
+    for base, quant in QUANTIZED_PAIRS:
+        if base not in por_modelo.index or quant not in por_modelo.index:
+            continue
+        b, q = por_modelo.loc[base], por_modelo.loc[quant]
+        linhas.append({
+            "Modelo": f"{quant} vs {base}",
+            "ΔWER (p.p.)": (q["WER"] - b["WER"]) * 100,
+            "ΔCER (p.p.)": (q["CER"] - b["CER"]) * 100,
+            "ΔWER micro (p.p.)": (q["WER (micro)"] - b["WER (micro)"]) * 100,
+            "Speedup (RTF)": b["RTF"] / q["RTF"] if q["RTF"] else float("nan"),
+            "Memória (fp32 → int8)": f"{b['Memória (MB)']:.0f} → {q['Memória (MB)']:.0f} MB"
+            if pd.notna(b["Memória (MB)"]) and pd.notna(q["Memória (MB)"]) else "N/A",
+        })
+    return pd.DataFrame(linhas)
+
+def _latency_worker(nome, threads, paths, rank, procs, warmup, repeats, barrier, results):
+    """
+    Processo de medição de latência: carrega a engine, aquece, espera os demais no
+    barrier e só então mede. Cada processo transcreve os arquivos de índice
+    i % procs == rank, repeats vezes cada.
+    """
+    import resource
 
-def calcular_wer(ref: str, hyp: str) -> float:
-    """Calcula WER via jiwer.wer após normalização segura."""
-    if not ref or not hyp:
-        return 1.0
-    ref_n = normalize_text_for_wer(ref)
-    hyp_n = normalize_text_for_wer(hyp)
     try:
-        return float(jiwer.wer(ref_n, hyp_n))
-    except TypeError:
-        raise
-
-def calcular_cer(ref: str, hyp: str) -> float:
-    """Calcula CER via jiwer.cer após normalização leve."""
-    if not ref or not hyp:
-        return 1.0
-    ref_n = normalize_text_for_cer(ref)
-    hyp_n = normalize_text_for_cer(hyp)
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+
     try:
-        return float(jiwer.cer(ref_n, hyp_n))
-    except AttributeError:
-        ref_chars = " ".join(list(ref_n))
-        hyp_chars = " ".join(list(hyp_n))
-        return float(jiwer.wer(ref_chars, hyp_chars))
+        audios = [load_audio(path).samples for path in paths[rank::procs]]
+        start = time.perf_counter()
+        engine = build_engine(nome, **ENGINE_OPTIONS.get(nome, {}))
+        load_seconds = time.perf_counter() - start
+        for _ in range(warmup):
+            engine.transcribe_array(audios[0] if audios else np.zeros(16000, dtype=np.float32))
+    except Exception as e:
+        barrier.abort()
+        results.put({"rank": rank, "error": str(e)})
+        return
 
-def main(audio_folder, csv_path, limit):
-    if not os.path.exists(csv_path):
-        print("CSV não encontrado:", csv_path)
+    try:
+        barrier.wait()
+    except Exception:
+        results.put({"rank": rank, "error": "outro processo falhou antes da medição"})
         return
 
+    medidas = []
+    inicio = time.time()
+    try:
+        for samples in audios:
+            duracao = len(samples) / 16000
+            for _ in range(repeats):
+                t0 = time.perf_counter()
+                engine.transcribe_array(samples)
+                medidas.append((time.perf_counter() - t0, duracao))
+    except Exception as e:
+        # Sempre responde ao processo pai, que espera um resultado por rank
+        results.put({"rank": rank, "error": f"falha durante a medição: {e}"})
+        return
+    fim = time.time()
+
+    results.put({
+        "rank": rank,
+        "medidas": medidas,
+        "inicio": inicio,
+        "fim": fim,
+        "load_seconds": load_seconds,
+        "peak_rss_bytes": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+    })
+
+def medir_configuracao(nome, paths, threads, procs, warmup, repeats):
+    """Mede uma combinação (engine, threads por processo, processos) em processos novos."""
+    ctx = multiprocessing.get_context("spawn")
+    barrier = ctx.Barrier(procs)
+    results = ctx.Queue()
+    workers = [
+        ctx.Process(target=_latency_worker,
+                    args=(nome, threads, paths, rank, procs, warmup, repeats, barrier, results))
+        for rank in range(procs)
+    ]
+    for w in workers:
+        w.start()
+    saidas = {}
+    while len(saidas) < procs:
+        try:
+            saida = results.get(timeout=1.0)
+            saidas[saida["rank"]] = saida
+            continue
+        except queue.Empty:
+            pass
+        # Processo que morreu sem responder (ex: crash nativo ou falta de memória)
+        mortos = [rank for rank, w in enumerate(workers) if rank not in saidas and not w.is_alive()]
+        if not mortos:
+            continue
+        # Libera quem ainda espera no barrier e recolhe o que já estava a caminho
+        barrier.abort()
+        try:
+            while True:
+                saida = results.get(timeout=1.0)
+                saidas[saida["rank"]] = saida
+        except queue.Empty:
+            pass
+        for rank in mortos:
+            if rank not in saidas:
+                saidas[rank] = {"rank": rank, "error": f"processo {rank} terminou sem resultado (exitcode {workers[rank].exitcode})"}
+    saidas = list(saidas.values())
+    for w in workers:
+        w.join(timeout=10)
+        if w.is_alive():
+            w.kill()
+
+    erros = [s["error"] for s in saidas if "error" in s]
+    if erros:
+        print(f"\n[AVISO] {nome} (threads={threads}, procs={procs}) falhou: {'; '.join(erros)}")
+        return None
+
+    medidas = [m for s in saidas for m in s["medidas"]]
+    if not medidas:
+        return None
+    latencias = np.array([m[0] for m in medidas])
+    rtfs = np.array([m[0] / m[1] for m in medidas if m[1] > 0])
+    parede = max(s["fim"] for s in saidas) - min(s["inicio"] for s in saidas)
+    audio_total = sum(m[1] for m in medidas)
+
+    linha = {"Modelo": nome, "Threads": threads, "Processos": procs, "Medições": len(medidas)}
+    for p in (50, 95, 99):
+        linha[f"Latência p{p} (s)"] = float(np.percentile(latencias, p))
+    for p in (50, 95, 99):
+        linha[f"RTF p{p}"] = float(np.percentile(rtfs, p)) if len(rtfs) else float("nan")
+    linha.update({
+        "Vazão (s áudio/s)": audio_total / parede if parede > 0 else float("nan"),
+        "Carga (s)": max(s["load_seconds"] for s in saidas),
+        "Pico RSS por processo (MB)": max(s["peak_rss_bytes"] for s in saidas) / 1024**2,
+        "Pico RSS total (MB)": sum(s["peak_rss_bytes"] for s in saidas) / 1024**2,
+    })
+    return linha
+
+def main_latencia(audio_folder, csv_path, limit, engines=None, warmup=2, repeats=5,
+                  threads=None, procs=None, out_csv="latencia.csv"):
+    """
+    Modo de latência: aquecimento, repetições, percentis de latência e RTF, pico de
+    memória por engine e varredura de threads x processos (tabela vazão vs. núcleos).
+    Cada configuração roda em processos novos, então cargas e memória não se misturam.
+    """
     df = pd.read_csv(csv_path)
     if limit:
         df = df.head(int(limit))
+    paths = []
+    for file_path in df["file_path"].astype(str):
+        abs_path = os.path.join(audio_folder, os.path.basename(file_path.strip()))
+        if os.path.exists(abs_path):
+            paths.append(abs_path)
+    if not paths:
+        print("Nenhum arquivo de áudio encontrado.")
+        return
 
-    print("Carregando modelos...")
-    modelos = {}
-    try:
-        print("Carregando Vosk...")
-        modelos["Vosk"] = VoskTranscriber(model_path="models/vosk-model-small-pt-0.3")
-    except Exception as e:
-        print("Falha ao carregar Vosk:", e)
+    nomes = list(engines or ["Vosk", "Whisper", "Wav2Vec2"])
+    threads = threads or [max(1, os.cpu_count() or 1)]
+    procs = procs or [1]
+    print(f"Latência: {len(paths)} arquivos, {warmup} aquecimentos, {repeats} repetições por arquivo.")
+
+    linhas = []
+    for nome in nomes:
+        for p in procs:
+            for t in threads:
+                print(f"Medindo {nome} com {p} processo(s) x {t} thread(s)...", flush=True)
+                linha = medir_configuracao(nome, paths, t, p, warmup, repeats)
+                if linha:
+                    linhas.append(linha)
+
+    if not linhas:
+        print("Nenhuma medição concluída.")
+        return
+    res = pd.DataFrame(linhas)
+    res["Núcleos"] = res["Threads"] * res["Processos"]
 
+    print("\n" + "="*50)
+    print(" LATÊNCIA E VAZÃO")
+    print("="*50)
     try:
-        print("Carregando Whisper (base)...")
-        modelos["Whisper"] = WhisperTranscriber(model_size="base")
-    except Exception as e:
-        print("Falha ao carregar Whisper:", e)
+        from tabulate import tabulate
+        print(tabulate(res, headers="keys", tablefmt="github", showindex=False, floatfmt=".3f"))
+    except Exception:
+        print(res)
 
-    try:
-        print("Carregando Wav2Vec2 (pt-br)...")
-        m_id = "models/wav2vec-pt-br" if os.path.exists("models/wav2vec-pt-br") else "jonatasgrosman/wav2vec2-large-xlsr-53-portuguese"
-        modelos["Wav2Vec2"] = Wav2VecTranscriber(model_id=m_id)
-    except Exception as e:
-        print("Falha ao carregar Wav2Vec2:", e)
+    res.to_csv(out_csv, index=False)
+    print(f"\nDados salvos em '{out_csv}'")
 
-    print("Modelos carregados.\n")
+def main(audio_folder, csv_path, limit, batch_size=1, use_cache=False, workers=1,
+         partial_path="metricas_parciais.csv", restart=False, engines=None, quantized=False,
+         profile_dir=None, results_dir=DEFAULT_RESULTS_DIR, run_id=None):
+    if not os.path.exists(csv_path):
+        print("CSV não encontrado:", csv_path)
+        return
 
-    resultados = []
+    df = pd.read_csv(csv_path)
+    if limit:
+        df = df.head(int(limit))
+
+    bertscore_path = os.path.splitext(partial_path)[0] + "_bertscore.csv"
+    if restart:
+        for path in (partial_path, bertscore_path):
+            if os.path.exists(path):
+                os.remove(path)
+    concluidos = pares_concluidos(partial_path)
+    if concluidos:
+        print(f"Retomando: {len(concluidos)} pares (Arquivo, Modelo) já calculados em '{partial_path}'.")
+
+    if profile_dir:
+        # Workers (spawn) herdam a variável e gravam seus próprios arquivos no mesmo diretório
+        os.environ[PROFILE_DIR_ENV] = profile_dir
+        enable_profiling(profile_dir)
+
+    nomes_modelos = list(engines or ["Vosk", "Whisper", "Wav2Vec2"])
+    if quantized:
+        for par in QUANTIZED_PAIRS:
+            nomes_modelos += [n for n in par if n not in nomes_modelos]
+    itens = []
+    arquivos = []
     total = len(df)
 
     for index, row in df.iterrows():
@@ -139,66 +471,103 @@ def main(audio_folder, csv_path, limit):
         abs_path = os.path.join(audio_folder, filename)
         ref = str(row.get("text", "")).strip()
 
-        print(f"[{index+1}/{total}] {filename}...", end="\r", flush=True)
-
         if not os.path.exists(abs_path):
             print(f"\n[AVISO] Arquivo não encontrado: {abs_path}")
             continue
 
-        duracao_audio = get_audio_duration(abs_path)
-        if duracao_audio <= 0:
-            print(f"\n[AVISO] Duração inválida (0): {abs_path}")
-            continue
-
-        for nome, engine in modelos.items():
+        arquivos.append(filename)
+        pendentes = tuple(n for n in nomes_modelos if (filename, n) not in concluidos)
+        if pendentes:
+            itens.append((filename, abs_path, ref, pendentes))
+
+    shards = [itens[i:i + batch_size] for i in range(0, len(itens), batch_size)]
+    writer = ResultsWriter(partial_path)
+    # Parquet particionado por execução e engine, com agregados incrementais (ver src/results_store.py)
+    store = ResultsStore(results_dir, run_id)
+    # BERTScore pontuado em lotes conforme os resultados chegam, com embeddings
+    # de cada referência calculados uma única vez
+    bert = StreamingBERTScorer(lang="pt", scores_path=bertscore_path)
+    bert_ok = True
+    feitos = 0
+    memoria = {}
+
+    def registrar(rows):
+        nonlocal bert_ok
+        writer.write(rows)
+        store.write(rows)
+        if bert_ok:
             try:
-                start = time.time()
-                hyp = engine.transcribe(abs_path)
-                tempo_proc = time.time() - start
-
-                hyp = "" if hyp is None else str(hyp).strip()
-
-                try:
-                    wer = calcular_wer(ref, hyp)
-                except Exception as e:
-                    print(f"\nErro calculando WER para {nome} em {filename}: {e}")
-                    wer = 1.0
-
-                try:
-                    cer = calcular_cer(ref, hyp)
-                except Exception as e:
-                    print(f"\nErro calculando CER para {nome} em {filename}: {e}")
-                    cer = None
-
-                rtf = tempo_proc / duracao_audio
-
-                resultados.append({
-                    "Arquivo": filename,
-                    "Modelo": nome,
-                    "Referencia": ref,
-                    "Hipotese": hyp,
-                    "WER": wer,
-                    "CER": cer,
-                    "RTF": rtf
-                })
-
+                bert.add(rows)
             except Exception as e:
-                print(f"\nErro com modelo {nome} ao processar {filename}: {e}")
-                continue
+                print("\nFalha ao calcular BERTScore:", e)
+                bert_ok = False
 
-    if not resultados:
+    try:
+        if workers <= 1:
+            print("Carregando modelos...")
+            modelos = carregar_modelos(nomes_modelos, use_cache) if shards else {}
+            memoria.update(memoria_modelos(modelos))
+            print("Modelos carregados.")
+            print(format_import_report() + "\n")
+            for shard in shards:
+                registrar(processar_shard(shard, modelos, batch_size))
+                feitos += len(shard)
+                print(f"[{feitos}/{len(itens)}] {shard[-1][0]}...", end="\r", flush=True)
+            utilizacao = utilizacao_threads(modelos)
+            if not utilizacao.empty:
+                print("\nUtilização das threads de reconhecimento:")
+                print(utilizacao.to_string(index=False, float_format=lambda x: f"{x:.2f}"))
+        elif shards:
+            threads = max(1, (os.cpu_count() or 1) // workers)
+            print(f"Distribuindo {len(itens)} arquivos em {len(shards)} shards para {workers} workers...")
+            ctx = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(max_workers=workers, mp_context=ctx,
+                                     initializer=_init_worker,
+                                     initargs=(nomes_modelos, use_cache, batch_size, threads)) as pool:
+                futures = {pool.submit(_run_shard, shard): shard for shard in shards}
+                for future in as_completed(futures):
+                    shard = futures[future]
+                    try:
+                        rows, memoria_worker = future.result()
+                        registrar(rows)
+                        memoria.update(memoria_worker)
+                    except Exception as e:
+                        print(f"\nErro no shard {shard[0][0]}..{shard[-1][0]}: {e}")
+                    feitos += len(shard)
+                    print(f"[{feitos}/{len(itens)}] arquivos processados...", end="\r", flush=True)
+    finally:
+        writer.close()
+        store.flush()
+
+    # Resultados desta execução e das anteriores, na ordem do CSV de entrada
+    if not os.path.exists(partial_path) or os.path.getsize(partial_path) == 0:
         print("Nenhum resultado foi gerado.")
         return
-
-    df_res = pd.DataFrame(resultados)
+    df_res = pd.read_csv(partial_path)
+    df_res = df_res[df_res["Arquivo"].isin(arquivos) & df_res["Modelo"].isin(nomes_modelos)]
+    df_res = df_res.drop_duplicates(["Arquivo", "Modelo"], keep="last")
+    if df_res.empty:
+        print("Nenhum resultado foi gerado.")
+        return
+    ordem = {nome: i for i, nome in enumerate(arquivos)}
+    ordem_modelos = {nome: i for i, nome in enumerate(nomes_modelos)}
+    df_res = df_res.sort_values(
+        ["Arquivo", "Modelo"],
+        key=lambda col: col.map(ordem) if col.name == "Arquivo" else col.map(ordem_modelos),
+    ).reset_index(drop=True)
 
     print("\nCalculando BERTScore...")
-    candidatos = df_res["Hipotese"].fillna("").tolist()
-    referencias = df_res["Referencia"].fillna("").tolist()
-
     try:
-        _, _, F1 = score(candidatos, referencias, lang="pt", verbose=False)
-        df_res["BERTScore"] = F1.numpy()
+        if not bert_ok:
+            raise RuntimeError("BERTScore desativado após falha anterior")
+        # Linhas de execuções anteriores ainda sem pontuação entram no último lote
+        bert.add(df_res.to_dict("records"))
+        bert.flush()
+        bert_scores = bert.scores()
+        df_res["BERTScore"] = [
+            bert_scores.get((str(a), str(m)), 0.0) for a, m in zip(df_res["Arquivo"], df_res["Modelo"])
+        ]
+        store.write_scores(bert_scores)
     except Exception as e:
         print("Falha ao calcular BERTScore:", e)
         df_res["BERTScore"] = 0.0
@@ -206,11 +575,27 @@ def main(audio_folder, csv_path, limit):
     agg_cols = ["WER", "CER", "RTF", "BERTScore"]
     final_df = df_res.groupby("Modelo")[agg_cols].mean().reset_index()
 
+    # Médias micro (erros totais / palavras ou caracteres totais) por modelo, em lote
+    refs_unicas = {r: NormalizedReference(r) for r in df_res["Referencia"].fillna("").astype(str).unique()}
+    micro = []
+    for nome, grupo in df_res.groupby("Modelo"):
+        sc = score_pairs(
+            [refs_unicas[r] for r in grupo["Referencia"].fillna("").astype(str)],
+            grupo["Hipotese"].fillna("").astype(str).tolist(),
+        )
+        micro.append({"Modelo": nome, "WER (micro)": sc["wer_micro"], "CER (micro)": sc["cer_micro"]})
+    final_df = final_df.merge(pd.DataFrame(micro), on="Modelo", how="left")
+    # Memória das engines carregadas nesta execução (por processo)
+    final_df["Memória (MB)"] = final_df["Modelo"].map(lambda m: memoria[m] / 1024**2 if memoria.get(m) else float("nan"))
+
     exib = final_df.copy()
     exib["WER"] = (exib["WER"] * 100).map("{:.2f}%".format)
+    for col in ["WER (micro)", "CER (micro)"]:
+        exib[col] = exib[col].apply(lambda x: "{:.2f}%".format(x * 100) if pd.notna(x) else "N/A")
     exib["RTF"] = exib["RTF"].map("{:.4f}".format)
     exib["BERTScore"] = exib["BERTScore"].map("{:.4f}".format)
     exib["CER"] = exib["CER"].apply(lambda x: "{:.2f}%".format(x * 100) if pd.notna(x) else "N/A")
+    exib["Memória (MB)"] = exib["Memória (MB)"].apply(lambda x: "{:.0f}".format(x) if pd.notna(x) else "N/A")
 
     print("\n" + "="*50)
     print(" RESULTADOS FINAIS")
@@ -221,9 +606,36 @@ def main(audio_folder, csv_path, limit):
     except Exception:
         print(exib)
 
+    if quantized:
+        comparacao = comparar_quantizacao(final_df)
+        if not comparacao.empty:
+            print("\n" + "="*50)
+            print(" QUANTIZAÇÃO: int8 vs fp32")
+            print("="*50)
+            try:
+                from tabulate import tabulate
+                print(tabulate(comparacao, headers="keys", tablefmt="github", showindex=False, floatfmt=".2f"))
+            except Exception:
+                print(comparacao)
+
+    if profile_dir:
+        profiler.flush()
+        etapas = pd.DataFrame(summarize_dir(profile_dir))
+        if not etapas.empty:
+            print("\n" + "="*50)
+            print(" TEMPO POR ETAPA (todos os processos)")
+            print("="*50)
+            try:
+                from tabulate import tabulate
+                print(tabulate(etapas, headers="keys", tablefmt="github", showindex=False, floatfmt=".4f"))
+            except Exception:
+                print(etapas)
+            print(f"Spans em JSONL e métricas Prometheus em '{profile_dir}'")
+
+    store.close()
     out_csv = "metricas_finais.csv"
     df_res.to_csv(out_csv, index=False)
-    print(f"\nDados salvos em '{out_csv}'")
+    print(f"\nDados salvos em '{out_csv}' e em '{results_dir}' (execução {store.run_id})")
 
 
 if __name__ == "__main__":
@@ -231,5 +643,26 @@ if __name__ == "__main__":
     parser.add_argument("--audio_folder", required=True, help="Pasta onde estão os arquivos de áudio (cenário A).")
     parser.add_argument("--csv_path", required=True, help="CSV com coluna file_path e text.")
     parser.add_argument("--limit", type=int, default=None, help="Limitar número de linhas do CSV.")
+    parser.add_argument("--batch_size", type=int, default=1, help="Número de arquivos transcritos por batch em cada modelo.")
+    parser.add_argument("--cache", action="store_true", help="Reutilizar transcrições já calculadas (cache em .cache/).")
+    parser.add_argument("--workers", type=int, default=1, help="Processos em paralelo (cada um carrega as engines).")
+    parser.add_argument("--partial_path", default="metricas_parciais.csv", help="CSV onde cada resultado é anexado assim que fica pronto.")
+    parser.add_argument("--restart", action="store_true", help="Descarta resultados parciais em vez de retomar.")
+    parser.add_argument("--engines", nargs="+", choices=available_engines(), default=None, help="Engines a avaliar (padrão: todas).")
+    parser.add_argument("--quantized", action="store_true", help="Avalia também o Wav2Vec2 int8 e compara com o fp32 (WER/CER/RTF/memória).")
+    parser.add_argument("--profile", default=None, metavar="DIR", help="Grava spans por etapa (JSONL) e métricas Prometheus em DIR.")
+    parser.add_argument("--results_dir", default=DEFAULT_RESULTS_DIR, help="Repositório Parquet dos resultados (particionado por execução e engine).")
+    parser.add_argument("--run_id", default=None, help="Identificador da execução (padrão: data e hora); repita para retomar a mesma execução.")
+    parser.add_argument("--latency", action="store_true", help="Modo de latência: aquecimento, repetições, percentis e memória (sem WER/CER).")
+    parser.add_argument("--warmup", type=int, default=2, help="Execuções de aquecimento por processo no modo de latência.")
+    parser.add_argument("--repeats", type=int, default=5, help="Repetições de cada arquivo no modo de latência.")
+    parser.add_argument("--threads", type=int, nargs="+", default=None, help="Valores de torch.set_num_threads a varrer no modo de latência.")
+    parser.add_argument("--procs", type=int, nargs="+", default=None, help="Números de processos a varrer no modo de latência.")
     args = parser.parse_args()
-    main(args.audio_folder, args.csv_path, args.limit)
+    if args.latency:
+        main_latencia(args.audio_folder, args.csv_path, args.limit, args.engines, max(0, args.warmup),
+                      max(1, args.repeats), args.threads, args.procs)
+        sys.exit(0)
+    main(args.audio_folder, args.csv_path, args.limit, max(1, args.batch_size), args.cache,
+         max(1, args.workers), args.partial_path, args.restart, args.engines, args.quantized,
+         args.profile, args.results_dir, args.run_id)
@@ -0,0 +1,197 @@
+import sys
+import time
+import random
+import asyncio
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+
+try:
+    from src.extractors.registry import build_extractor, resolve_provider
+    from src.extractors.mock_server import MockLLMServer, MockConfig
+    from src.profiling import enable_profiling, profiler
+except ImportError as e:
+    print(e)
+    sys.exit(1)
+
+PERCENTIS = (50, 95, 99)
+
+_FRASES = [
+    "A reunião do conselho aconteceu em {ano} na cidade de {cidade}.",
+    "O relatório aponta que {n} pessoas participaram do projeto piloto.",
+    "{nome} coordenou a equipe responsável pela coleta dos dados.",
+    "O orçamento aprovado foi de {n} mil reais para o primeiro semestre.",
+    "A próxima etapa prevê a expansão do serviço para {cidade}.",
+    "Segundo {nome}, os resultados superaram a meta em {n} por cento.",
+    "O contrato tem duração de {n} meses e pode ser renovado.",
+]
+_NOMES = ["Ana Souza", "Carlos Lima", "Beatriz Rocha", "João Pereira", "Marina Alves"]
+_CIDADES = ["Recife", "Curitiba", "Belém", "Porto Alegre", "Salvador"]
+
+def gerar_textos(n, frases_por_texto=8, seed=0):
+    """Textos sintéticos diferentes entre si (o cache e a coalescência não mascaram a carga)."""
+    rng = random.Random(seed)
+    textos = []
+    for i in range(n):
+        frases = [
+            rng.choice(_FRASES).format(ano=rng.randint(1990, 2024), cidade=rng.choice(_CIDADES),
+                                       nome=rng.choice(_NOMES), n=rng.randint(2, 500))
+            for _ in range(frases_por_texto)
+        ]
+        textos.append(f"Documento {i}. " + " ".join(frases))
+    return textos
+
+def ler_textos(path, n):
+    """Um texto por parágrafo (separado por linha em branco), repetido até completar n."""
+    with open(path, encoding="utf-8") as f:
+        paragrafos = [p.strip() for p in f.read().split("\n\n") if p.strip()]
+    if not paragrafos:
+        raise ValueError(f"Nenhum texto em {path}")
+    return [f"[{i}] {paragrafos[i % len(paragrafos)]}" for i in range(n)]
+
+def _medir(fn, text):
+    start = time.perf_counter()
+    try:
+        itens = fn(text)
+        return time.perf_counter() - start, len(itens), ""
+    except Exception as e:
+        return time.perf_counter() - start, 0, str(e)
+
+def rodar_threads(extractor, textos, concurrency, stream=False):
+    if stream:
+        fn = lambda text: list(extractor.extract_stream(text))
+    else:
+        fn = extractor.extract_info
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        return list(pool.map(lambda text: _medir(fn, text), textos))
+
+async def _rodar_async(extractor, textos, concurrency):
+    sem = asyncio.Semaphore(concurrency)
+
+    async def run(text):
+        async with sem:
+            start = time.perf_counter()
+            try:
+                itens = await extractor.extract_info(text)
+                return time.perf_counter() - start, len(itens), ""
+            except Exception as e:
+                return time.perf_counter() - start, 0, str(e)
+
+    return await asyncio.gather(*(run(t) for t in textos))
+
+def rodar_async(extractor, textos, concurrency):
+    return asyncio.run(_rodar_async(extractor, textos, concurrency))
+
+def resumir(resultados, wall_s, concurrency, retries) -> dict:
+    latencias = np.array([lat for lat, _, erro in resultados if not erro])
+    erros = sum(1 for _, _, erro in resultados if erro)
+    linha = {
+        "Concorrência": concurrency,
+        "Requisições": len(resultados),
+        "Erros": erros,
+        "Novas tentativas": retries,
+        "Itens QA": sum(n for _, n, _ in resultados),
+        "Tempo total (s)": wall_s,
+        "Req/s": (len(resultados) - erros) / wall_s if wall_s > 0 else float("nan"),
+    }
+    for p in PERCENTIS:
+        linha[f"Latência p{p} (s)"] = float(np.percentile(latencias, p)) if len(latencias) else float("nan")
+    return linha
+
+def medir(provider, textos, concurrency, base_url=None, api_key=None, stream=False, use_async=False):
+    """Uma rodada com extrator novo (contador de retries zerado) e sem cache de respostas."""
+    extractor = build_extractor(provider, api_key=api_key, use_async=use_async, use_cache=False,
+                                base_url=base_url, max_concurrency=concurrency)
+    start = time.perf_counter()
+    if use_async:
+        resultados = rodar_async(extractor, textos, concurrency)
+    else:
+        resultados = rodar_threads(extractor, textos, concurrency, stream)
+    wall_s = time.perf_counter() - start
+
+    erros = [erro for _, _, erro in resultados if erro]
+    if erros:
+        print(f"[AVISO] {len(erros)} requisições falharam. Exemplo: {erros[0][:200]}")
+    return resumir(resultados, wall_s, concurrency, extractor.retries)
+
+def main(provider="local", base_url=None, requests=100, concurrency=(8,), texts_path=None, stream=False,
+         use_async=False, mock=None, output_csv=None, profile_dir=None):
+    """
+    Dispara `requests` extrações por nível de concorrência e reporta vazão, percentis de
+    latência, erros e novas tentativas. Com provider local e sem base_url, sobe o servidor
+    mock nesta mesma máquina: não precisa de rede nem de chave de API.
+    """
+    if profile_dir:
+        enable_profiling(profile_dir)
+
+    server = None
+    if resolve_provider(provider) == "local" and not base_url:
+        server = MockLLMServer(config=mock or MockConfig()).start()
+        base_url = server.base_url
+        print(f"Servidor mock em {base_url}")
+
+    textos = ler_textos(texts_path, requests) if texts_path else gerar_textos(requests)
+    modo = "async" if use_async else ("threads + stream" if stream else "threads")
+    linhas = []
+    try:
+        for c in concurrency:
+            antes = dict(server.stats) if server else {}
+            print(f"--- Concorrência {c} ({modo}): {len(textos)} requisições ---")
+            linha = {"Modo": modo, **medir(provider, textos, c, base_url, stream=stream, use_async=use_async)}
+            if server:
+                depois = server.stats
+                linha["HTTP (servidor)"] = depois["requests"] - antes.get("requests", 0)
+                linha["429 injetados"] = depois["injected_429"] - antes.get("injected_429", 0)
+                linha["5xx injetados"] = depois["injected_5xx"] - antes.get("injected_5xx", 0)
+            linhas.append(linha)
+    finally:
+        if server:
+            server.stop()
+
+    df = pd.DataFrame(linhas)
+    print("\n=== BENCHMARK DE EXTRAÇÃO (LLM) ===")
+    print(df.to_string(index=False, float_format=lambda x: f"{x:.3f}"))
+    if output_csv:
+        df.to_csv(output_csv, index=False)
+        print(f"\nResultados salvos em '{output_csv}'.")
+
+    if profile_dir:
+        profiler.flush()
+        print("\n=== TEMPO POR ETAPA ===")
+        for row in profiler.summary():
+            print(f"{row['span']:<18} {row['labels']:<50} n={row['n']:<6} total={row['total_s']:.2f}s "
+                  f"média={row['media_s'] * 1000:.1f}ms max={row['max_s'] * 1000:.1f}ms")
+    return df
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Carga sobre o LLMExtractor: vazão, percentis de latência e novas tentativas.")
+    parser.add_argument("--provider", default="local", help="Provedor (local, groq, openai, gemini ou rótulo do app).")
+    parser.add_argument("--base_url", default=None, help="API compatível com OpenAI. Com provider local e sem URL, sobe o mock embutido.")
+    parser.add_argument("--requests", type=int, default=100, help="Extrações por nível de concorrência.")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[8], help="Níveis de concorrência a varrer.")
+    parser.add_argument("--texts", default=None, help="Arquivo de texto com parágrafos a usar (padrão: textos sintéticos).")
+    parser.add_argument("--stream", action="store_true", help="Usa extract_stream (itens entregues à medida que chegam) em vez de extract_info.")
+    parser.add_argument("--use_async", action="store_true", help="Usa o AsyncLLMExtractor num único event loop.")
+    parser.add_argument("--output", default=None, help="CSV onde a tabela de resultados é gravada.")
+    parser.add_argument("--profile", default=None, metavar="DIR", help="Grava spans por etapa (JSONL) e métricas Prometheus em DIR.")
+    mock = parser.add_argument_group("servidor mock")
+    mock.add_argument("--latency_ms", type=float, default=400.0, help="Mediana da latência até o primeiro token.")
+    mock.add_argument("--latency_sigma", type=float, default=0.5, help="Dispersão (lognormal) da latência.")
+    mock.add_argument("--tokens_per_s", type=float, default=200.0, help="Velocidade de geração.")
+    mock.add_argument("--rate_429", type=float, default=0.0, help="Fração de respostas 429.")
+    mock.add_argument("--rate_5xx", type=float, default=0.0, help="Fração de respostas 503.")
+    mock.add_argument("--retry_after_s", type=float, default=1.0, help="Retry-After enviado nos 429.")
+    mock.add_argument("--seed", type=int, default=None, help="Semente do sorteio de latências e erros.")
+    args = parser.parse_args()
+
+    if args.stream and args.use_async:
+        parser.error("--stream e --use_async não podem ser usados juntos.")
+
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    config = MockConfig(args.latency_ms, args.latency_sigma, args.tokens_per_s, args.rate_429,
+                        args.rate_5xx, args.retry_after_s, seed=args.seed)
+    main(args.provider, args.base_url, max(1, args.requests), [max(1, c) for c in args.concurrency],
+         args.texts, args.stream, args.use_async, config, args.output, args.profile)
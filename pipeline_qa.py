@@ -0,0 +1,270 @@
+import os
+import csv
+import sys
+import time
+import queue
+import argparse
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+try:
+    from src.processors.registry import available_engines, build_engine
+    from src.extractors.registry import available_providers, build_extractor
+    from src.schemas import QAItem
+except ImportError as e:
+    print(e)
+    sys.exit(1)
+
+AUDIO_EXTENSIONS = (".wav", ".mp3", ".m4a", ".ogg", ".flac", ".webm")
+TRANSCRIPT_COLUMNS = ["Arquivo", "Modelo", "Texto", "Segundos"]
+QA_COLUMNS = ["Arquivo"] + list(QAItem.model_fields)
+
+def listar_audios(entrada):
+    """Arquivos de áudio de uma pasta (recursivo) ou de um manifesto CSV com coluna file_path."""
+    if os.path.isdir(entrada):
+        caminhos = []
+        for root, _, files in os.walk(entrada):
+            caminhos += [os.path.join(root, f) for f in sorted(files) if f.lower().endswith(AUDIO_EXTENSIONS)]
+        return sorted(caminhos)
+
+    base = os.path.dirname(os.path.abspath(entrada))
+    with open(entrada, newline="", encoding="utf-8") as f:
+        linhas = [row["file_path"].strip() for row in csv.DictReader(f) if row.get("file_path", "").strip()]
+    return [p if os.path.isabs(p) else os.path.join(base, p) for p in linhas]
+
+def chave_arquivo(path, entrada):
+    """
+    Identificador de um áudio nos CSVs de saída: caminho relativo à pasta de entrada
+    (ou à pasta do manifesto). O nome do arquivo sozinho colide entre subpastas.
+    """
+    raiz = entrada if os.path.isdir(entrada) else os.path.dirname(os.path.abspath(entrada))
+    return os.path.relpath(os.path.abspath(path), os.path.abspath(raiz)).replace(os.sep, "/")
+
+class CsvAppender:
+    """Anexa linhas a um CSV (com fsync) à medida que ficam prontas; seguro entre threads."""
+
+    def __init__(self, path, columns):
+        novo = not os.path.exists(path) or os.path.getsize(path) == 0
+        self._lock = threading.Lock()
+        self._file = open(path, "a", newline="", encoding="utf-8")
+        self._writer = csv.DictWriter(self._file, fieldnames=columns)
+        if novo:
+            self._writer.writeheader()
+            self._file.flush()
+
+    def write(self, rows):
+        with self._lock:
+            self._writer.writerows(rows)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def close(self):
+        self._file.close()
+
+def descartar_pendentes(path, concluidos, key="Arquivo"):
+    """
+    Remove do CSV as linhas de arquivos fora de concluidos: uma execução interrompida
+    entre gravar as linhas de QA e marcar o arquivo como concluído as repetiria.
+    """
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return 0
+    with open(path, newline="", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        columns, rows = reader.fieldnames, list(reader)
+    manter = [row for row in rows if row[key] in concluidos]
+    if len(manter) == len(rows):
+        return 0
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=columns)
+        writer.writeheader()
+        writer.writerows(manter)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return len(rows) - len(manter)
+
+def ler_csv(path, key="Arquivo"):
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return {}
+    with open(path, newline="", encoding="utf-8") as f:
+        return {row[key]: row for row in csv.DictReader(f)}
+
+# Estado de cada processo de ASR: uma engine por processo
+_worker_engine = None
+_worker_segment_s = 0
+
+def _init_asr_worker(engine_name, use_cache, threads, segment_s):
+    global _worker_engine, _worker_segment_s
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+    engine = build_engine(engine_name)
+    # Engines com streaming próprio leem o arquivo em blocos: não passam pela VAD
+    _worker_segment_s = 0 if getattr(engine, "streaming", False) else segment_s
+    if use_cache:
+        from src.processors.cached import CachedTranscriber
+        engine = CachedTranscriber(engine)
+    _worker_engine = engine
+
+def _transcrever(path):
+    from src.audio import load_audio
+    from src.segmentation import transcribe_segmented
+
+    start = time.time()
+    if _worker_segment_s > 0:
+        audio = load_audio(path)
+        if audio.duration > _worker_segment_s:
+            text = transcribe_segmented(_worker_engine, audio.samples, audio.sample_rate)["text"]
+        else:
+            text = _worker_engine.transcribe_array(audio.samples)
+    else:
+        text = _worker_engine.transcribe(path)
+    return (text or "").strip(), time.time() - start
+
+def main(entrada, saida, engine_name, provider, api_key=None, asr_workers=2, llm_workers=4,
+         queue_size=8, use_cache=True, segment_s=60.0, skip_llm=False):
+    """
+    Pasta/manifesto -> transcrições -> tabelas de QA, em dois estágios sobrepostos:
+    - ASR (CPU) num pool de processos, com no máximo queue_size arquivos em andamento;
+    - extração via LLM (rede) num pool de threads alimentado por uma fila limitada.
+    Enquanto o LLM processa o arquivo N, o ASR já transcreve os seguintes. Transcrições
+    e linhas de QA são gravadas assim que ficam prontas; ao rodar de novo, arquivos
+    já concluídos são pulados e transcrições já feitas são reaproveitadas.
+    Só a extração bem-sucedida marca um arquivo como concluído: falhas (de ASR ou de
+    LLM) vão para falhas.csv e são tentadas de novo na próxima execução, e com
+    skip_llm os arquivos ficam apenas transcritos.
+    """
+    os.makedirs(saida, exist_ok=True)
+    transcripts_path = os.path.join(saida, "transcricoes.csv")
+    qa_path = os.path.join(saida, "qa.csv")
+    done_path = os.path.join(saida, "concluidos.csv")
+
+    arquivos = listar_audios(entrada)
+    transcritos = ler_csv(transcripts_path)
+    # Linhas com erro de versões anteriores não contam como concluídas
+    concluidos = {nome for nome, row in ler_csv(done_path).items() if not row.get("Erro")}
+    pendentes = [p for p in arquivos if chave_arquivo(p, entrada) not in concluidos]
+    print(f"{len(arquivos)} arquivos; {len(arquivos) - len(pendentes)} já concluídos.")
+    if not pendentes:
+        return
+
+    descartadas = descartar_pendentes(qa_path, concluidos)
+    if descartadas:
+        print(f"{descartadas} linhas de QA de arquivos não concluídos removidas de '{qa_path}'.")
+
+    extractor = None if skip_llm else build_extractor(provider, api_key=api_key)
+    transcripts = CsvAppender(transcripts_path, TRANSCRIPT_COLUMNS)
+    qa = CsvAppender(qa_path, QA_COLUMNS)
+    done = CsvAppender(done_path, ["Arquivo", "Itens", "Erro"])
+    falhas = CsvAppender(os.path.join(saida, "falhas.csv"), ["Arquivo", "Etapa", "Erro"])
+
+    # Fila limitada entre os estágios: se o LLM atrasar, o ASR para de enfileirar
+    llm_queue = queue.Queue(maxsize=queue_size)
+    stats = {"asr": 0, "llm": 0, "erros": 0}
+    stats_lock = threading.Lock()
+
+    def llm_stage():
+        while True:
+            item = llm_queue.get()
+            if item is None:
+                return
+            nome, text = item
+            erro = ""
+            try:
+                itens = extractor.extract_info(text) if text else []
+                qa.write([{"Arquivo": nome, **row} for row in itens])
+                done.write([{"Arquivo": nome, "Itens": len(itens), "Erro": ""}])
+            except Exception as e:
+                erro = str(e)
+                print(f"\n[ERRO] Extração de {nome}: {e}")
+                falhas.write([{"Arquivo": nome, "Etapa": "LLM", "Erro": erro}])
+            with stats_lock:
+                stats["llm"] += 1
+                stats["erros"] += bool(erro)
+
+    llm_threads = [threading.Thread(target=llm_stage, daemon=True) for _ in range(max(1, llm_workers))]
+    for t in llm_threads:
+        t.start()
+
+    start = time.time()
+    a_transcrever = []
+    for path in pendentes:
+        nome = chave_arquivo(path, entrada)
+        if nome in transcritos:
+            # Transcrição de uma execução anterior: vai direto para o LLM
+            if extractor is not None:
+                llm_queue.put((nome, transcritos[nome]["Texto"]))
+        else:
+            a_transcrever.append(path)
+
+    if a_transcrever:
+        ctx = multiprocessing.get_context("spawn")
+        threads = max(1, (os.cpu_count() or 1) // asr_workers)
+        with ProcessPoolExecutor(max_workers=asr_workers, mp_context=ctx, initializer=_init_asr_worker,
+                                 initargs=(engine_name, use_cache, threads, segment_s)) as pool:
+            restantes = iter(a_transcrever)
+            em_andamento = {}
+
+            def enviar():
+                for path in restantes:
+                    em_andamento[pool.submit(_transcrever, path)] = path
+                    if len(em_andamento) >= queue_size:
+                        return
+
+            enviar()
+            while em_andamento:
+                prontos, _ = wait(em_andamento, return_when=FIRST_COMPLETED)
+                for future in prontos:
+                    path = em_andamento.pop(future)
+                    nome = chave_arquivo(path, entrada)
+                    try:
+                        text, seconds = future.result()
+                    except Exception as e:
+                        print(f"\n[ERRO] Transcrição de {nome}: {e}")
+                        falhas.write([{"Arquivo": nome, "Etapa": "ASR", "Erro": str(e)}])
+                        with stats_lock:
+                            stats["erros"] += 1
+                        continue
+                    transcripts.write([{"Arquivo": nome, "Modelo": engine_name, "Texto": text, "Segundos": seconds}])
+                    stats["asr"] += 1
+                    # Bloqueia quando a fila está cheia: contrapressão do estágio de LLM
+                    if extractor is not None:
+                        llm_queue.put((nome, text))
+                    print(f"[ASR {stats['asr']}/{len(a_transcrever)} | LLM {stats['llm']}/{len(pendentes)}] {nome}",
+                          end="\r", flush=True)
+                enviar()
+
+    for _ in llm_threads:
+        llm_queue.put(None)
+    for t in llm_threads:
+        t.join()
+    for writer in (transcripts, qa, done, falhas):
+        writer.close()
+
+    print(f"\nConcluído em {time.time() - start:.1f}s: {stats['asr']} transcrições, "
+          f"{stats['llm']} extrações, {stats['erros']} falhas (pendentes para a próxima execução). "
+          f"Resultados em '{saida}'.")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pipeline em lote: áudios -> transcrições -> tabelas de perguntas e respostas.")
+    parser.add_argument("--input", required=True, help="Pasta de áudios ou manifesto CSV com coluna file_path.")
+    parser.add_argument("--output", default="saida_pipeline", help="Pasta onde transcricoes.csv, qa.csv e concluidos.csv são gravados.")
+    parser.add_argument("--engine", default="Whisper", choices=available_engines(), help="Engine de ASR.")
+    parser.add_argument("--provider", default=available_providers()[0], help=f"LLM: {', '.join(available_providers())}.")
+    parser.add_argument("--asr_workers", type=int, default=2, help="Processos de ASR (cada um carrega a engine).")
+    parser.add_argument("--llm_workers", type=int, default=4, help="Extrações via LLM simultâneas.")
+    parser.add_argument("--queue_size", type=int, default=8, help="Máximo de arquivos esperando em cada estágio.")
+    parser.add_argument("--no_cache", action="store_true", help="Não reutiliza transcrições em cache.")
+    parser.add_argument("--segment_s", type=float, default=60.0, help="Áudios mais longos são segmentados por VAD (0 desativa).")
+    parser.add_argument("--skip_llm", action="store_true", help="Apenas transcreve (os arquivos não são marcados como concluídos).")
+    args = parser.parse_args()
+
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    main(args.input, args.output, args.engine, args.provider, None, max(1, args.asr_workers),
+         max(1, args.llm_workers), max(1, args.queue_size), not args.no_cache, args.segment_s, args.skip_llm)
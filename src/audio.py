@@ -0,0 +1,34 @@
+from dataclasses import dataclass
+import numpy as np
+from src.utils import run_ffmpeg
+from src.profiling import span
+
+SAMPLE_RATE = 16000
+
+@dataclass
+class AudioData:
+    """Áudio decodificado uma única vez: float32 Mono 16kHz, compartilhado entre engines e métricas."""
+    samples: np.ndarray
+    sample_rate: int = SAMPLE_RATE
+
+    @property
+    def duration(self) -> float:
+        return len(self.samples) / float(self.sample_rate)
+
+    def to_pcm16(self) -> bytes:
+        """PCM int16 little-endian, formato esperado pelo Vosk."""
+        return float_to_pcm16(self.samples)
+
+def float_to_pcm16(samples: np.ndarray) -> bytes:
+    return (np.clip(samples, -1.0, 1.0) * 32767).astype("<i2").tobytes()
+
+def pcm16_to_float(pcm: bytes) -> np.ndarray:
+    return np.frombuffer(pcm, dtype="<i2").astype(np.float32) / 32768.0
+
+def load_audio(source, sample_rate=SAMPLE_RATE) -> AudioData:
+    """Decodifica e reamostra um arquivo (caminho ou bytes) para float32 Mono."""
+    # O FFmpeg decodifica e reamostra numa única passada: os dois custos caem em "decode"
+    with span("decode", format="f32le"):
+        raw = run_ffmpeg(source, sample_rate, "f32le")
+    samples = np.frombuffer(raw, dtype="<f4").astype(np.float32, copy=False)
+    return AudioData(samples=samples, sample_rate=sample_rate)
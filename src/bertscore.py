@@ -0,0 +1,158 @@
+import os
+import csv
+from collections import OrderedDict, defaultdict
+
+SCORE_COLUMNS = ["Arquivo", "Modelo", "BERTScore"]
+
+class StreamingBERTScorer:
+    """
+    BERTScore (F1) calculado em lotes de tamanho fixo à medida que os resultados chegam.
+    - o modelo é carregado uma única vez, no primeiro lote;
+    - embeddings de cada Referencia única são calculados uma vez e reaproveitados
+      pelas linhas de todas as engines (LRU limitado a max_cached_refs);
+    - cada lote pontuado é anexado a scores_path, e pares já pontuados são pulados.
+    Mesmo resultado de bert_score.score(cands, refs, lang=lang) com idf desligado.
+    """
+
+    def __init__(self, lang="pt", batch_size=64, max_cached_refs=4096, scores_path=None):
+        self.lang = lang
+        self.batch_size = batch_size
+        self.max_cached_refs = max_cached_refs
+        self.scores_path = scores_path
+        self._scorer = None
+        self._ref_cache = OrderedDict()
+        self._pending = []
+        self._scores = {}
+        self.ref_cache_hits = 0
+        self.ref_cache_misses = 0
+
+        if scores_path and os.path.exists(scores_path) and os.path.getsize(scores_path) > 0:
+            with open(scores_path, newline="", encoding="utf-8") as f:
+                for row in csv.DictReader(f):
+                    self._scores[(row["Arquivo"], row["Modelo"])] = float(row["BERTScore"])
+
+    def add(self, rows):
+        """Enfileira linhas (Arquivo, Modelo, Referencia, Hipotese); pontua a cada batch_size."""
+        for row in rows:
+            pair = (str(row["Arquivo"]), str(row["Modelo"]))
+            if pair in self._scores:
+                continue
+            self._pending.append(row)
+            if len(self._pending) >= self.batch_size:
+                self.flush()
+
+    def flush(self):
+        if not self._pending:
+            return
+        lote, self._pending = self._pending, []
+
+        refs = [_as_text(row.get("Referencia")) for row in lote]
+        hyps = [_as_text(row.get("Hipotese")) for row in lote]
+        f1 = self._score(hyps, refs)
+
+        novos = []
+        for row, value in zip(lote, f1):
+            pair = (str(row["Arquivo"]), str(row["Modelo"]))
+            self._scores[pair] = value
+            novos.append({"Arquivo": pair[0], "Modelo": pair[1], "BERTScore": value})
+        self._persist(novos)
+
+    def scores(self) -> dict:
+        return dict(self._scores)
+
+    def _load(self):
+        if self._scorer is None:
+            from bert_score import BERTScorer
+
+            self._scorer = BERTScorer(lang=self.lang, batch_size=self.batch_size)
+        return self._scorer
+
+    def _idf_dict(self):
+        """
+        Pesos por token como no BERTScorer.score: com idf desligado o scorer guarda None,
+        e o score() monta na hora peso 1 para todos os tokens, exceto [SEP] e [CLS].
+        """
+        scorer = self._load()
+        if scorer._idf_dict is not None:
+            return scorer._idf_dict
+        idf_dict = defaultdict(lambda: 1.0)
+        idf_dict[scorer._tokenizer.sep_token_id] = 0
+        idf_dict[scorer._tokenizer.cls_token_id] = 0
+        return idf_dict
+
+    def _embed(self, sentences):
+        """(embedding, idf) sem padding para cada sentença."""
+        import torch
+        from bert_score.utils import get_bert_embedding
+
+        scorer = self._load()
+        idf_dict = self._idf_dict()
+        out = []
+        for start in range(0, len(sentences), self.batch_size):
+            batch = sentences[start:start + self.batch_size]
+            with torch.no_grad():
+                embs, masks, idf = get_bert_embedding(
+                    batch, scorer._model, scorer._tokenizer, idf_dict,
+                    device=scorer.device, all_layers=False,
+                )
+            embs, masks, idf = embs.cpu(), masks.cpu(), idf.cpu()
+            for i in range(len(batch)):
+                n = int(masks[i].sum().item())
+                out.append((embs[i, :n], idf[i, :n]))
+        return out
+
+    def _ref_stats(self, refs):
+        faltantes = [r for r in dict.fromkeys(refs) if r not in self._ref_cache]
+        self.ref_cache_misses += len(faltantes)
+        self.ref_cache_hits += len(refs) - len(faltantes)
+        for ref, stats in zip(faltantes, self._embed(faltantes)):
+            self._ref_cache[ref] = stats
+
+        result = []
+        for ref in refs:
+            self._ref_cache.move_to_end(ref)
+            result.append(self._ref_cache[ref])
+        while len(self._ref_cache) > self.max_cached_refs:
+            self._ref_cache.popitem(last=False)
+        return result
+
+    def _score(self, hyps, refs):
+        import torch
+        from bert_score.utils import greedy_cos_idf
+
+        scorer = self._load()
+        ref_stats = self._ref_stats(refs)
+        hyp_stats = self._embed(hyps)
+
+        _, _, F = greedy_cos_idf(
+            *_pad(ref_stats, scorer.device), *_pad(hyp_stats, scorer.device), False
+        )
+        return torch.nan_to_num(F, nan=0.0).cpu().tolist()
+
+    def _persist(self, rows):
+        if not self.scores_path or not rows:
+            return
+        novo = not os.path.exists(self.scores_path) or os.path.getsize(self.scores_path) == 0
+        with open(self.scores_path, "a", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=SCORE_COLUMNS)
+            if novo:
+                writer.writeheader()
+            writer.writerows(rows)
+
+def _as_text(value) -> str:
+    if value is None or value != value:  # None ou NaN vindo do pandas
+        return ""
+    return str(value)
+
+def _pad(stats, device):
+    """Mesmo padding usado internamente pelo bert_score (pad_batch_stats)."""
+    import torch
+    from torch.nn.utils.rnn import pad_sequence
+
+    embs = [e.to(device) for e, _ in stats]
+    idfs = [i.to(device) for _, i in stats]
+    lens = torch.tensor([e.size(0) for e in embs], dtype=torch.long)
+    emb_pad = pad_sequence(embs, batch_first=True, padding_value=2.0)
+    idf_pad = pad_sequence(idfs, batch_first=True)
+    mask = (torch.arange(int(lens.max()), dtype=torch.long).expand(len(lens), -1) < lens.unsqueeze(1)).to(device)
+    return emb_pad, mask, idf_pad
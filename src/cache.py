@@ -0,0 +1,205 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+
+DEFAULT_CACHE_DIR = ".cache"
+# Espera (s) por um lock do SQLite antes de desistir: vários processos dividem o arquivo
+SQLITE_TIMEOUT_S = 30.0
+# Acessos acumulados em memória antes de gravar o last_access em disco
+TOUCH_BATCH = 64
+
+def hash_bytes(data) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+def hash_file(path, block_size=1 << 20) -> str:
+    """SHA-256 do conteúdo do arquivo, lido em blocos (mesmo hash de hash_bytes sobre os bytes)."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def make_key(*parts) -> str:
+    """Chave estável a partir de partes JSON-serializáveis (dicts são ordenados)."""
+    payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hash_bytes(payload.encode("utf-8"))
+
+class LRUCache:
+    """
+    Cache em dois níveis com despejo LRU:
+    - memória: OrderedDict limitado por número de entradas;
+    - disco: SQLite limitado por tamanho total (bytes), ordenado pelo último acesso.
+    Valores devem ser JSON-serializáveis. Seguro entre threads e entre processos que
+    dividem o mesmo arquivo (WAL): o último acesso das leituras é gravado em lotes, e
+    falhas de escrita no disco só custam o cache, não a chamada.
+    """
+
+    def __init__(self, db_path=None, max_memory_items=256, max_disk_bytes=512 * 1024 * 1024):
+        self.max_memory_items = max_memory_items
+        self.max_disk_bytes = max_disk_bytes
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits_memory = 0
+        self.hits_disk = 0
+        self.misses = 0
+
+        self._touched = {}
+        self._db = None
+        if db_path:
+            os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+            self._db = sqlite3.connect(db_path, timeout=SQLITE_TIMEOUT_S, check_same_thread=False)
+            # WAL: leitores não bloqueiam o escritor (e vice-versa) entre processos
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                "size INTEGER NOT NULL, last_access REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS idx_last_access ON entries(last_access)")
+            self._db.commit()
+
+    def get(self, key):
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.hits_memory += 1
+                return self._memory[key]
+
+            if self._db is not None:
+                row = self._db.execute("SELECT value FROM entries WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    self._touched[key] = time.time()
+                    if len(self._touched) >= TOUCH_BATCH:
+                        self._flush_touched()
+                    value = json.loads(row[0])
+                    self._remember(key, value)
+                    self.hits_disk += 1
+                    return value
+
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        encoded = json.dumps(value, ensure_ascii=False)
+        with self._lock:
+            self._remember(key, value)
+            if self._db is None:
+                return
+            self._touched.pop(key, None)
+            touched = dict(self._touched)
+            try:
+                self._write_touched()
+                self._db.execute(
+                    "INSERT OR REPLACE INTO entries (key, value, size, last_access) VALUES (?, ?, ?, ?)",
+                    (key, encoded, len(encoded.encode("utf-8")), time.time()),
+                )
+                self._evict_disk()
+                self._db.commit()
+            except sqlite3.OperationalError as e:
+                # Disco ocupado por outro processo além do timeout: o valor fica só na memória
+                self._db.rollback()
+                self._touched = touched
+                print(f"[AVISO] Cache em disco indisponível ({e}); entrada mantida só em memória.")
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._touched.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM entries")
+                self._db.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            disk_entries, disk_bytes = 0, 0
+            if self._db is not None:
+                disk_entries, disk_bytes = self._db.execute(
+                    "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries"
+                ).fetchone()
+            return {
+                "hits_memory": self.hits_memory,
+                "hits_disk": self.hits_disk,
+                "misses": self.misses,
+                "memory_entries": len(self._memory),
+                "disk_entries": disk_entries,
+                "disk_bytes": disk_bytes,
+            }
+
+    def _remember(self, key, value):
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_items:
+            self._memory.popitem(last=False)
+
+    def _write_touched(self):
+        if self._touched:
+            self._db.executemany(
+                "UPDATE entries SET last_access = ? WHERE key = ?",
+                [(t, key) for key, t in self._touched.items()],
+            )
+            self._touched.clear()
+
+    def _flush_touched(self):
+        # Só ajusta a ordem do LRU: com o disco ocupado, tenta de novo no próximo lote
+        touched = dict(self._touched)
+        try:
+            self._write_touched()
+            self._db.commit()
+        except sqlite3.OperationalError:
+            self._db.rollback()
+            self._touched = touched
+
+    def _evict_disk(self):
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_disk_bytes:
+            return
+        for key, size in self._db.execute(
+            "SELECT key, size FROM entries ORDER BY last_access ASC"
+        ).fetchall():
+            if total <= self.max_disk_bytes:
+                break
+            self._db.execute("DELETE FROM entries WHERE key = ?", (key,))
+            total -= size
+
+class SingleFlight:
+    """
+    Coalesce chamadas concorrentes com a mesma chave: só a primeira executa,
+    as demais aguardam e recebem o mesmo resultado (ou a mesma exceção).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.coalesced = 0
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = {"event": threading.Event(), "result": None, "error": None}
+                self._calls[key] = call
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call["event"].wait()
+            if call["error"] is not None:
+                raise call["error"]
+            return call["result"]
+
+        try:
+            call["result"] = fn()
+            return call["result"]
+        except Exception as e:
+            call["error"] = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call["event"].set()
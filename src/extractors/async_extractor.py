@@ -0,0 +1,111 @@
+import asyncio
+from src.schemas import QAItem
+from src.cache import LRUCache
+from src.extractors.chunking import chunk_text, merge_qa_items
+from src.extractors.clients import get_client, resolve_model
+from src.extractors.rate_limit import get_bucket, estimate_tokens, call_with_retries_async
+from src.extractors.llm_extractor import LLMExtractor, SYSTEM_PROMPT, get_response_cache, request_kwargs, record_usage
+from src.profiling import span, count
+
+class AsyncLLMExtractor:
+    """
+    Versão assíncrona do LLMExtractor para rodar centenas de extrações num só processo.
+    Usa os clientes async do instructor (reaproveitados pelo registro de clientes),
+    o mesmo cache de respostas e o balde de requisições/tokens do provedor,
+    com backoff exponencial em respostas 429.
+    """
+
+    def __init__(self, api_key=None, provider="groq", use_cache=True, cache: LRUCache = None,
+                 max_chunk_chars=12000, chunk_overlap_chars=400, max_concurrency=16, base_url=None):
+        self.provider = provider
+        self.api_key = api_key
+        self.base_url = base_url
+        self.model = resolve_model(provider)
+        self.max_chunk_chars = max_chunk_chars
+        self.chunk_overlap_chars = chunk_overlap_chars
+        self.max_concurrency = max_concurrency
+        self.use_cache = use_cache
+        self.cache = cache if cache is not None else (get_response_cache() if use_cache else None)
+        self.bucket = get_bucket(provider)
+        self.retries = 0
+        self._inflight = {}
+
+    # Mesma chave do extrator síncrono: os dois compartilham o cache
+    cache_key = LLMExtractor.cache_key
+
+    async def extract_info(self, text: str) -> list:
+        if not text or len(text) < 10:
+            return []
+
+        if self.max_chunk_chars and len(text) > self.max_chunk_chars:
+            return await self.extract_info_chunked(text)
+
+        return await self._extract_single(text)
+
+    async def extract_info_chunked(self, text: str) -> list:
+        chunks = chunk_text(text, self.max_chunk_chars or 12000, self.chunk_overlap_chars)
+        semaphore = asyncio.Semaphore(max(1, self.max_concurrency))
+
+        async def run(chunk):
+            async with semaphore:
+                return await self._extract_single(chunk)
+
+        partes = await asyncio.gather(*(run(chunk) for chunk in chunks))
+        return merge_qa_items(partes)
+
+    async def extract_many(self, texts: list, max_concurrency=None) -> list:
+        """Extrai de vários textos em paralelo; resultados na mesma ordem de entrada."""
+        semaphore = asyncio.Semaphore(max(1, max_concurrency or self.max_concurrency))
+
+        async def run(text):
+            async with semaphore:
+                return await self.extract_info(text)
+
+        return await asyncio.gather(*(run(text) for text in texts))
+
+    async def _extract_single(self, text: str) -> list:
+        if not self.use_cache:
+            return await self._request(text)
+
+        key = self.cache_key(text)
+        cached = self.cache.get(key)
+        if cached is None:
+            # Requisições idênticas simultâneas aguardam a mesma task
+            task = self._inflight.get(key)
+            if task is None:
+                task = asyncio.ensure_future(self._request_and_store(key, text))
+                self._inflight[key] = task
+                task.add_done_callback(lambda _: self._inflight.pop(key, None))
+            cached = await asyncio.shield(task)
+
+        with span("validation", provider=self.provider):
+            return [QAItem.model_validate(item).model_dump() for item in cached]
+
+    async def _request_and_store(self, key: str, text: str) -> list:
+        items = await self._request(text)
+        self.cache.put(key, items)
+        return items
+
+    async def _request(self, text: str) -> list:
+        client = get_client(self.provider, self.api_key, use_async=True, base_url=self.base_url)
+        tokens = estimate_tokens(SYSTEM_PROMPT, text)
+
+        async def attempt():
+            with span("rate_limit_wait", provider=self.provider):
+                await self.bucket.acquire_async(tokens)
+            with span("llm_request", provider=self.provider, model=self.model):
+                if self.provider == "gemini":
+                    return await client.messages.create(**request_kwargs(self.provider, self.model, text, use_async=True))
+                return await client.chat.completions.create(**request_kwargs(self.provider, self.model, text, use_async=True))
+
+        try:
+            resp = await call_with_retries_async(attempt, on_retry=self._count_retry)
+            record_usage(self.provider, resp, tokens)
+            return [item.model_dump() for item in resp.tabela_qa]
+
+        except Exception as e:
+            raise RuntimeError(f"Erro no provedor {self.provider}: {str(e)}")
+
+    def _count_retry(self, attempt, error):
+        self.retries += 1
+        count("llm_retries", provider=self.provider)
@@ -0,0 +1,97 @@
+import re
+import unicodedata
+
+_re_sentence_end = re.compile(r"(?<=[.!?…])\s+")
+_re_spaces = re.compile(r"\s+")
+_re_non_word = re.compile(r"[^\w\s]")
+
+def split_sentences(text: str, max_chars: int, piece_chars: int = None) -> list:
+    """
+    Divide o texto em sentenças pela pontuação final. Só sentenças maiores que max_chars
+    (ex: transcrições de ASR sem pontuação, como Vosk e Wav2Vec2) viram blocos de
+    palavras de até piece_chars (padrão: max_chars).
+    """
+    piece_chars = min(piece_chars or max_chars, max_chars)
+    sentences = []
+    for sentence in _re_sentence_end.split(text.strip()):
+        if len(sentence) <= max_chars:
+            if sentence:
+                sentences.append(sentence)
+            continue
+        atual = ""
+        for word in sentence.split():
+            if atual and len(atual) + 1 + len(word) > piece_chars:
+                sentences.append(atual)
+                atual = word
+            else:
+                atual = f"{atual} {word}" if atual else word
+        if atual:
+            sentences.append(atual)
+    return sentences
+
+def chunk_text(text: str, max_chars: int = 12000, overlap_chars: int = 400) -> list:
+    """
+    Agrupa sentenças inteiras em chunks de até max_chars. Cada chunk repete as últimas
+    sentenças inteiras do anterior (até overlap_chars) para não perder fatos na fronteira.
+    """
+    # Só sentenças que não cabem num chunk (ou texto sem pontuação) são quebradas, em
+    # blocos pequenos o bastante para caber na sobreposição
+    piece_chars = max(50, overlap_chars // 2) if overlap_chars else max_chars
+    sentences = split_sentences(text, max_chars, piece_chars)
+    chunks = []
+    atual = []
+    tamanho = 0
+
+    for sentence in sentences:
+        if atual and tamanho + len(sentence) + 1 > max_chars:
+            chunks.append(" ".join(atual))
+
+            overlap = []
+            overlap_len = 0
+            for prev in reversed(atual):
+                if overlap_len + len(prev) + 1 > overlap_chars:
+                    break
+                overlap.insert(0, prev)
+                overlap_len += len(prev) + 1
+            if overlap_len + len(sentence) + 1 > max_chars:
+                overlap, overlap_len = [], 0
+            atual = overlap
+            tamanho = overlap_len
+
+        atual.append(sentence)
+        tamanho += len(sentence) + 1
+
+    if atual:
+        chunks.append(" ".join(atual))
+    return chunks
+
+def normalize_for_dedup(text: str) -> str:
+    s = unicodedata.normalize("NFC", str(text or "")).lower()
+    s = _re_non_word.sub(" ", s)
+    return _re_spaces.sub(" ", s).strip()
+
+class QADeduplicator:
+    """Filtro incremental: aceita um item só se sua citacao_exata e pergunta normalizadas são inéditas."""
+
+    def __init__(self):
+        self.vistos_citacao = set()
+        self.vistos_pergunta = set()
+
+    def add(self, item: dict) -> bool:
+        citacao = normalize_for_dedup(item.get("citacao_exata"))
+        pergunta = normalize_for_dedup(item.get("pergunta"))
+        if (citacao and citacao in self.vistos_citacao) or (pergunta and pergunta in self.vistos_pergunta):
+            return False
+        if citacao:
+            self.vistos_citacao.add(citacao)
+        if pergunta:
+            self.vistos_pergunta.add(pergunta)
+        return True
+
+def merge_qa_items(partes: list) -> list:
+    """
+    Junta as tabelas de cada chunk (na ordem dos chunks), descartando itens
+    cuja citacao_exata ou pergunta normalizada já apareceu — comum na sobreposição.
+    """
+    dedup = QADeduplicator()
+    return [item for items in partes for item in items if dedup.add(item)]
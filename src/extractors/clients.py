@@ -0,0 +1,89 @@
+import os
+import asyncio
+import hashlib
+import threading
+from src.utils import timed_import
+
+# Modelo usado por cada provedor
+PROVIDER_MODELS = {
+    "groq": "llama-3.1-8b-instant",
+    "gemini": "gemini-2.5-flash",
+    "openai": "gpt-4o-mini",
+    # Servidor compatível com a API da OpenAI (ex: src/extractors/mock_server.py)
+    "local": "mock-extractor",
+}
+
+PROVIDER_ENV_KEYS = {
+    "groq": "GROQ_API_KEY",
+    "gemini": "GOOGLE_API_KEY",
+    "openai": "OPENAI_API_KEY",
+    "local": "LOCAL_LLM_API_KEY",
+}
+
+GROQ_BASE_URL = "https://api.groq.com/openai/v1"
+LOCAL_BASE_URL = "http://127.0.0.1:8011/v1"
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+def resolve_model(provider: str) -> str:
+    return PROVIDER_MODELS.get(provider, PROVIDER_MODELS["openai"])
+
+def resolve_api_key(provider: str, api_key=None):
+    return api_key or os.getenv(PROVIDER_ENV_KEYS.get(provider, "OPENAI_API_KEY"))
+
+def resolve_base_url(provider: str, base_url=None):
+    """URL da API compatível com OpenAI; None usa o endpoint oficial do provedor."""
+    if base_url:
+        return base_url
+    if provider == "local":
+        return os.getenv("LOCAL_LLM_BASE_URL", LOCAL_BASE_URL)
+    if provider == "groq":
+        return GROQ_BASE_URL
+    return None
+
+def get_client(provider: str, api_key=None, use_async=False, base_url=None):
+    """
+    Cliente instructor reutilizado por (provedor, chave, sync/async, URL) no processo inteiro,
+    mantendo o pool de conexões HTTP (e o TLS já negociado) entre extrações.
+    base_url aponta provedores compatíveis com OpenAI para outro servidor (ex: mock local).
+    """
+    key = resolve_api_key(provider, api_key)
+    key_id = hashlib.sha256((key or "").encode("utf-8")).hexdigest()
+    # Conexões de clientes async ficam presas ao event loop em que foram abertas
+    loop_id = _running_loop_id() if use_async else None
+    url = resolve_base_url(provider, base_url)
+    registry_key = (provider, key_id, use_async, loop_id, url)
+
+    with _clients_lock:
+        if registry_key not in _clients:
+            _clients[registry_key] = _build_client(provider, key, use_async, url)
+        return _clients[registry_key]
+
+def _running_loop_id():
+    try:
+        return id(asyncio.get_running_loop())
+    except RuntimeError:
+        return None
+
+def _build_client(provider: str, key, use_async: bool, base_url=None):
+    instructor = timed_import("instructor")
+
+    if provider == "gemini":
+        genai = timed_import("google.generativeai")
+        genai.configure(api_key=key)
+        return instructor.from_gemini(
+            genai.GenerativeModel(model_name=PROVIDER_MODELS["gemini"]),
+            mode=instructor.Mode.GEMINI_JSON,
+            use_async=use_async,
+        )
+
+    openai = timed_import("openai")
+    client_cls = openai.AsyncOpenAI if use_async else openai.OpenAI
+    # Sem as novas tentativas do SDK: 429/5xx chegam ao call_with_retries, que espera entre tentativas
+    if provider in ("groq", "local"):
+        return instructor.from_openai(
+            client_cls(base_url=base_url, api_key=key or "local", max_retries=0),
+            mode=instructor.Mode.JSON
+        )
+    return instructor.from_openai(client_cls(base_url=base_url, api_key=key, max_retries=0))
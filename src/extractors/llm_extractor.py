@@ -1,73 +1,260 @@
-import instructor
-from openai import OpenAI
-import google.generativeai as genai
-from src.schemas import ExtractionResult
+from src.schemas import ExtractionResult, QAItem
+from src.cache import LRUCache, SingleFlight, DEFAULT_CACHE_DIR, hash_bytes, make_key
+from src.extractors.chunking import chunk_text, merge_qa_items, QADeduplicator
+from src.extractors.clients import get_client, resolve_model
+from src.extractors.rate_limit import get_bucket, estimate_tokens, call_with_retries, validation_retries
+from src.profiling import span, count
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import json
 import os
 
+SYSTEM_PROMPT = (
+    "Você é um extrator de fatos estrito e cético. "
+    "Sua tarefa é criar pares de Perguntas e Respostas baseadas APENAS no texto fornecido. "
+    "REGRAS OBRIGATÓRIAS:\n"
+    "1. NÃO use conhecimento externo ou prévio. Se o texto não diz, você não sabe.\n"
+    "2. Se o texto estiver incompleto ou confuso, extraia apenas o que for explícito.\n"
+    "3. Para cada resposta, você DEVE encontrar a 'citacao_exata' no texto original.\n"
+    "4. Responda em Português do Brasil."
+)
+# Incrementar ao alterar o SYSTEM_PROMPT: invalida as respostas em cache
+PROMPT_VERSION = 1
+
+SCHEMA_HASH = hash_bytes(
+    json.dumps(ExtractionResult.model_json_schema(), sort_keys=True).encode("utf-8")
+)
+
+# Cache e coalescência compartilhados pelo processo: o app cria um extrator por clique
+_response_cache = None
+_response_cache_lock = threading.Lock()
+_inflight = SingleFlight()
+
+def get_response_cache() -> LRUCache:
+    global _response_cache
+    with _response_cache_lock:
+        if _response_cache is None:
+            _response_cache = LRUCache(db_path=os.path.join(DEFAULT_CACHE_DIR, "extracoes.sqlite"))
+        return _response_cache
+
+def request_kwargs(provider: str, model: str, text: str, response_model=ExtractionResult, use_async=False) -> dict:
+    """
+    Argumentos do create() do instructor para cada provedor. O instructor só repete
+    respostas que não validam no schema; 429/5xx ficam com call_with_retries (com espera).
+    """
+    if provider == "gemini":
+        return {
+            "messages": [
+                {"role": "user", "content": f"{SYSTEM_PROMPT}\n\nTEXTO FONTE:\n{text}"}
+            ],
+            "response_model": response_model,
+            "max_retries": validation_retries(use_async),
+        }
+    return {
+        "model": model,
+        "response_model": response_model,
+        "max_retries": validation_retries(use_async),
+        "messages": [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": f"TEXTO FONTE:\n{text}"},
+        ],
+    }
+
+def record_usage(provider: str, resp, estimated_tokens: int):
+    """
+    Contadores de tokens: a estimativa usada no rate limit e, quando o instructor
+    expõe a resposta bruta, o uso informado pelo provedor (OpenAI/Groq ou Gemini).
+    """
+    count("llm_tokens_estimated", estimated_tokens, provider=provider)
+    raw = getattr(resp, "_raw_response", None)
+    usage = getattr(raw, "usage", None)
+    if usage is not None:
+        count("llm_tokens", getattr(usage, "prompt_tokens", 0) or 0, provider=provider, kind="prompt")
+        count("llm_tokens", getattr(usage, "completion_tokens", 0) or 0, provider=provider, kind="completion")
+        return
+    usage = getattr(raw, "usage_metadata", None)
+    if usage is not None:
+        count("llm_tokens", getattr(usage, "prompt_token_count", 0) or 0, provider=provider, kind="prompt")
+        count("llm_tokens", getattr(usage, "candidates_token_count", 0) or 0, provider=provider, kind="completion")
+
 class LLMExtractor:
-    def __init__(self, api_key=None, provider="groq"):
+    def __init__(self, api_key=None, provider="groq", use_cache=True, cache: LRUCache = None,
+                 max_chunk_chars=12000, chunk_overlap_chars=400, max_concurrency=4, base_url=None):
 
         self.provider = provider
+        # Textos maiores que max_chunk_chars são extraídos em chunks (None desativa)
+        self.max_chunk_chars = max_chunk_chars
+        self.chunk_overlap_chars = chunk_overlap_chars
+        self.max_concurrency = max_concurrency
+        self.use_cache = use_cache
+        self.cache = cache if cache is not None else (get_response_cache() if use_cache else None)
 
-        if provider == "groq":
-             self.client = instructor.from_openai(
-                OpenAI(
-                    base_url="https://api.groq.com/openai/v1",
-                    api_key=api_key or os.getenv("GROQ_API_KEY")
-                ),
-                mode=instructor.Mode.JSON
-            )
-             self.model = "llama-3.1-8b-instant"
-
-        elif provider == "gemini":
-            key = api_key or os.getenv("GOOGLE_API_KEY")
-            genai.configure(api_key=key)
-            
-            self.client = instructor.from_gemini(
-                genai.GenerativeModel(model_name="gemini-2.5-flash"),
-                mode=instructor.Mode.GEMINI_JSON
-            )
-            self.model = None 
-        else:
-            self.client = instructor.from_openai(
-                OpenAI(api_key=api_key or os.getenv("OPENAI_API_KEY"))
-            )
+        # Cliente (e pool de conexões) compartilhado por provedor/chave no processo
+        self.client = get_client(provider, api_key, base_url=base_url)
+        self.model = resolve_model(provider)
+        self.bucket = get_bucket(provider)
+        self.retries = 0
 
-            self.model = "gpt-4o-mini"
+    def cache_key(self, text: str) -> str:
+        return make_key(
+            hash_bytes(text.encode("utf-8")), self.provider, self.model, PROMPT_VERSION, SCHEMA_HASH
+        )
 
     def extract_info(self, text: str) -> list:
         if not text or len(text) < 10:
             return []
 
-        system_prompt = (
-            "Você é um extrator de fatos estrito e cético. "
-            "Sua tarefa é criar pares de Perguntas e Respostas baseadas APENAS no texto fornecido. "
-            "REGRAS OBRIGATÓRIAS:\n"
-            "1. NÃO use conhecimento externo ou prévio. Se o texto não diz, você não sabe.\n"
-            "2. Se o texto estiver incompleto ou confuso, extraia apenas o que for explícito.\n"
-            "3. Para cada resposta, você DEVE encontrar a 'citacao_exata' no texto original.\n"
-            "4. Responda em Português do Brasil."
-        )
+        if self.max_chunk_chars and len(text) > self.max_chunk_chars:
+            return self.extract_info_chunked(text)
+
+        return self._extract_single(text)
+
+    def extract_info_chunked(self, text: str) -> list:
+        """
+        Map-reduce para textos longos: divide em chunks com sobreposição nas fronteiras
+        de sentença, extrai de até max_concurrency chunks em paralelo e junta as
+        tabelas removendo duplicatas. A latência acompanha o chunk mais lento.
+        """
+        chunks = chunk_text(text, self.max_chunk_chars or 12000, self.chunk_overlap_chars)
+        if len(chunks) == 1:
+            return self._extract_single(chunks[0])
+
+        workers = max(1, min(self.max_concurrency, len(chunks)))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            partes = list(pool.map(self._extract_single, chunks))
+
+        return merge_qa_items(partes)
+
+    def extract_stream(self, text: str):
+        """
+        Gera cada QAItem (dict) assim que o modelo termina de escrevê-lo: a resposta chega
+        em stream e é lida como Partial[ExtractionResult], e cada item da tabela sai quando
+        o seguinte começa (o último, no fim). A primeira linha chega bem antes da resposta
+        completa. Textos longos são processados chunk a chunk, sem repetir itens da sobreposição.
+        Respostas em cache são entregues de imediato; a tabela completa vai para o
+        mesmo cache do extract_info.
+        """
+        if not text or len(text) < 10:
+            return
+
+        if self.max_chunk_chars and len(text) > self.max_chunk_chars:
+            chunks = chunk_text(text, self.max_chunk_chars, self.chunk_overlap_chars)
+        else:
+            chunks = [text]
+
+        dedup = QADeduplicator()
+        for chunk in chunks:
+            for item in self._stream_single(chunk):
+                if dedup.add(item):
+                    yield item
 
+    def _stream_single(self, text: str):
+        key = self.cache_key(text) if self.use_cache else None
+        cached = self.cache.get(key) if key else None
+        if cached is not None:
+            yield from (QAItem.model_validate(item).model_dump() for item in cached)
+            return
+
+        if self.provider == "gemini":
+            # Sem stream para o Gemini: a tabela inteira chega de uma vez
+            items = self._request(text)
+            yield from items
+            if key:
+                self.cache.put(key, items)
+            return
+
+        tokens = estimate_tokens(SYSTEM_PROMPT, text)
+
+        def attempt():
+            with span("rate_limit_wait", provider=self.provider):
+                self.bucket.acquire(tokens)
+            # O create do instructor junta o stream inteiro numa lista antes de devolvê-lo
+            # (create_iterable e create_partial inclusive): o stream bruto do SDK é lido
+            # aqui e interpretado pelo próprio Partial do instructor, pedaço a pedaço
+            from instructor import Partial
+            from instructor.processing.response import handle_response_model
+
+            kwargs = request_kwargs(self.provider, self.model, text)
+            del kwargs["response_model"], kwargs["max_retries"]
+            partial_model, kwargs = handle_response_model(Partial[ExtractionResult], mode=self.client.mode, **kwargs)
+            # 429/5xx chegam aqui, antes do primeiro pedaço: ainda podem ser repetidos
+            stream = self.client.client.chat.completions.create(stream=True, **kwargs)
+            return partial_model, stream
+
+        items = []
         try:
-            if self.provider == "gemini":
-                resp = self.client.messages.create(
-                    messages=[
-                        {"role": "user", "content": f"{system_prompt}\n\nTEXTO FONTE:\n{text}"}
-                    ],
-                    response_model=ExtractionResult,
-                )
-            else:
-                resp = self.client.chat.completions.create(
-                    model=self.model,
-                    response_model=ExtractionResult,
-                    messages=[
-                        {"role": "system", "content": system_prompt},
-                        {"role": "user", "content": f"TEXTO FONTE:\n{text}"},
-                    ],
-                )
+            with span("llm_request", provider=self.provider, model=self.model, stream=True):
+                partial_model, stream = call_with_retries(attempt, on_retry=self._count_retry)
+                count("llm_tokens_estimated", tokens, provider=self.provider)
+                try:
+                    tabela = []
+                    for partial in partial_model.from_streaming_response(stream, mode=self.client.mode):
+                        tabela = partial.tabela_qa or []
+                        # Um item está completo quando o modelo já começou o seguinte
+                        while len(items) < len(tabela) - 1:
+                            item = self._complete_item(tabela[len(items)])
+                            items.append(item)
+                            yield item
+                    for qa in tabela[len(items):]:
+                        item = self._complete_item(qa)
+                        items.append(item)
+                        yield item
+                finally:
+                    stream.close()
+        except Exception as e:
+            raise RuntimeError(f"Erro no provedor {self.provider}: {str(e)}")
+
+        if key:
+            self.cache.put(key, items)
+
+    @staticmethod
+    def _complete_item(partial) -> dict:
+        # Campos faltando (resposta truncada) falham aqui como no extract_info
+        return QAItem.model_validate(partial.model_dump()).model_dump()
+
+    def _extract_single(self, text: str) -> list:
+        if not self.use_cache:
+            return self._request(text)
 
+        key = self.cache_key(text)
+        cached = self.cache.get(key)
+        if cached is None:
+            # Requisições idênticas simultâneas aguardam a mesma chamada ao provedor
+            cached = _inflight.do(key, lambda: self._request_and_store(key, text))
+
+        with span("validation", provider=self.provider):
+            return [QAItem.model_validate(item).model_dump() for item in cached]
+
+    def _request_and_store(self, key: str, text: str) -> list:
+        # Outra requisição pode ter preenchido o cache enquanto esta aguardava
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+        items = self._request(text)
+        self.cache.put(key, items)
+        return items
+
+    def _request(self, text: str) -> list:
+        tokens = estimate_tokens(SYSTEM_PROMPT, text)
+
+        def attempt():
+            with span("rate_limit_wait", provider=self.provider):
+                self.bucket.acquire(tokens)
+            # Inclui as novas tentativas do instructor quando a resposta não valida no schema
+            with span("llm_request", provider=self.provider, model=self.model):
+                if self.provider == "gemini":
+                    return self.client.messages.create(**request_kwargs(self.provider, self.model, text))
+                return self.client.chat.completions.create(**request_kwargs(self.provider, self.model, text))
+
+        try:
+            # 429/5xx do provedor: espera exponencial (ou Retry-After) e tenta de novo
+            resp = call_with_retries(attempt, on_retry=self._count_retry)
+            record_usage(self.provider, resp, tokens)
             return [item.model_dump() for item in resp.tabela_qa]
-            
+
         except Exception as e:
-            raise RuntimeError(f"Erro no provedor {self.provider}: {str(e)}")
\ No newline at end of file
+            raise RuntimeError(f"Erro no provedor {self.provider}: {str(e)}")
+
+    def _count_retry(self, attempt, error):
+        self.retries += 1
+        count("llm_retries", provider=self.provider)
@@ -0,0 +1,282 @@
+import re
+import json
+import time
+import uuid
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Marcador do instructor (Mode.JSON) antes do JSON schema na mensagem de sistema
+_SCHEMA_MARKER = re.compile(r"json_schema:\s*", re.IGNORECASE)
+_re_sentences = re.compile(r"(?<=[.!?])\s+")
+
+class MockConfig:
+    """
+    Comportamento do servidor: latência até o primeiro token (lognormal com mediana
+    latency_ms e dispersão latency_sigma), velocidade de geração (tokens_per_s) e
+    probabilidade de responder 429 ou 5xx.
+    """
+
+    def __init__(self, latency_ms=400.0, latency_sigma=0.5, tokens_per_s=200.0,
+                 rate_429=0.0, rate_5xx=0.0, retry_after_s=1.0, items=3, seed=None):
+        self.latency_ms = latency_ms
+        self.latency_sigma = latency_sigma
+        self.tokens_per_s = tokens_per_s
+        self.rate_429 = rate_429
+        self.rate_5xx = rate_5xx
+        self.retry_after_s = retry_after_s
+        self.items = items
+        self.random = random.Random(seed)
+
+    def first_token_delay(self) -> float:
+        return self.latency_ms / 1000.0 * self.random.lognormvariate(0.0, self.latency_sigma)
+
+class MockLLMServer:
+    """
+    Servidor local que fala o protocolo chat-completions da OpenAI (POST /v1/chat/completions,
+    com ou sem stream) e devolve JSON válido para o schema pedido pelo instructor —
+    ExtractionResult, QAItem iterável ou qualquer outro — preenchido com trechos do texto.
+    Conta requisições, erros injetados e respostas para comparar com o lado do cliente.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, config: MockConfig = None):
+        self.config = config or MockConfig()
+        self.stats = {"requests": 0, "ok": 0, "injected_429": 0, "injected_5xx": 0, "streamed": 0}
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def serve_forever(self):
+        self._httpd.serve_forever()
+
+    def _count(self, key):
+        with self._lock:
+            self.stats[key] += 1
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                if self.path.rstrip("/").endswith("/models"):
+                    self._json(200, {"object": "list", "data": [{"id": "mock-extractor", "object": "model"}]})
+                else:
+                    self._json(404, {"error": {"message": "not found"}})
+
+            def do_POST(self):
+                if not self.path.rstrip("/").endswith("/chat/completions"):
+                    self._json(404, {"error": {"message": "not found"}})
+                    return
+                length = int(self.headers.get("Content-Length") or 0)
+                body = json.loads(self.rfile.read(length) or b"{}")
+                server._count("requests")
+
+                cfg = server.config
+                sorteio = cfg.random.random()
+                if sorteio < cfg.rate_429:
+                    server._count("injected_429")
+                    self._json(429, {"error": {"message": "Rate limit exceeded (mock)", "type": "rate_limit_error"}},
+                               headers={"Retry-After": f"{cfg.retry_after_s:g}"})
+                    return
+                if sorteio < cfg.rate_429 + cfg.rate_5xx:
+                    server._count("injected_5xx")
+                    self._json(503, {"error": {"message": "Service unavailable (mock)", "type": "server_error"}})
+                    return
+
+                time.sleep(cfg.first_token_delay())
+                schema, tool_name = _requested_schema(body)
+                content = json.dumps(
+                    _instance(schema, schema.get("$defs", {}), _source_sentences(body), cfg.items),
+                    ensure_ascii=False,
+                )
+                if body.get("stream"):
+                    server._count("streamed")
+                    self._stream(body, content, tool_name)
+                else:
+                    self._complete(body, content, tool_name)
+                server._count("ok")
+
+            def _complete(self, body, content, tool_name):
+                cfg = server.config
+                time.sleep(_tokens(content) / cfg.tokens_per_s)
+                message = {"role": "assistant", "content": content}
+                finish = "stop"
+                if tool_name:
+                    message = {"role": "assistant", "content": None, "tool_calls": [{
+                        "id": f"call_{uuid.uuid4().hex[:8]}", "type": "function",
+                        "function": {"name": tool_name, "arguments": content},
+                    }]}
+                    finish = "tool_calls"
+                self._json(200, {
+                    "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": body.get("model", "mock-extractor"),
+                    "choices": [{"index": 0, "message": message, "finish_reason": finish}],
+                    "usage": _usage(body, content),
+                })
+
+            def _stream(self, body, content, tool_name):
+                cfg = server.config
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Cache-Control", "no-cache")
+                self.send_header("Connection", "close")
+                self.end_headers()
+
+                chunk_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+                base = {"id": chunk_id, "object": "chat.completion.chunk", "created": int(time.time()),
+                        "model": body.get("model", "mock-extractor")}
+
+                def send(delta, finish=None):
+                    payload = {**base, "choices": [{"index": 0, "delta": delta, "finish_reason": finish}]}
+                    self.wfile.write(f"data: {json.dumps(payload, ensure_ascii=False)}\n\n".encode("utf-8"))
+                    self.wfile.flush()
+
+                if tool_name:
+                    send({"role": "assistant", "tool_calls": [{
+                        "index": 0, "id": f"call_{uuid.uuid4().hex[:8]}", "type": "function",
+                        "function": {"name": tool_name, "arguments": ""},
+                    }]})
+                else:
+                    send({"role": "assistant", "content": ""})
+
+                # ~4 caracteres por token, no ritmo de tokens_per_s
+                for start in range(0, len(content), 16):
+                    piece = content[start:start + 16]
+                    if tool_name:
+                        send({"tool_calls": [{"index": 0, "function": {"arguments": piece}}]})
+                    else:
+                        send({"content": piece})
+                    time.sleep(4 / cfg.tokens_per_s)
+
+                send({}, finish="tool_calls" if tool_name else "stop")
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.wfile.flush()
+                self.close_connection = True
+
+            def _json(self, status, payload, headers=None):
+                data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+        return Handler
+
+def _tokens(text) -> int:
+    return max(1, len(text) // 4)
+
+def _usage(body, content) -> dict:
+    prompt = sum(_tokens(str(m.get("content") or "")) for m in body.get("messages", []))
+    completion = _tokens(content)
+    return {"prompt_tokens": prompt, "completion_tokens": completion, "total_tokens": prompt + completion}
+
+def _requested_schema(body):
+    """Schema pedido: via tools (Mode.TOOLS) ou embutido na mensagem de sistema (Mode.JSON)."""
+    tools = body.get("tools") or []
+    if tools:
+        function = tools[0].get("function", {})
+        return function.get("parameters", {}), function.get("name")
+
+    decoder = json.JSONDecoder()
+    for message in body.get("messages", []):
+        text = str(message.get("content") or "")
+        match = _SCHEMA_MARKER.search(text)
+        if match:
+            try:
+                schema, _ = decoder.raw_decode(text[match.end():])
+                return schema, None
+            except ValueError:
+                pass
+
+    from src.schemas import ExtractionResult
+
+    return ExtractionResult.model_json_schema(), None
+
+def _source_sentences(body) -> list:
+    texto = str(body.get("messages", [{}])[-1].get("content") or "")
+    texto = texto.split("TEXTO FONTE:", 1)[-1].strip()
+    frases = [f.strip() for f in _re_sentences.split(texto) if f.strip()]
+    return frases or ["Texto de exemplo."]
+
+def _instance(schema, defs, frases, items, path=""):
+    """Instância mínima e válida de um JSON schema, com strings tiradas do texto fonte."""
+    if "$ref" in schema:
+        return _instance(defs[schema["$ref"].split("/")[-1]], defs, frases, items, path)
+    for key in ("anyOf", "oneOf", "allOf"):
+        if key in schema:
+            opcoes = [s for s in schema[key] if s.get("type") != "null"] or schema[key]
+            return _instance(opcoes[0], defs, frases, items, path)
+
+    tipo = schema.get("type", "object")
+    if tipo == "object":
+        props = schema.get("properties", {})
+        return {name: _instance(sub, defs, frases, items, f"{path}.{name}") for name, sub in props.items()}
+    if tipo == "array":
+        sub = schema.get("items", {"type": "string"})
+        return [
+            _instance(sub, defs, frases[i % len(frases):] + frases[:i % len(frases)], items, f"{path}[{i}]")
+            for i in range(items)
+        ]
+    if tipo == "integer":
+        return 1
+    if tipo == "number":
+        return 1.0
+    if tipo == "boolean":
+        return True
+    if "enum" in schema:
+        return schema["enum"][0]
+    # Strings: a primeira frase do texto (citações e respostas ficam presas à fonte)
+    campo = path.rsplit(".", 1)[-1]
+    frase = frases[0]
+    if campo == "pergunta":
+        return f"O que o texto diz sobre: {frase[:60]}?"
+    if campo == "categoria":
+        return "Geral"
+    return frase
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Servidor local compatível com a API chat-completions da OpenAI.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8011)
+    parser.add_argument("--latency_ms", type=float, default=400.0, help="Mediana da latência até o primeiro token.")
+    parser.add_argument("--latency_sigma", type=float, default=0.5, help="Dispersão (lognormal) da latência.")
+    parser.add_argument("--tokens_per_s", type=float, default=200.0, help="Velocidade de geração.")
+    parser.add_argument("--rate_429", type=float, default=0.0, help="Fração de respostas 429.")
+    parser.add_argument("--rate_5xx", type=float, default=0.0, help="Fração de respostas 503.")
+    parser.add_argument("--retry_after_s", type=float, default=1.0, help="Retry-After enviado nos 429.")
+    args = parser.parse_args()
+
+    config = MockConfig(args.latency_ms, args.latency_sigma, args.tokens_per_s,
+                        args.rate_429, args.rate_5xx, args.retry_after_s)
+    server = MockLLMServer(args.host, args.port, config)
+    print(f"Servidor mock em {server.base_url} (Ctrl+C para sair)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,141 @@
+import time
+import random
+import asyncio
+import threading
+
+# Limites padrão por provedor (requisições/min, tokens/min) — planos gratuitos
+PROVIDER_LIMITS = {
+    "groq": (30, 6000),
+    "gemini": (10, 250000),
+    "openai": (500, 200000),
+    # Servidor local/mock: sem limite prático, para medir o próprio extrator
+    "local": (1e6, 1e9),
+}
+
+class TokenBucket:
+    """
+    Balde de requisições e tokens por minuto, compartilhado entre threads e event loops.
+    reserve() debita a capacidade na hora e devolve quanto o chamador deve esperar,
+    de modo que chamadas concorrentes são enfileiradas sem busy-wait.
+    """
+
+    def __init__(self, requests_per_minute: float, tokens_per_minute: float):
+        self.rpm = float(requests_per_minute)
+        self.tpm = float(tokens_per_minute)
+        self._requests = self.rpm
+        self._tokens = self.tpm
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, tokens: int = 0) -> float:
+        with self._lock:
+            now = time.monotonic()
+            elapsed = now - self._updated
+            self._updated = now
+            self._requests = min(self.rpm, self._requests + elapsed * self.rpm / 60.0)
+            self._tokens = min(self.tpm, self._tokens + elapsed * self.tpm / 60.0)
+
+            # Uma requisição maior que o balde inteiro só espera o balde encher
+            tokens = min(tokens, self.tpm)
+            self._requests -= 1
+            self._tokens -= tokens
+
+            wait_requests = -self._requests * 60.0 / self.rpm if self._requests < 0 else 0.0
+            wait_tokens = -self._tokens * 60.0 / self.tpm if self._tokens < 0 else 0.0
+            return max(wait_requests, wait_tokens)
+
+    def acquire(self, tokens: int = 0):
+        wait = self.reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self, tokens: int = 0):
+        wait = self.reserve(tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+_buckets = {}
+_buckets_lock = threading.Lock()
+
+def get_bucket(provider: str) -> TokenBucket:
+    """Um balde por provedor no processo inteiro (o limite do provedor é por conta)."""
+    with _buckets_lock:
+        if provider not in _buckets:
+            rpm, tpm = PROVIDER_LIMITS.get(provider, PROVIDER_LIMITS["openai"])
+            _buckets[provider] = TokenBucket(rpm, tpm)
+        return _buckets[provider]
+
+def estimate_tokens(*texts) -> int:
+    # ~4 caracteres por token, mais margem para o schema e a resposta
+    return sum(len(t) for t in texts) // 4 + 1000
+
+# Novas tentativas do próprio instructor: só quando a resposta não valida no schema
+# (o modelo é reperguntado com o erro). 429/5xx sobem direto para call_with_retries.
+VALIDATION_ATTEMPTS = 3
+
+def validation_retries(use_async=False, attempts=VALIDATION_ATTEMPTS):
+    """Retrying do tenacity para o max_retries do instructor; um por requisição."""
+    from json import JSONDecodeError
+    from pydantic import ValidationError
+    from tenacity import Retrying, AsyncRetrying, stop_after_attempt, retry_if_exception_type
+    from instructor.core.exceptions import ValidationError as InstructorValidationError
+
+    cls = AsyncRetrying if use_async else Retrying
+    return cls(
+        stop=stop_after_attempt(attempts),
+        retry=retry_if_exception_type((ValidationError, JSONDecodeError, InstructorValidationError)),
+    )
+
+def _status_code(e: Exception):
+    return getattr(e, "status_code", None) or getattr(getattr(e, "response", None), "status_code", None)
+
+def is_retryable_error(e: Exception) -> bool:
+    """429, 5xx e falhas de conexão: os clientes OpenAI/Groq não repetem por conta própria."""
+    if is_rate_limit_error(e):
+        return True
+    status = _status_code(e)
+    if isinstance(status, int) and 500 <= status < 600:
+        return True
+    return type(e).__name__ in ("APIConnectionError", "APITimeoutError", "InternalServerError")
+
+def is_rate_limit_error(e: Exception) -> bool:
+    if _status_code(e) == 429:
+        return True
+    msg = str(e).lower()
+    return "429" in msg or "rate limit" in msg or "resource exhausted" in msg or "resourceexhausted" in msg
+
+def retry_after_seconds(e: Exception):
+    headers = getattr(getattr(e, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+def backoff_delay(attempt: int, e: Exception, base=1.0, cap=60.0) -> float:
+    """Exponencial com jitter; respeita o Retry-After quando o provedor informa."""
+    hinted = retry_after_seconds(e)
+    if hinted is not None:
+        return min(cap, hinted)
+    return min(cap, base * (2 ** attempt)) * (0.5 + random.random() / 2)
+
+def call_with_retries(fn, max_retries=5, on_retry=None):
+    for attempt in range(max_retries + 1):
+        try:
+            return fn()
+        except Exception as e:
+            if attempt >= max_retries or not is_retryable_error(e):
+                raise
+            if on_retry:
+                on_retry(attempt, e)
+            time.sleep(backoff_delay(attempt, e))
+
+async def call_with_retries_async(fn, max_retries=5, on_retry=None):
+    for attempt in range(max_retries + 1):
+        try:
+            return await fn()
+        except Exception as e:
+            if attempt >= max_retries or not is_retryable_error(e):
+                raise
+            if on_retry:
+                on_retry(attempt, e)
+            await asyncio.sleep(backoff_delay(attempt, e))
@@ -0,0 +1,31 @@
+# Rótulo exibido no app -> provedor usado pelo LLMExtractor e pelo registro de clientes.
+# O SDK de cada provedor (openai, google.generativeai, instructor) só é importado
+# quando o primeiro cliente daquele provedor é criado (ver clients.py).
+PROVIDERS = {
+    "Llama 3": "groq",
+    "Google Gemini (gemini-2.5-flash)": "gemini",
+    "GPT-4o-mini": "openai",
+}
+# Servidor compatível com a OpenAI (ex: src/extractors/mock_server.py); fora do menu do app
+LOCAL_PROVIDER = "local"
+
+def available_providers() -> list:
+    return list(PROVIDERS)
+
+def resolve_provider(label: str) -> str:
+    if label in PROVIDERS.values() or label == LOCAL_PROVIDER:
+        return label
+    if label not in PROVIDERS:
+        raise KeyError(f"Provedor desconhecido: {label}. Disponíveis: {', '.join(PROVIDERS)}")
+    return PROVIDERS[label]
+
+def build_extractor(label: str, api_key=None, use_async=False, **kwargs):
+    provider = resolve_provider(label)
+    if use_async:
+        from src.extractors.async_extractor import AsyncLLMExtractor
+
+        return AsyncLLMExtractor(api_key=api_key, provider=provider, **kwargs)
+
+    from src.extractors.llm_extractor import LLMExtractor
+
+    return LLMExtractor(api_key=api_key, provider=provider, **kwargs)
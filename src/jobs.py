@@ -0,0 +1,277 @@
+import os
+import time
+import uuid
+import queue
+import threading
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+ERROR = "error"
+
+# Áudios acima desta duração (s) são segmentados por VAD e transcritos por trechos de fala
+SEGMENT_MIN_SECONDS = float(os.getenv("ASR_SEGMENT_MIN_SECONDS", "60"))
+SEGMENT_WORKERS = int(os.getenv("ASR_SEGMENT_WORKERS", "4"))
+
+def _worker_main(tasks, events, use_cache, engine_load=None):
+    """
+    Processo worker: mantém suas engines carregadas (ModelPool) entre jobs e
+    reporta início, progresso e resultado de cada transcrição pela fila de eventos.
+    engine_load (EngineLoad) é compartilhado entre os workers para o roteador "Auto".
+    """
+    from src.processors.pool import pool_from_env
+    from src.processors.cached import CachedTranscriber
+    from src.cache import LRUCache, DEFAULT_CACHE_DIR
+    from src.audio import load_audio
+    from src.segmentation import transcribe_segmented
+    from src.profiling import profiling_from_env
+
+    # PROFILE_DIR herdado do app: cada worker grava seus próprios spans
+    profiler = profiling_from_env()
+    pool = pool_from_env()
+    cache = LRUCache(db_path=os.path.join(DEFAULT_CACHE_DIR, "transcricoes.sqlite")) if use_cache else None
+    pid = os.getpid()
+
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+
+        job_id = task["id"]
+        events.put(("started", job_id, pid))
+        try:
+            events.put(("progress", job_id, 0.1, f"Carregando {task['engine']}..."))
+            # O roteador "Auto" carrega as engines escolhidas no mesmo pool (e orçamento) do worker
+            # e vê a carga de todos os workers, não só a deste processo
+            opcoes = {"pool": pool, "load": engine_load} if task["engine"] == "Auto" else {}
+            # Carga vista pelo "Auto" em todos os workers; o próprio roteador conta a engine que escolhe
+            contar = engine_load is not None and task["engine"] != "Auto"
+            if contar:
+                engine_load.add(task["engine"], 1)
+            try:
+                with pool.lease(task["engine"], **opcoes) as engine:
+                    # Engines com streaming próprio leem o arquivo em blocos: decodificá-lo
+                    # inteiro para a VAD anularia o ganho de memória
+                    segmentar = SEGMENT_MIN_SECONDS > 0 and not getattr(engine, "streaming", False)
+                    if cache is not None:
+                        engine = CachedTranscriber(engine, cache)
+                    audio = load_audio(task["audio"]) if segmentar else None
+                    if audio is not None and audio.duration > SEGMENT_MIN_SECONDS:
+                        events.put(("progress", job_id, 0.3, f"Segmentando {audio.duration:.0f}s de áudio..."))
+                        report = lambda frac: events.put(
+                            ("progress", job_id, 0.3 + 0.65 * frac, f"Transcrevendo trechos com {task['engine']}...")
+                        )
+                        text = transcribe_segmented(
+                            engine, audio.samples, audio.sample_rate, workers=SEGMENT_WORKERS, on_progress=report
+                        )["text"]
+                    elif audio is not None:
+                        # Já decodificado para a VAD: não passa pelo FFmpeg de novo
+                        events.put(("progress", job_id, 0.4, f"Transcrevendo com {task['engine']}..."))
+                        text = engine.transcribe_array(audio.samples)
+                    else:
+                        events.put(("progress", job_id, 0.4, f"Transcrevendo com {task['engine']}..."))
+                        text = engine.transcribe_bytes(task["audio"])
+            finally:
+                if contar:
+                    engine_load.add(task["engine"], -1)
+            events.put(("done", job_id, text, pid, pool.loaded()))
+        except Exception as e:
+            events.put(("error", job_id, str(e), pid, pool.loaded()))
+        profiler.flush()
+
+class JobManager:
+    """
+    Fila de jobs do app: transcrições rodam em processos worker (cada um com suas
+    engines carregadas), fora da thread do script do Streamlit; extrações via LLM,
+    limitadas por rede, rodam num pool de threads e podem ser encadeadas
+    automaticamente ao fim de uma transcrição.
+    A UI acompanha cada job pelo ID (status/progresso) e busca o resultado no fim.
+    """
+
+    def __init__(self, num_workers=2, llm_threads=4, use_cache=True, max_jobs=500):
+        from src.processors.registry import available_engines
+        from src.processors.auto import EngineLoad
+
+        self._ctx = multiprocessing.get_context("spawn")
+        self._engine_load = EngineLoad(available_engines(), ctx=self._ctx)
+        self._tasks = self._ctx.Queue()
+        self._events = self._ctx.Queue()
+        self._use_cache = use_cache
+        self._max_jobs = max_jobs
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._workers = {}
+        self._running_by_pid = {}
+        self._loaded_by_pid = {}
+        self._follow_ups = {}
+        self._closed = False
+
+        for _ in range(max(1, num_workers)):
+            self._spawn_worker()
+
+        self._llm = ThreadPoolExecutor(max_workers=llm_threads)
+        self._collector = threading.Thread(target=self._collect, daemon=True)
+        self._collector.start()
+
+    def submit_transcription(self, engine: str, audio: bytes, extract=None) -> str:
+        """
+        Enfileira a transcrição de um áudio (bytes do arquivo).
+        extract={"provider": rótulo, "api_key": ..., "stream": bool} encadeia a extração ao final.
+        """
+        job_id = self._new_job("transcription", {"engine": engine})
+        if extract:
+            # Guardado fora do status para a chave de API não vazar para a UI
+            with self._lock:
+                self._follow_ups[job_id] = extract
+        self._tasks.put({"id": job_id, "engine": engine, "audio": bytes(audio)})
+        return job_id
+
+    def submit_extraction(self, text: str, provider: str, api_key=None, parent=None, stream=False) -> str:
+        """stream=True: o result do job cresce à medida que cada linha da tabela chega."""
+        job_id = self._new_job("extraction", {"provider": provider, "stream": stream}, parent=parent)
+        self._llm.submit(self._run_extraction, job_id, text, provider, api_key, stream)
+        return job_id
+
+    def status(self, job_id: str) -> dict:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def result(self, job_id: str):
+        job = self.status(job_id)
+        return job["result"] if job and job["status"] == DONE else None
+
+    def loaded_models(self) -> dict:
+        """Engines residentes em cada worker (PID -> lista do ModelPool.loaded())."""
+        with self._lock:
+            return dict(self._loaded_by_pid)
+
+    def shutdown(self):
+        self._closed = True
+        for _ in self._workers:
+            self._tasks.put(None)
+        for proc in self._workers.values():
+            proc.join(timeout=5)
+        self._llm.shutdown(wait=False)
+
+    def _spawn_worker(self):
+        proc = self._ctx.Process(
+            target=_worker_main, args=(self._tasks, self._events, self._use_cache, self._engine_load), daemon=True
+        )
+        proc.start()
+        self._workers[proc.pid] = proc
+
+    def _new_job(self, kind, meta, parent=None) -> str:
+        job_id = uuid.uuid4().hex[:12]
+        with self._lock:
+            self._jobs[job_id] = {
+                "id": job_id,
+                "kind": kind,
+                "status": QUEUED,
+                "progress": 0.0,
+                "message": "Na fila...",
+                "result": None,
+                "error": None,
+                "parent": parent,
+                "follow_up": None,
+                "created_at": time.time(),
+                "started_at": None,
+                "finished_at": None,
+                **meta,
+            }
+            self._prune()
+        return job_id
+
+    def _update(self, job_id, **fields):
+        with self._lock:
+            if job_id in self._jobs:
+                self._jobs[job_id].update(fields)
+
+    def _prune(self):
+        # Descarta os jobs finalizados mais antigos além de max_jobs
+        excesso = len(self._jobs) - self._max_jobs
+        for job_id in list(self._jobs):
+            if excesso <= 0:
+                break
+            if self._jobs[job_id]["status"] in (DONE, ERROR):
+                del self._jobs[job_id]
+                excesso -= 1
+
+    def _run_extraction(self, job_id, text, provider, api_key, stream=False):
+        from src.extractors.registry import build_extractor
+
+        self._update(job_id, status=RUNNING, started_at=time.time(), progress=0.2,
+                     message="O LLM está analisando o contexto...")
+        try:
+            extractor = build_extractor(provider, api_key=api_key)
+            if stream:
+                data = []
+                for item in extractor.extract_stream(text):
+                    data.append(item)
+                    # Cópia a cada linha: a UI lê o status enquanto a lista cresce
+                    self._update(job_id, result=list(data), progress=0.5,
+                                 message=f"{len(data)} linha(s) recebida(s)...")
+            else:
+                data = extractor.extract_info(text)
+            self._update(job_id, status=DONE, result=data, progress=1.0,
+                         message="Extração concluída!", finished_at=time.time())
+        except Exception as e:
+            self._update(job_id, status=ERROR, error=str(e), message="Falha na extração",
+                         finished_at=time.time())
+
+    def _collect(self):
+        while not self._closed:
+            try:
+                event = self._events.get(timeout=1.0)
+            except queue.Empty:
+                event = None
+            self._check_workers()
+            if event is None:
+                continue
+
+            kind, job_id = event[0], event[1]
+            if kind == "started":
+                self._running_by_pid[event[2]] = job_id
+                self._update(job_id, status=RUNNING, started_at=time.time())
+            elif kind == "progress":
+                self._update(job_id, progress=event[2], message=event[3])
+            elif kind in ("done", "error"):
+                pid, loaded = event[3], event[4]
+                self._running_by_pid.pop(pid, None)
+                with self._lock:
+                    self._loaded_by_pid[pid] = loaded
+                if kind == "done":
+                    # O follow-up é criado antes de marcar DONE: a UI nunca vê o job pronto sem ele
+                    follow_up = self._chain(job_id, event[2])
+                    self._update(job_id, status=DONE, result=event[2], progress=1.0, follow_up=follow_up,
+                                 message="Transcrição concluída!", finished_at=time.time())
+                else:
+                    with self._lock:
+                        self._follow_ups.pop(job_id, None)
+                    self._update(job_id, status=ERROR, error=event[2], message="Falha na transcrição",
+                                 finished_at=time.time())
+
+    def _chain(self, job_id, text):
+        with self._lock:
+            extract = self._follow_ups.pop(job_id, None)
+        if extract and text:
+            return self.submit_extraction(text, extract["provider"], extract.get("api_key"), parent=job_id,
+                                          stream=extract.get("stream", False))
+        return None
+
+    def _check_workers(self):
+        # Worker que morreu (ex: OOM) marca seu job como erro e é substituído
+        for pid, proc in list(self._workers.items()):
+            if proc.is_alive() or self._closed:
+                continue
+            del self._workers[pid]
+            with self._lock:
+                self._loaded_by_pid.pop(pid, None)
+            job_id = self._running_by_pid.pop(pid, None)
+            if job_id:
+                self._update(job_id, status=ERROR, error=f"Worker {pid} encerrado (código {proc.exitcode})",
+                             finished_at=time.time())
+            self._spawn_worker()
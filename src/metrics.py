@@ -0,0 +1,149 @@
+import re
+import unicodedata
+import jiwer
+
+_re_spaces = re.compile(r"\s+")
+
+class _CategoryStripTable(dict):
+    """
+    Tabela para str.translate que remove caracteres cujas categorias Unicode começam
+    com um dos prefixos dados. Cada code point é classificado uma única vez e memorizado,
+    então o custo por caractere vira uma consulta de dicionário em C.
+    """
+
+    def __init__(self, prefixes):
+        super().__init__()
+        self.prefixes = tuple(prefixes)
+
+    def __missing__(self, codepoint):
+        value = None if unicodedata.category(chr(codepoint)).startswith(self.prefixes) else codepoint
+        self[codepoint] = value
+        return value
+
+# Controle (C*) para CER; controle e pontuação (C*, P*) para WER
+_CER_TABLE = _CategoryStripTable(["C"])
+_WER_TABLE = _CategoryStripTable(["C", "P"])
+
+def normalize_text_for_wer(text: str) -> str:
+    """
+    Normalização simples e segura para WER:
+    - converte para str, lower
+    - remove caracteres de controle
+    - remove pontuação (mantém letras e dígitos)
+    - normaliza acentuação (NFC)
+    - colapsa espaços
+    Retorna uma string pronta para passar ao jiwer.wer()
+    """
+    if text is None:
+        return ""
+    s = unicodedata.normalize("NFC", str(text).lower())
+    s = s.translate(_WER_TABLE)
+    # Replace non-breaking spaces etc -> normal space
+    s = s.replace("\u00A0", " ")
+    return _re_spaces.sub(" ", s).strip()
+
+def normalize_text_for_cer(text: str) -> str:
+    """
+    Normalização leve para CER: lower + strip + collapse spaces + unicode normalize.
+    We keep more characters so CER is measured on characters.
+    """
+    if text is None:
+        return ""
+    s = unicodedata.normalize("NFC", str(text).lower())
+    s = s.translate(_CER_TABLE)
+    return _re_spaces.sub(" ", s).strip()
+
+class NormalizedReference:
+    """Referência normalizada uma única vez e reaproveitada por todas as engines."""
+
+    __slots__ = ("raw", "wer", "cer")
+
+    def __init__(self, raw: str):
+        self.raw = raw
+        self.wer = normalize_text_for_wer(raw)
+        self.cer = normalize_text_for_cer(raw)
+
+def calcular_wer(ref: str, hyp: str) -> float:
+    """Calcula WER via jiwer.wer após normalização segura."""
+    if not ref or not hyp:
+        return 1.0
+    return float(jiwer.wer(normalize_text_for_wer(ref), normalize_text_for_wer(hyp)))
+
+def calcular_cer(ref: str, hyp: str) -> float:
+    """Calcula CER via jiwer.cer após normalização leve."""
+    if not ref or not hyp:
+        return 1.0
+    return float(jiwer.cer(normalize_text_for_cer(ref), normalize_text_for_cer(hyp)))
+
+def _errors_per_pair(output):
+    """(erros, tamanho da referência) por par, a partir dos alinhamentos do jiwer."""
+    pares = []
+    for ref_tokens, chunks in zip(output.references, output.alignments):
+        erros = 0
+        for chunk in chunks:
+            if chunk.type in ("substitute", "delete"):
+                erros += chunk.ref_end_idx - chunk.ref_start_idx
+            elif chunk.type == "insert":
+                erros += chunk.hyp_end_idx - chunk.hyp_start_idx
+        pares.append((erros, len(ref_tokens)))
+    return pares
+
+def _score_corpus(refs_n, hyps_n, validos, process, unit_len):
+    """
+    Pontua todos os pares válidos com uma única chamada ao jiwer. Os demais
+    (texto vazio, que o jiwer rejeita) recebem erro 1.0 sobre a própria referência.
+    """
+    rates = [1.0] * len(refs_n)
+    erros_total, ref_total = 0, 0
+
+    if validos:
+        output = process([refs_n[i] for i in validos], [hyps_n[i] for i in validos])
+        for i, (erros, tamanho) in zip(validos, _errors_per_pair(output)):
+            rates[i] = erros / tamanho if tamanho else 1.0
+            erros_total += erros
+            ref_total += tamanho
+
+    for i in sorted(set(range(len(refs_n))) - set(validos)):
+        tamanho = max(1, unit_len(refs_n[i]))
+        erros_total += tamanho
+        ref_total += tamanho
+
+    micro = erros_total / ref_total if ref_total else None
+    macro = sum(rates) / len(rates) if rates else None
+    return rates, micro, macro
+
+def score_pairs(refs: list, hyps: list) -> dict:
+    """
+    WER/CER de uma lista de pares em lote. refs pode conter strings ou NormalizedReference
+    (normalizadas uma vez e reaproveitadas entre engines).
+    Retorna as taxas por par e as médias micro (erros totais / tamanho total das
+    referências) e macro (média das taxas por par).
+    Mantém a regra de calcular_wer/calcular_cer: texto bruto vazio vale 1.0.
+    """
+    refs = [r if isinstance(r, NormalizedReference) else NormalizedReference(r) for r in refs]
+    hyps = ["" if h is None else str(h) for h in hyps]
+
+    refs_wer = [r.wer for r in refs]
+    refs_cer = [r.cer for r in refs]
+    hyps_wer = [normalize_text_for_wer(h) for h in hyps]
+    hyps_cer = [normalize_text_for_cer(h) for h in hyps]
+
+    brutos_ok = [bool(r.raw) and bool(h) for r, h in zip(refs, hyps)]
+    validos_wer = [i for i, ok in enumerate(brutos_ok) if ok and refs_wer[i] and hyps_wer[i]]
+    validos_cer = [i for i, ok in enumerate(brutos_ok) if ok and refs_cer[i] and hyps_cer[i]]
+
+    wer, wer_micro, wer_macro = _score_corpus(
+        refs_wer, hyps_wer, validos_wer, jiwer.process_words, lambda r: len(r.split())
+    )
+    cer, cer_micro, cer_macro = _score_corpus(
+        refs_cer, hyps_cer, validos_cer, jiwer.process_characters, len
+    )
+
+    return {
+        "wer": wer,
+        "cer": cer,
+        "wer_micro": wer_micro,
+        "wer_macro": wer_macro,
+        "cer_micro": cer_micro,
+        "cer_macro": cer_macro,
+    }
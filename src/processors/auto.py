@@ -0,0 +1,201 @@
+import os
+import csv
+import json
+import time
+import threading
+import multiprocessing
+from collections import defaultdict
+import numpy as np
+from .base import Transcriber
+from src.audio import load_audio, SAMPLE_RATE
+from src.cache import DEFAULT_CACHE_DIR
+
+DEFAULT_ENGINES = ["Vosk", "Whisper", "Wav2Vec2"]
+PROFILES_PATH = os.path.join(DEFAULT_CACHE_DIR, "engine_profiles.json")
+# Sem medições, a engine é tratada como lenta e imprecisa até ser observada
+UNKNOWN_PROFILE = {"rtf": 1.0, "wer": 1.0, "samples": 0}
+
+class EngineProfiles:
+    """
+    RTF e WER por engine. Semeados a partir da saída do benchmark (metricas_finais.csv)
+    e atualizados online com média móvel exponencial do RTF observado em produção.
+    O estado é persistido em JSON para sobreviver a reinícios.
+    """
+
+    def __init__(self, path=PROFILES_PATH, alpha=0.2):
+        self.path = path
+        self.alpha = alpha
+        self._lock = threading.Lock()
+        self._profiles = {}
+        self._dirty = 0
+        if path and os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self._profiles = json.load(f)
+
+    def seed_from_benchmark(self, csv_path="metricas_finais.csv", overwrite=False):
+        """
+        Média de RTF e WER por Modelo a partir do CSV detalhado do benchmark. Um CSV mais
+        novo que o usado na última semeadura (seed_mtime de cada perfil) substitui o
+        perfil, inclusive o RTF aprendido em uso; overwrite=True força a substituição.
+        """
+        if not os.path.exists(csv_path):
+            return
+        mtime = os.path.getmtime(csv_path)
+        somas = defaultdict(lambda: {"rtf": 0.0, "wer": 0.0, "n": 0})
+        with open(csv_path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                try:
+                    rtf, wer = float(row["RTF"]), float(row["WER"])
+                except (KeyError, TypeError, ValueError):
+                    continue
+                acc = somas[row["Modelo"]]
+                acc["rtf"] += rtf
+                acc["wer"] += wer
+                acc["n"] += 1
+
+        semeados = 0
+        with self._lock:
+            for nome, acc in somas.items():
+                atual = self._profiles.get(nome)
+                novo = atual is None or atual.get("seed_mtime", 0) < mtime
+                if acc["n"] and (overwrite or novo):
+                    self._profiles[nome] = {
+                        "rtf": acc["rtf"] / acc["n"],
+                        "wer": acc["wer"] / acc["n"],
+                        "samples": acc["n"],
+                        "seed_mtime": mtime,
+                    }
+                    semeados += 1
+        if semeados:
+            self.save()
+
+    def get(self, name) -> dict:
+        with self._lock:
+            return dict(self._profiles.get(name, UNKNOWN_PROFILE))
+
+    def observe(self, name, seconds, duration):
+        if duration <= 0:
+            return
+        rtf = seconds / duration
+        with self._lock:
+            prof = self._profiles.setdefault(name, dict(UNKNOWN_PROFILE))
+            # Primeira medição substitui o palpite; as demais suavizam
+            prof["rtf"] = rtf if prof["samples"] == 0 else (1 - self.alpha) * prof["rtf"] + self.alpha * rtf
+            prof["samples"] += 1
+            self._dirty += 1
+            salvar = self._dirty >= 10
+        if salvar:
+            self.save()
+
+    def save(self):
+        if not self.path:
+            return
+        with self._lock:
+            data = json.dumps(self._profiles, indent=2)
+            self._dirty = 0
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(data)
+        os.replace(tmp_path, self.path)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {name: dict(p) for name, p in self._profiles.items()}
+
+class EngineLoad:
+    """
+    Chamadas em andamento por engine, num array compartilhado de multiprocessing:
+    criado pelo processo pai (ver jobs.JobManager) e passado aos workers, dá a todos
+    os processos a mesma visão da carga. Engines fora da lista não são contadas.
+    """
+
+    def __init__(self, engines, ctx=None):
+        self.engines = list(engines)
+        self._index = {name: i for i, name in enumerate(self.engines)}
+        self._counts = (ctx or multiprocessing).Array("i", len(self.engines))
+
+    def add(self, name, delta):
+        i = self._index.get(name)
+        if i is None:
+            return
+        with self._counts.get_lock():
+            self._counts[i] += delta
+
+    def snapshot(self) -> dict:
+        with self._counts.get_lock():
+            return dict(zip(self.engines, self._counts[:]))
+
+class AutoTranscriber(Transcriber):
+    """
+    Escolhe a engine por entrada dentro de um orçamento de latência:
+    tempo previsto = duração x RTF do perfil x (1 + chamadas em andamento na engine).
+    As chamadas em andamento vêm de um EngineLoad; com o do JobManager, contam as
+    transcrições de todos os processos worker, não só as deste.
+    Entre as engines que cabem no orçamento, usa a de menor WER; se nenhuma cabe
+    (áudio longo ou carga alta), usa a de menor tempo previsto.
+    Cada chamada realimenta o perfil da engine escolhida com o RTF medido.
+    """
+
+    def __init__(self, latency_budget_s=10.0, engines=None, profiles: EngineProfiles = None,
+                 pool=None, benchmark_csv="metricas_finais.csv", load: EngineLoad = None):
+        from src.processors.pool import ModelPool, DEFAULT_BUDGET_MB
+
+        self.latency_budget_s = float(latency_budget_s)
+        self.engines = list(engines or DEFAULT_ENGINES)
+        self.profiles = profiles or EngineProfiles()
+        self.profiles.seed_from_benchmark(benchmark_csv)
+        # Idealmente o mesmo pool do processo (ver jobs._worker_main); sem ele, um pool próprio
+        self._own_pool = pool is None
+        self.pool = pool or ModelPool(budget_mb=float(os.getenv("ASR_MEMORY_BUDGET_MB", DEFAULT_BUDGET_MB)))
+        self.load = load or EngineLoad(self.engines)
+        self.last_choice = None
+
+    def cache_signature(self) -> dict:
+        return {"engines": self.engines, "latency_budget_s": self.latency_budget_s}
+
+    def memory_footprint(self) -> int:
+        # Com o pool do processo, as engines internas já são contadas nele: o roteador
+        # em si não tem pesos, e somá-las aqui as contaria duas vezes
+        return self.pool.used_bytes() if self._own_pool else 0
+
+    def choose(self, duration: float) -> dict:
+        """Engine escolhida para um áudio de `duration` segundos, com a previsão de cada uma."""
+        inflight = self.load.snapshot()
+
+        candidatos = []
+        for name in self.engines:
+            prof = self.profiles.get(name)
+            previsto = duration * prof["rtf"] * (1 + inflight.get(name, 0))
+            candidatos.append({"engine": name, "predicted_s": previsto, "wer": prof["wer"], "rtf": prof["rtf"]})
+
+        cabem = [c for c in candidatos if c["predicted_s"] <= self.latency_budget_s]
+        if cabem:
+            escolha = min(cabem, key=lambda c: (c["wer"], c["predicted_s"]))
+        else:
+            escolha = min(candidatos, key=lambda c: c["predicted_s"])
+        return {**escolha, "within_budget": bool(cabem), "candidates": candidatos}
+
+    def transcribe(self, audio_path: str) -> str:
+        return self.transcribe_array(load_audio(audio_path).samples)
+
+    def transcribe_bytes(self, data: bytes, suffix: str = ".tmp") -> str:
+        return self.transcribe_array(load_audio(data).samples)
+
+    def transcribe_array(self, samples: np.ndarray) -> str:
+        duration = len(samples) / SAMPLE_RATE
+        escolha = self.choose(duration)
+        name = escolha["engine"]
+
+        self.load.add(name, 1)
+        try:
+            with self.pool.lease(name) as engine:
+                start = time.time()
+                text = engine.transcribe_array(samples)
+                seconds = time.time() - start
+        finally:
+            self.load.add(name, -1)
+
+        self.profiles.observe(name, seconds, duration)
+        self.last_choice = {**escolha, "actual_s": seconds, "duration_s": duration}
+        return text
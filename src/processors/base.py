@@ -1,6 +1,106 @@
+import os
+import tempfile
 from abc import ABC, abstractmethod
+import numpy as np
 
 class Transcriber(ABC):
+    # True se a mesma instância aceita chamadas concorrentes de várias threads
+    # (ex: Vosk, que cria um recognizer por chamada). Usado por src.segmentation.
+    thread_safe = False
+
     @abstractmethod
     def transcribe(self, audio_path: str) -> str:
-        pass
\ No newline at end of file
+        pass
+
+    def cache_signature(self) -> dict:
+        """Identifica modelo e opções de decodificação; usado na chave do cache de transcrições."""
+        return {}
+
+    def memory_footprint(self) -> int:
+        """Bytes residentes do modelo carregado (0 = desconhecido; o ModelPool mede pelo RSS)."""
+        return 0
+
+    @staticmethod
+    def _module_bytes(module) -> int:
+        """Tamanho de parâmetros + buffers de um torch.nn.Module."""
+        tensors = list(module.parameters()) + list(module.buffers())
+        return sum(t.numel() * t.element_size() for t in tensors)
+
+    def transcribe_array(self, samples: np.ndarray) -> str:
+        """
+        Transcreve áudio já decodificado (float32 Mono 16kHz, ver src.audio.load_audio).
+        Fallback via WAV temporário; engines que aceitam arrays sobrescrevem.
+        """
+        import soundfile as sf
+
+        with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as tmp_file:
+            tmp_path = tmp_file.name
+        try:
+            sf.write(tmp_path, samples, 16000, subtype="PCM_16")
+            return self.transcribe(tmp_path)
+        finally:
+            os.remove(tmp_path)
+
+    def transcribe_batch(self, audios: list, batch_size: int = 8) -> list:
+        """
+        Transcreve uma lista de áudios (caminhos ou arrays float32 16kHz),
+        retornando os textos na mesma ordem.
+        Fallback sequencial; engines com suporte a batch real sobrescrevem.
+        """
+        return [self._transcribe_item(audio) for audio in audios]
+
+    def transcribe_bytes(self, data: bytes, suffix: str = ".tmp") -> str:
+        """
+        Transcreve o conteúdo bruto de um arquivo de áudio (ex: upload do Streamlit).
+        Fallback via arquivo temporário; engines que decodificam em memória sobrescrevem.
+        """
+        with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp_file:
+            tmp_file.write(data)
+            tmp_path = tmp_file.name
+        try:
+            return self.transcribe(tmp_path)
+        finally:
+            os.remove(tmp_path)
+
+    def transcribe_stream(self, chunks, segment_seconds: float = 5.0):
+        """
+        Transcrição incremental de PCM int16 mono 16kHz que chega em pedaços (ex: microfone).
+        Gera dicts {"text": ..., "final": bool}; hipóteses parciais podem ser substituídas,
+        finais não mudam mais.
+        Fallback em blocos: a cada ~segment_seconds de áudio, o bloco é cortado no frame
+        mais silencioso da sua segunda metade e transcrito por transcribe_array; blocos
+        sem um trecho de fala (detect_speech) nem chegam à engine, que tende a inventar
+        texto sobre silêncio e ruído. Engines com reconhecimento incremental sobrescrevem.
+        """
+        from src.audio import pcm16_to_float
+        from src.segmentation import energy_vad, detect_speech
+
+        block_bytes = int(segment_seconds * 16000) * 2
+        buffer = bytearray()
+
+        def emit(pcm):
+            samples = pcm16_to_float(pcm)
+            if detect_speech(samples):
+                text = self.transcribe_array(samples).strip()
+                if text:
+                    yield {"text": text, "final": True}
+
+        for chunk in chunks:
+            buffer.extend(chunk)
+            if len(buffer) < block_bytes:
+                continue
+            samples = pcm16_to_float(bytes(buffer))
+            _, db, frame = energy_vad(samples)
+            half = len(db) // 2
+            cut = (half + int(np.argmin(db[half:]))) * frame * 2 if len(db) else len(buffer)
+            cut = cut or len(buffer)
+            yield from emit(bytes(buffer[:cut]))
+            del buffer[:cut]
+
+        if buffer:
+            yield from emit(bytes(buffer))
+
+    def _transcribe_item(self, audio) -> str:
+        if isinstance(audio, np.ndarray):
+            return self.transcribe_array(audio)
+        return self.transcribe(audio)
@@ -0,0 +1,96 @@
+import os
+import time
+import numpy as np
+from .base import Transcriber
+from src.cache import LRUCache, DEFAULT_CACHE_DIR, hash_bytes, hash_file, make_key
+
+class CachedTranscriber(Transcriber):
+    """
+    Envolve qualquer Transcriber com cache de transcrições endereçado por conteúdo.
+    Chave: (hash do áudio, classe da engine, cache_signature(), modo de decodificação).
+    Cada entrada guarda o texto e o tempo de inferência original, exposto em
+    last_inference_seconds para que o RTF continue válido em cache hits.
+    """
+
+    def __init__(self, engine: Transcriber, cache: LRUCache = None):
+        self.engine = engine
+        self.cache = cache or LRUCache(db_path=os.path.join(DEFAULT_CACHE_DIR, "transcricoes.sqlite"))
+        self.last_inference_seconds = 0.0
+
+    @property
+    def thread_safe(self) -> bool:
+        return self.engine.thread_safe
+
+    def cache_signature(self) -> dict:
+        return self.engine.cache_signature()
+
+    def memory_footprint(self) -> int:
+        return self.engine.memory_footprint()
+
+    def transcribe(self, audio_path: str) -> str:
+        return self._cached(hash_file(audio_path), lambda: self.engine.transcribe(audio_path))
+
+    def transcribe_array(self, samples: np.ndarray) -> str:
+        return self._cached(self._digest(samples), lambda: self.engine.transcribe_array(samples))
+
+    def transcribe_bytes(self, data: bytes, suffix: str = ".tmp") -> str:
+        # Mesmo hash de transcribe() sobre o arquivo em disco com este conteúdo
+        return self._cached(hash_bytes(data), lambda: self.engine.transcribe_bytes(data, suffix))
+
+    def transcribe_stream(self, chunks, **kwargs):
+        # Áudio ao vivo não se repete: vai direto para a engine
+        return self.engine.transcribe_stream(chunks, **kwargs)
+
+    def transcribe_batch(self, audios: list, batch_size: int = 8) -> list:
+        batched = batch_size > 1
+        keys = [self._key(self._digest(audio), batched) for audio in audios]
+        results = [None] * len(audios)
+        total_seconds = 0.0
+
+        faltantes = []
+        for i, key in enumerate(keys):
+            entry = self.cache.get(key)
+            if entry is None:
+                faltantes.append(i)
+            else:
+                results[i] = entry["text"]
+                total_seconds += entry["seconds"]
+
+        if faltantes:
+            start = time.time()
+            textos = self.engine.transcribe_batch([audios[i] for i in faltantes], batch_size=batch_size)
+            elapsed = time.time() - start
+            total_seconds += elapsed
+
+            # Tempo do batch rateado igualmente entre os itens transcritos
+            por_item = elapsed / len(faltantes)
+            for i, text in zip(faltantes, textos):
+                results[i] = text
+                self.cache.put(keys[i], {"text": text, "seconds": por_item})
+
+        self.last_inference_seconds = total_seconds
+        return results
+
+    def stats(self) -> dict:
+        return self.cache.stats()
+
+    def _digest(self, audio) -> str:
+        if isinstance(audio, np.ndarray):
+            return "pcm:" + hash_bytes(np.ascontiguousarray(audio, dtype=np.float32).tobytes())
+        return hash_file(audio)
+
+    def _key(self, digest, batched=False) -> str:
+        return make_key(digest, type(self.engine).__name__, self.engine.cache_signature(), {"batch": batched})
+
+    def _cached(self, digest, compute) -> str:
+        key = self._key(digest)
+        entry = self.cache.get(key)
+        if entry is not None:
+            self.last_inference_seconds = entry["seconds"]
+            return entry["text"]
+
+        start = time.time()
+        text = compute()
+        self.last_inference_seconds = time.time() - start
+        self.cache.put(key, {"text": text, "seconds": self.last_inference_seconds})
+        return text
@@ -0,0 +1,141 @@
+import os
+import gc
+import sys
+import time
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+import numpy as np
+from src.processors.registry import build_engine
+
+DEFAULT_BUDGET_MB = 4096
+
+def process_rss_bytes() -> int:
+    """Memória residente atual do processo (Linux via /proc; 0 se indisponível)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+class ModelPool:
+    """
+    Pool de engines carregadas sob um orçamento de memória.
+    - o tamanho residente de cada engine vem de Transcriber.memory_footprint()
+      (ou do aumento de RSS durante a carga, se a engine não souber informar);
+    - ao carregar uma engine que estoura o orçamento, as menos usadas recentemente
+      são descarregadas (exceto as que estão em uso via lease());
+    - preload() carrega e aquece engines na subida do servidor.
+    """
+
+    def __init__(self, budget_mb=DEFAULT_BUDGET_MB, factory=build_engine):
+        self.budget_bytes = int(budget_mb * 1024 * 1024)
+        self.factory = factory
+        self._engines = OrderedDict()
+        self._info = {}
+        self._known_sizes = {}
+        self._leases = {}
+        self._lock = threading.RLock()
+        self.loads = 0
+        self.evictions = 0
+
+    def get(self, name: str, **kwargs):
+        with self._lock:
+            if name in self._engines:
+                self._engines.move_to_end(name)
+                self._info[name]["last_used"] = time.time()
+                return self._engines[name]
+
+            # Abre espaço com base no tamanho visto em cargas anteriores, se houver
+            self._evict_until(self.budget_bytes - self._known_sizes.get(name, 0), keep=name)
+
+            rss_before = process_rss_bytes()
+            start = time.time()
+            engine = self.factory(name, **kwargs)
+            load_seconds = time.time() - start
+            size = engine.memory_footprint() or max(0, process_rss_bytes() - rss_before)
+
+            self._engines[name] = engine
+            self._known_sizes[name] = size
+            self._info[name] = {
+                "bytes": size,
+                "load_seconds": load_seconds,
+                "loaded_at": time.time(),
+                "last_used": time.time(),
+            }
+            self.loads += 1
+
+            self._evict_until(self.budget_bytes, keep=name)
+            return engine
+
+    @contextmanager
+    def lease(self, name: str, **kwargs):
+        """Engine protegida de descarga enquanto o bloco executa."""
+        with self._lock:
+            engine = self.get(name, **kwargs)
+            self._leases[name] = self._leases.get(name, 0) + 1
+        try:
+            yield engine
+        finally:
+            with self._lock:
+                self._leases[name] -= 1
+
+    def preload(self, names, warmup=True):
+        """Carrega (e opcionalmente aquece com 1s de silêncio) as engines na ordem dada."""
+        for name in names:
+            engine = self.get(name)
+            if warmup:
+                try:
+                    engine.transcribe_array(np.zeros(16000, dtype=np.float32))
+                except Exception as e:
+                    print(f"Aquecimento de {name} falhou: {e}")
+
+    def unload(self, name: str):
+        with self._lock:
+            if self._leases.get(name):
+                return False
+            engine = self._engines.pop(name, None)
+            self._info.pop(name, None)
+        if engine is None:
+            return False
+        del engine
+        _release_memory()
+        return True
+
+    def loaded(self) -> list:
+        """Engines residentes, da menos para a mais recentemente usada."""
+        with self._lock:
+            return [
+                {"name": name, "in_use": self._leases.get(name, 0), **self._info[name]}
+                for name in self._engines
+            ]
+
+    def used_bytes(self) -> int:
+        with self._lock:
+            return sum(info["bytes"] for info in self._info.values())
+
+    def _evict_until(self, limit_bytes, keep=None):
+        for name in list(self._engines):
+            if self.used_bytes() <= limit_bytes:
+                return
+            if name == keep or self._leases.get(name):
+                continue
+            print(f"Descarregando {name} para respeitar o orçamento de memória...")
+            self._engines.pop(name)
+            self._info.pop(name)
+            self.evictions += 1
+            _release_memory()
+
+def _release_memory():
+    gc.collect()
+    torch = sys.modules.get("torch")
+    if torch is not None and torch.cuda.is_available():
+        torch.cuda.empty_cache()
+
+def pool_from_env() -> ModelPool:
+    """ASR_MEMORY_BUDGET_MB define o orçamento; ASR_PRELOAD (ex: "Whisper,Vosk") o que carregar na subida."""
+    pool = ModelPool(budget_mb=float(os.getenv("ASR_MEMORY_BUDGET_MB", DEFAULT_BUDGET_MB)))
+    preload = [n.strip() for n in os.getenv("ASR_PRELOAD", "").split(",") if n.strip()]
+    if preload:
+        pool.preload(preload)
+    return pool
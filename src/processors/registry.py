@@ -0,0 +1,39 @@
+import os
+import threading
+from src.utils import timed_import
+
+# Nome exibido -> (módulo, classe, argumentos padrão). O módulo (e com ele whisper,
+# transformers ou vosk) só é importado quando a engine é construída pela primeira vez.
+ENGINES = {
+    "Whisper": ("src.processors.whisper_engine", "WhisperTranscriber", {"model_size": "base"}),
+    "Wav2Vec2": ("src.processors.wav2vec_engine", "Wav2VecTranscriber", {}),
+    "Wav2Vec2 (int8)": ("src.processors.wav2vec_engine", "Wav2VecTranscriber", {"quantize": "int8"}),
+    "Wav2Vec2 (streaming)": ("src.processors.wav2vec_engine", "Wav2VecTranscriber", {"streaming": True}),
+    # Roteador: escolhe entre as engines acima pelo orçamento de latência (ver auto.py)
+    "Auto": ("src.processors.auto", "AutoTranscriber", {"latency_budget_s": float(os.getenv("ASR_LATENCY_BUDGET_S", "10"))}),
+    # VOSK_WORKERS: threads do transcribe_batch do Vosk (padrão: todos os núcleos)
+    "Vosk": ("src.processors.vosk_engine", "VoskTranscriber",
+             {"model_path": "models/vosk-model-small-pt-0.3", "workers": int(os.getenv("VOSK_WORKERS", "0")) or None}),
+}
+
+_lock = threading.Lock()
+
+def register_engine(name: str, module: str, class_name: str, **defaults):
+    with _lock:
+        ENGINES[name] = (module, class_name, defaults)
+
+def available_engines() -> list:
+    return list(ENGINES)
+
+def get_engine_class(name: str):
+    if name not in ENGINES:
+        raise KeyError(f"Engine desconhecida: {name}. Disponíveis: {', '.join(ENGINES)}")
+    module, class_name, _ = ENGINES[name]
+    return getattr(timed_import(module), class_name)
+
+def build_engine(name: str, **kwargs):
+    """Importa (na primeira vez) e instancia a engine com os padrões registrados + kwargs."""
+    cls = get_engine_class(name)
+    options = dict(ENGINES[name][2])
+    options.update(kwargs)
+    return cls(**options)
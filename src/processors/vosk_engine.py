@@ -1,42 +1,188 @@
 import os
-import wave
 import json
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 from vosk import Model, KaldiRecognizer
 from .base import Transcriber
-from src.utils import prepare_audio_for_vosk
+from src.utils import audio_to_pcm16, VOSK_SAMPLE_RATE
+from src.audio import float_to_pcm16
+from src.profiling import span
+
+# 1s de áudio PCM int16 mono a 16kHz por chamada ao AcceptWaveform
+CHUNK_BYTES = VOSK_SAMPLE_RATE * 2
+
+def recognize(rec, pcm: bytes) -> str:
+    """Passa PCM int16 mono 16kHz pelo recognizer em blocos de 1s e junta os resultados."""
+    view = memoryview(pcm)
+    final_text = ""
+    for start in range(0, len(view), CHUNK_BYTES):
+        if rec.AcceptWaveform(bytes(view[start:start + CHUNK_BYTES])):
+            res = json.loads(rec.Result())
+            final_text += res.get("text", "") + " "
+
+    # FinalResult encerra a frase: o mesmo recognizer pode receber o próximo áudio
+    res = json.loads(rec.FinalResult())
+    final_text += res.get("text", "")
+    return final_text.strip()
+
+def _to_pcm(audio) -> bytes:
+    if isinstance(audio, np.ndarray):
+        return float_to_pcm16(audio)
+    return audio_to_pcm16(audio)
+
+class RecognizerPool:
+    """
+    N threads que compartilham o mesmo Model (somente leitura). Cada thread mantém
+    seu próprio KaldiRecognizer e o reaproveita entre os itens; o Kaldi libera o GIL
+    durante a decodificação, então as threads ocupam núcleos diferentes.
+    A conversão para PCM (FFmpeg para arquivos) também roda nas threads.
+    Registra, por thread, itens, tempo ocupado e segundos de áudio para medir a utilização.
+    """
+
+    def __init__(self, model, workers=None):
+        self.model = model
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="vosk")
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.reset_stats()
+
+    def map(self, audios, on_progress=None) -> list:
+        """Textos na mesma ordem de audios (caminhos, bytes de arquivo ou arrays float32 16kHz)."""
+        futures = [self._executor.submit(self._run, audio) for audio in audios]
+        textos = []
+        for i, future in enumerate(futures, 1):
+            textos.append(future.result())
+            if on_progress:
+                on_progress(i / len(futures))
+        return textos
+
+    def utilization(self) -> list:
+        """Por thread: itens, segundos ocupados, segundos de áudio e fração do tempo ocupada desde reset_stats()."""
+        with self._lock:
+            wall = time.perf_counter() - self._since
+            return [
+                {"worker": name, **st, "utilizacao": st["busy_s"] / wall if wall > 0 else 0.0}
+                for name, st in sorted(self._stats.items())
+            ]
+
+    def reset_stats(self):
+        with self._lock:
+            self._stats = {}
+            self._since = time.perf_counter()
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+
+    def _recognizer(self):
+        rec = getattr(self._local, "rec", None)
+        if rec is None:
+            rec = self._local.rec = KaldiRecognizer(self.model, VOSK_SAMPLE_RATE)
+        return rec
+
+    def _run(self, audio) -> str:
+        start = time.perf_counter()
+        pcm = _to_pcm(audio)
+        try:
+            with span("inference", engine="Vosk"):
+                text = recognize(self._recognizer(), pcm)
+        except Exception:
+            # Estado do recognizer é incerto após a falha: a thread cria outro no próximo item
+            self._local.rec = None
+            raise
+        busy = time.perf_counter() - start
+
+        with self._lock:
+            st = self._stats.setdefault(threading.current_thread().name,
+                                        {"itens": 0, "busy_s": 0.0, "audio_s": 0.0})
+            st["itens"] += 1
+            st["busy_s"] += busy
+            st["audio_s"] += len(pcm) / (2 * VOSK_SAMPLE_RATE)
+        return text
 
 class VoskTranscriber(Transcriber):
-    def __init__(self, model_path="models/vosk-model-small-pt-0.3"):
+    # Model é compartilhado e somente leitura; cada chamada usa seu próprio KaldiRecognizer
+    thread_safe = True
+
+    def __init__(self, model_path="models/vosk-model-small-pt-0.3", workers=None):
         if not os.path.exists(model_path):
             raise FileNotFoundError(
                 f"Modelo Vosk não encontrado em: {model_path}. "
                 "Baixe em https://alphacephei.com/vosk/models e extraia na pasta models/"
             )
         print("Carregando Vosk...")
+        self.model_path = model_path
         self.model = Model(model_path)
+        # Threads do transcribe_batch (None = todos os núcleos); o pool só é criado no primeiro batch
+        self.workers = workers
+        self._pool = None
+        self._pool_lock = threading.Lock()
+
+    def cache_signature(self) -> dict:
+        return {"model_path": os.path.basename(os.path.normpath(self.model_path)), "sample_rate": VOSK_SAMPLE_RATE}
+
+    def memory_footprint(self) -> int:
+        # O modelo Kaldi é carregado por inteiro: o tamanho da pasta é uma boa aproximação
+        total = 0
+        for root, _, files in os.walk(self.model_path):
+            total += sum(os.path.getsize(os.path.join(root, f)) for f in files)
+        return total
 
     def transcribe(self, audio_path: str) -> str:
-        # Converter áudio para formato aceito pelo Vosk
-        wav_path = prepare_audio_for_vosk(audio_path)
-        
-        wf = wave.open(wav_path, "rb")
-        rec = KaldiRecognizer(self.model, wf.getframerate())
-        
-        final_text = ""
-        while True:
-            data = wf.readframes(4000)
-            if len(data) == 0:
-                break
-            if rec.AcceptWaveform(data):
-                res = json.loads(rec.Result())
-                final_text += res.get("text", "") + " "
-        
-        res = json.loads(rec.FinalResult())
-        final_text += res.get("text", "")
-        
-        # Limpar arquivo temporário
-        wf.close()
-        if os.path.exists(wav_path):
-            os.remove(wav_path)
-            
-        return final_text.strip()
\ No newline at end of file
+        # Converter áudio para formato aceito pelo Vosk (em memória)
+        return self.transcribe_pcm(audio_to_pcm16(audio_path))
+
+    def transcribe_array(self, samples: np.ndarray) -> str:
+        return self.transcribe_pcm(float_to_pcm16(samples))
+
+    def transcribe_bytes(self, data: bytes, suffix: str = ".tmp") -> str:
+        return self.transcribe_pcm(audio_to_pcm16(data))
+
+    @property
+    def recognizer_pool(self) -> RecognizerPool:
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = RecognizerPool(self.model, self.workers)
+            return self._pool
+
+    def transcribe_batch(self, audios: list, batch_size: int = 8) -> list:
+        """
+        Arquivos ou segmentos em paralelo no RecognizerPool, um por thread, todos sobre
+        o mesmo Model. O paralelismo vem de workers; batch_size não se aplica ao Vosk.
+        """
+        if len(audios) <= 1:
+            return [self._transcribe_item(audio) for audio in audios]
+        return self.recognizer_pool.map(audios)
+
+    def utilization(self) -> list:
+        """Utilização por thread do transcribe_batch (vazio se nenhum batch rodou)."""
+        return self._pool.utilization() if self._pool is not None else []
+
+    def transcribe_stream(self, chunks, segment_seconds: float = None):
+        """Um recognizer por stream: PartialResult a cada pedaço, Result a cada fim de frase."""
+        rec = KaldiRecognizer(self.model, VOSK_SAMPLE_RATE)
+        last_partial = ""
+
+        for chunk in chunks:
+            if rec.AcceptWaveform(bytes(chunk)):
+                last_partial = ""
+                text = json.loads(rec.Result()).get("text", "")
+                if text:
+                    yield {"text": text, "final": True}
+            else:
+                partial = json.loads(rec.PartialResult()).get("partial", "")
+                if partial and partial != last_partial:
+                    last_partial = partial
+                    yield {"text": partial, "final": False}
+
+        text = json.loads(rec.FinalResult()).get("text", "")
+        if text:
+            yield {"text": text, "final": True}
+
+    def transcribe_pcm(self, pcm: bytes) -> str:
+        """Reconhece PCM int16 mono 16kHz. Um recognizer por chamada: seguro entre threads."""
+        rec = KaldiRecognizer(self.model, VOSK_SAMPLE_RATE)
+        with span("inference", engine="Vosk"):
+            return recognize(rec, pcm)
@@ -1,21 +1,279 @@
 from transformers import pipeline
 import os
+import numpy as np
 from .base import Transcriber
+from src.cache import DEFAULT_CACHE_DIR, make_key
+from src.audio import pcm16_to_float
+from src.utils import stream_ffmpeg
+from src.profiling import span
+
+SAMPLE_RATE = 16000
+QUANTIZE_MODES = (None, "int8")
+QUANTIZED_DIR = os.path.join(DEFAULT_CACHE_DIR, "quantized")
+# Menor janela aceita pelo extrator convolucional do Wav2Vec2 (25ms)
+MIN_WINDOW_SAMPLES = 400
 
 class Wav2VecTranscriber(Transcriber):
-    def __init__(self, model_id="models/wav2vec-pt-br"):
+    def __init__(self, model_id="models/wav2vec-pt-br", quantize=None, streaming=False,
+                 chunk_length_s=30, context_s=5):
+        """
+        quantize="int8": quantização dinâmica int8 das camadas Linear (PyTorch, só CPU).
+        O modelo quantizado é salvo em .cache/quantized/ e reaproveitado nas próximas cargas.
+        streaming=True: transcribe()/transcribe_bytes() usam transcribe_long(), com memória
+        constante independente da duração do arquivo.
+        """
+        if quantize not in QUANTIZE_MODES:
+            raise ValueError(f"quantize inválido: {quantize}. Use um de {QUANTIZE_MODES}")
 
         if not os.path.exists(model_id):
              print(f"Pasta local '{model_id}' não encontrada. Tentando download online...")
              model_id = "jonatasgrosman/wav2vec2-large-xlsr-53-portuguese"
 
-        print(f"Carregando Wav2Vec2 ({model_id})...")
-        self.pipe = pipeline("automatic-speech-recognition", model=model_id, chunk_length_s=30)
+        print(f"Carregando Wav2Vec2 ({model_id}{', int8' if quantize else ''})...")
+        self.model_id = model_id
+        self.quantize = quantize
+        self.streaming = streaming
+        self.chunk_length_s = chunk_length_s
+        self.context_s = context_s
+        # Mesmo decodificador nos dois pipelines: a diferença de WER do int8 vem só da quantização
+        self.decoder = self._load_decoder(model_id)
+        if quantize:
+            self.pipe = pipeline(
+                "automatic-speech-recognition",
+                model=self._load_quantized(model_id),
+                tokenizer=model_id,
+                feature_extractor=model_id,
+                decoder=self.decoder,
+                chunk_length_s=30,
+                device=-1,
+            )
+        else:
+            self.pipe = pipeline("automatic-speech-recognition", model=model_id, decoder=self.decoder, chunk_length_s=30)
+
+    def cache_signature(self) -> dict:
+        signature = {"model_id": self.model_id, "chunk_length_s": 30}
+        if self.quantize:
+            # Só entra na chave quando ativo: transcrições fp32 já em cache continuam válidas
+            signature["quantize"] = self.quantize
+            if self.decoder is not None:
+                # O int8 decodificava sem LM: transcrições antigas dele não valem mais
+                signature["lm"] = True
+        if self.streaming:
+            # Decodificação gulosa por janelas: resultado pode diferir do pipeline
+            signature["streaming"] = {"chunk_length_s": self.chunk_length_s, "context_s": self.context_s}
+        return signature
+
+    def memory_footprint(self) -> int:
+        if self.quantize:
+            # Pesos int8 ficam em _packed_params, fora de parameters()/buffers()
+            return _state_bytes(self.pipe.model.state_dict())
+        return self._module_bytes(self.pipe.model)
+
+    @staticmethod
+    def _load_decoder(model_id):
+        """
+        Decodificador com modelo de linguagem (pyctcdecode + kenlm), se o modelo trouxer um
+        e os pacotes estiverem instalados; None decodifica de forma gulosa. O pipeline só o
+        carrega sozinho quando recebe o modelo pelo nome, não um objeto (caso do int8).
+        """
+        try:
+            import kenlm  # noqa: F401
+            from pyctcdecode import BeamSearchDecoderCTC
+            from transformers import AutoFeatureExtractor
+        except ImportError:
+            return None
+
+        processor_class = getattr(AutoFeatureExtractor.from_pretrained(model_id), "_processor_class", None) or ""
+        if not processor_class.endswith("WithLM"):
+            return None
+        if os.path.isdir(model_id):
+            return BeamSearchDecoderCTC.load_from_dir(model_id)
+        allow_patterns = [
+            os.path.join(BeamSearchDecoderCTC._LANGUAGE_MODEL_SERIALIZED_DIRECTORY, "*"),
+            BeamSearchDecoderCTC._ALPHABET_SERIALIZED_FILENAME,
+        ]
+        return BeamSearchDecoderCTC.load_from_hf_hub(model_id, allow_patterns=allow_patterns)
+
+    @staticmethod
+    def _load_quantized(model_id):
+        import torch
+        import transformers
+
+        # Artefato atrelado às versões do torch/transformers (o módulo é salvo via pickle)
+        # e, para pastas locais, à data de modificação dos pesos
+        mtime = max((os.path.getmtime(os.path.join(model_id, f)) for f in os.listdir(model_id)), default=0) \
+            if os.path.isdir(model_id) else 0
+        key = make_key(model_id, mtime, torch.__version__, transformers.__version__)[:16]
+        path = os.path.join(QUANTIZED_DIR, f"wav2vec2-int8-{key}.pt")
+
+        if os.path.exists(path):
+            print(f"Usando Wav2Vec2 quantizado em cache: {path}")
+            return torch.load(path, weights_only=False)
+
+        from transformers import AutoModelForCTC
+
+        print("Quantizando Wav2Vec2 (int8 dinâmico nas camadas Linear)...")
+        model = AutoModelForCTC.from_pretrained(model_id).eval()
+        quantized = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+        os.makedirs(QUANTIZED_DIR, exist_ok=True)
+        tmp_path = path + ".tmp"
+        torch.save(quantized, tmp_path)
+        os.replace(tmp_path, path)
+        return quantized
 
     def transcribe(self, audio_path: str) -> str:
         if not os.path.exists(audio_path):
             raise FileNotFoundError(f"Arquivo não encontrado: {audio_path}")
-        
-        result = self.pipe(audio_path)
-        
-        return result.get("text", "")
\ No newline at end of file
+
+        if self.streaming:
+            return self.transcribe_long(audio_path)
+
+        with span("inference", engine="Wav2Vec2"):
+            result = self.pipe(audio_path)
+
+        return result.get("text", "")
+
+    def transcribe_array(self, samples: np.ndarray) -> str:
+        with span("inference", engine="Wav2Vec2"):
+            result = self.pipe(self._as_input(samples))
+        return result.get("text", "")
+
+    def transcribe_bytes(self, data: bytes, suffix: str = ".tmp") -> str:
+        if self.streaming:
+            return self.transcribe_long(data)
+        return super().transcribe_bytes(data, suffix)
+
+    def transcribe_long(self, source, chunk_length_s=None, context_s=None) -> str:
+        """
+        Transcreve um arquivo (caminho ou bytes) de qualquer duração com memória constante:
+        o FFmpeg entrega o áudio em blocos e só a janela atual (contexto + chunk + contexto)
+        fica em memória.
+        """
+        chunk_length_s = chunk_length_s or self.chunk_length_s
+        # Blocos de um chunk (ao menos uma amostra f32): int(chunk_length_s) zeraria chunks < 1s
+        block_bytes = max(1, int(chunk_length_s * SAMPLE_RATE)) * 4
+        blocks = (
+            np.frombuffer(raw, dtype="<f4")
+            for raw in stream_ffmpeg(source, SAMPLE_RATE, "f32le", block_bytes=block_bytes)
+        )
+        words = self._stream_ctc(blocks, chunk_length_s, self.context_s if context_s is None else context_s)
+        return " ".join(w for w in words if w)
+
+    def transcribe_stream(self, chunks, segment_seconds: float = 5.0):
+        """Janelas de segment_seconds com 1s de contexto; emite as palavras completas de cada janela."""
+        blocks = (pcm16_to_float(bytes(chunk)) for chunk in chunks)
+        for text in self._stream_ctc(blocks, segment_seconds, min(1.0, segment_seconds / 2)):
+            if text:
+                yield {"text": text, "final": True}
+
+    def _stream_ctc(self, blocks, chunk_length_s, context_s):
+        """
+        Inferência por janelas com stride sobre blocos float32 16kHz: cada janela tem
+        context_s de contexto à esquerda e à direita, e só os frames de logits do centro
+        (chunk_length_s) são aproveitados. A decodificação CTC gulosa é feita de forma
+        incremental (o último token de uma janela é levado para a seguinte, para não
+        duplicar letras na emenda) e cada janela emite as palavras já completas.
+        Memória limitada à janela atual e aos tokens da palavra em aberto.
+        """
+        import torch
+
+        model, tokenizer = self.pipe.model, self.pipe.tokenizer
+        extractor = self.pipe.feature_extractor
+        blank, delimiter = tokenizer.pad_token_id, tokenizer.word_delimiter_token_id
+
+        # Cada frame de logits cobre um passo fixo de amostras (320 no Wav2Vec2). Chunk e
+        # contexto múltiplos do passo mantêm os frames de janelas vizinhas alinhados: o
+        # centro de cada janela emenda no da anterior sem perder nem repetir frames
+        stride = int(getattr(model.config, "inputs_to_logits_ratio", 320))
+        chunk_n = max(1, int(chunk_length_s * SAMPLE_RATE) // stride) * stride
+        context_n = int(context_s * SAMPLE_RATE) // stride * stride
+        buffer = np.zeros(0, dtype=np.float32)
+        offset = 0      # posição absoluta de buffer[0]
+        pos = 0         # início absoluto do próximo chunk central
+        prev_id = None
+        pending = []    # ids da palavra ainda não terminada
+
+        def decode_window(final=False):
+            nonlocal prev_id, pending
+            start = max(0, pos - context_n)
+            end = offset + len(buffer) if final else pos + chunk_n + context_n
+            window = buffer[start - offset:end - offset]
+            center_end = min(pos + chunk_n, end)
+            if len(window) < MIN_WINDOW_SAMPLES:
+                return None
+
+            with span("features", engine="Wav2Vec2"):
+                inputs = extractor(window, sampling_rate=SAMPLE_RATE, return_tensors="pt")
+            with span("inference", engine="Wav2Vec2"), torch.no_grad():
+                logits = model(inputs.input_values.to(model.device)).logits[0]
+            ids = logits.argmax(dim=-1).tolist()
+
+            first = (pos - start) // stride
+            # O último frame de uma janela pode faltar (campo receptivo de 400 amostras)
+            last = len(ids) if center_end == end else min(len(ids), (center_end - start) // stride)
+            for token in ids[first:last]:
+                if token != prev_id and token != blank:
+                    pending.append(token)
+                prev_id = token
+
+            if final:
+                done, pending = pending, []
+            elif delimiter in pending:
+                cut = len(pending) - pending[::-1].index(delimiter)
+                done, pending = pending[:cut], pending[cut:]
+            else:
+                return None
+            with span("postprocess", engine="Wav2Vec2"):
+                return tokenizer.decode(done, group_tokens=False)
+
+        for block in blocks:
+            buffer = np.concatenate([buffer, block.astype(np.float32, copy=False)])
+            while offset + len(buffer) - pos >= chunk_n + context_n:
+                text = decode_window()
+                if text:
+                    yield text
+                pos += chunk_n
+                # Descarta o que ficou antes do contexto esquerdo do próximo chunk
+                cut = max(0, pos - context_n) - offset
+                buffer, offset = buffer[cut:], offset + cut
+
+        while pos < offset + len(buffer):
+            is_last = pos + chunk_n >= offset + len(buffer)
+            text = decode_window(final=is_last)
+            if text:
+                yield text
+            pos += chunk_n
+
+        if pending:
+            yield tokenizer.decode(pending, group_tokens=False)
+
+    def transcribe_batch(self, audios: list, batch_size: int = 8) -> list:
+        inputs = []
+        for item in audios:
+            if not isinstance(item, np.ndarray) and not os.path.exists(item):
+                raise FileNotFoundError(f"Arquivo não encontrado: {item}")
+            inputs.append(self._as_input(item))
+
+        # O pipeline agrupa os chunks de 30s de todos os arquivos em batches
+        with span("inference", engine="Wav2Vec2"):
+            results = self.pipe(inputs, batch_size=batch_size)
+
+        return [r.get("text", "") for r in results]
+
+    @staticmethod
+    def _as_input(item):
+        # Arrays já decodificados evitam a segunda chamada ao ffmpeg dentro do pipeline
+        if isinstance(item, np.ndarray):
+            return {"raw": item.astype(np.float32, copy=False), "sampling_rate": SAMPLE_RATE}
+        return item
+
+def _state_bytes(state) -> int:
+    """Bytes de um state_dict, incluindo tuplas de tensores (pesos empacotados)."""
+    total = 0
+    for value in state.values() if isinstance(state, dict) else state:
+        if isinstance(value, (tuple, list, dict)):
+            total += _state_bytes(value)
+        elif hasattr(value, "element_size"):
+            total += value.numel() * value.element_size()
+    return total
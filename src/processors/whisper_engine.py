@@ -1,11 +1,71 @@
 import whisper
+import torch
+import numpy as np
 from .base import Transcriber
+from src.profiling import span
 
 class WhisperTranscriber(Transcriber):
     def __init__(self, model_size="base"):
         print(f"Carregando Whisper ({model_size})...")
+        self.model_size = model_size
         self.model = whisper.load_model(model_size)
 
+    def cache_signature(self) -> dict:
+        return {"model_size": self.model_size, "language": "pt"}
+
+    def memory_footprint(self) -> int:
+        return self._module_bytes(self.model)
+
     def transcribe(self, audio_path: str) -> str:
-        result = self.model.transcribe(audio_path, language="pt")
-        return result["text"]
\ No newline at end of file
+        with span("inference", engine="Whisper"):
+            result = self.model.transcribe(audio_path, language="pt")
+        return result["text"]
+
+    def transcribe_array(self, samples: np.ndarray) -> str:
+        # model.transcribe aceita diretamente o array float32 a 16kHz
+        with span("inference", engine="Whisper"):
+            result = self.model.transcribe(samples.astype(np.float32, copy=False), language="pt")
+        return result["text"]
+
+    def transcribe_batch(self, audios: list, batch_size: int = 8) -> list:
+        """
+        Decodifica em batch os mels (padding de 30s) dos áudios curtos.
+        Áudios maiores que a janela do Whisper seguem pelo transcribe() normal,
+        que faz a decodificação por janelas deslizantes.
+        """
+        results = [None] * len(audios)
+        options = whisper.DecodingOptions(
+            language="pt",
+            without_timestamps=True,
+            fp16=self.model.device.type == "cuda",
+        )
+
+        curtos = []
+        for i, item in enumerate(audios):
+            if isinstance(item, np.ndarray):
+                audio = item
+            else:
+                with span("decode", format="f32le"):
+                    audio = whisper.load_audio(item)
+            if len(audio) > whisper.audio.N_SAMPLES:
+                results[i] = self.transcribe_array(audio)
+            else:
+                curtos.append((i, audio))
+
+        for start in range(0, len(curtos), batch_size):
+            lote = curtos[start:start + batch_size]
+            with span("features", engine="Whisper"):
+                mels = torch.stack([
+                    whisper.log_mel_spectrogram(
+                        whisper.pad_or_trim(torch.from_numpy(np.ascontiguousarray(audio, dtype=np.float32))),
+                        n_mels=self.model.dims.n_mels,
+                    )
+                    for _, audio in lote
+                ]).to(self.model.device)
+
+            with span("inference", engine="Whisper"):
+                decoded = whisper.decode(self.model, mels, options)
+            for (i, _), res in zip(lote, decoded):
+                results[i] = res.text
+
+        return results
@@ -0,0 +1,236 @@
+import os
+import json
+import atexit
+import time
+import glob
+import threading
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Diretório dos arquivos de perfil; herdado pelos processos worker (spawn copia o ambiente)
+PROFILE_DIR_ENV = "PROFILE_DIR"
+
+_NULL_SPAN = nullcontext()
+
+def peak_rss_bytes() -> int:
+    """Pico de memória residente do processo até agora (0 se indisponível)."""
+    if resource is None:
+        return 0
+    # ru_maxrss vem em KB no Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+class JSONLSink:
+    """Um registro JSON por linha (span ou contador), anexado assim que é emitido."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, "a", encoding="utf-8")
+
+    def emit(self, record):
+        line = json.dumps(record, ensure_ascii=False, default=str)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+
+    def flush(self, profiler):
+        pass
+
+class PrometheusSink:
+    """Reescreve os agregados no formato texto do Prometheus (ex: para o node_exporter textfile)."""
+
+    def __init__(self, path, interval_s=10.0):
+        self.path = path
+        self.interval_s = interval_s
+        self._last_write = 0.0
+        self._lock = threading.Lock()
+
+    def emit(self, record):
+        pass
+
+    def flush(self, profiler, force=True):
+        if not force and time.time() - self._last_write < self.interval_s:
+            return
+        with self._lock:
+            self._last_write = time.time()
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(render_prometheus(profiler.snapshot()))
+            os.replace(tmp_path, self.path)
+
+class Profiler:
+    """
+    Spans nomeados (decode, features, inference, postprocess, llm_request, validation...)
+    e contadores (tokens, retries) com agregados em memória e sinks plugáveis.
+    Desligado, span() devolve um contexto nulo compartilhado e count() retorna de imediato.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.sinks = []
+        self._lock = threading.Lock()
+        self._spans = defaultdict(lambda: {"count": 0, "total": 0.0, "max": 0.0})
+        self._counters = defaultdict(float)
+
+    def configure(self, sinks):
+        self.sinks = list(sinks)
+        self.enabled = bool(self.sinks)
+
+    def span(self, name, **labels):
+        if not self.enabled:
+            return _NULL_SPAN
+        return self._span(name, labels)
+
+    @contextmanager
+    def _span(self, name, labels):
+        start = time.perf_counter()
+        status = "ok"
+        try:
+            yield
+        except BaseException:
+            status = "error"
+            raise
+        finally:
+            seconds = time.perf_counter() - start
+            key = (name, tuple(sorted(labels.items())))
+            with self._lock:
+                agg = self._spans[key]
+                agg["count"] += 1
+                agg["total"] += seconds
+                agg["max"] = max(agg["max"], seconds)
+            self._emit({
+                "type": "span", "name": name, "seconds": seconds, "status": status,
+                "labels": labels, "peak_rss_bytes": peak_rss_bytes(),
+            })
+
+    def count(self, name, value=1, **labels):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[(name, tuple(sorted(labels.items())))] += value
+        self._emit({"type": "counter", "name": name, "value": value, "labels": labels})
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "spans": {k: dict(v) for k, v in self._spans.items()},
+                "counters": dict(self._counters),
+                "peak_rss_bytes": peak_rss_bytes(),
+            }
+
+    def summary(self) -> list:
+        """Linhas (span, rótulos, n, total_s, média_s, max_s), do maior tempo total ao menor."""
+        return _summary_rows(self.snapshot()["spans"])
+
+    def flush(self):
+        for sink in self.sinks:
+            sink.flush(self)
+
+    def _emit(self, record):
+        record["ts"] = time.time()
+        record["pid"] = os.getpid()
+        for sink in self.sinks:
+            sink.emit(record)
+            if isinstance(sink, PrometheusSink):
+                sink.flush(self, force=False)
+
+profiler = Profiler()
+
+def span(name, **labels):
+    return profiler.span(name, **labels)
+
+def count(name, value=1, **labels):
+    profiler.count(name, value, **labels)
+
+def enable_profiling(profile_dir) -> Profiler:
+    """Liga o profiler deste processo: spans-<pid>.jsonl e metrics-<pid>.prom em profile_dir."""
+    os.makedirs(profile_dir, exist_ok=True)
+    pid = os.getpid()
+    profiler.configure([
+        JSONLSink(os.path.join(profile_dir, f"spans-{pid}.jsonl")),
+        PrometheusSink(os.path.join(profile_dir, f"metrics-{pid}.prom")),
+    ])
+    atexit.register(profiler.flush)
+    return profiler
+
+def profiling_from_env() -> Profiler:
+    """Liga o profiler se PROFILE_DIR estiver definido (ex: em processos worker)."""
+    profile_dir = os.getenv(PROFILE_DIR_ENV)
+    if profile_dir and not profiler.enabled:
+        enable_profiling(profile_dir)
+    return profiler
+
+def summarize_dir(profile_dir) -> list:
+    """Agrega os spans de todos os processos a partir dos JSONL de profile_dir."""
+    spans = defaultdict(lambda: {"count": 0, "total": 0.0, "max": 0.0})
+    for path in glob.glob(os.path.join(profile_dir, "spans-*.jsonl")):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if record.get("type") != "span":
+                    continue
+                key = (record["name"], tuple(sorted(record.get("labels", {}).items())))
+                agg = spans[key]
+                agg["count"] += 1
+                agg["total"] += record["seconds"]
+                agg["max"] = max(agg["max"], record["seconds"])
+    return _summary_rows(spans)
+
+def _summary_rows(spans) -> list:
+    rows = [
+        {
+            "span": name,
+            "labels": ", ".join(f"{k}={v}" for k, v in labels),
+            "n": agg["count"],
+            "total_s": agg["total"],
+            "media_s": agg["total"] / agg["count"] if agg["count"] else 0.0,
+            "max_s": agg["max"],
+        }
+        for (name, labels), agg in spans.items()
+    ]
+    return sorted(rows, key=lambda r: r["total_s"], reverse=True)
+
+def _prom_labels(labels) -> str:
+    if not labels:
+        return ""
+    escape = lambda v: str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return "{" + ",".join(f'{k}="{escape(v)}"' for k, v in labels) + "}"
+
+def render_prometheus(snapshot) -> str:
+    lines = [
+        "# HELP pipeline_span_seconds Tempo gasto em cada etapa do pipeline.",
+        "# TYPE pipeline_span_seconds summary",
+    ]
+    for (name, labels), agg in sorted(snapshot["spans"].items()):
+        lbl = _prom_labels((("span", name),) + labels)
+        lines.append(f"pipeline_span_seconds_sum{lbl} {agg['total']:.6f}")
+        lines.append(f"pipeline_span_seconds_count{lbl} {agg['count']}")
+    lines += [
+        "# HELP pipeline_span_seconds_max Maior duração observada de cada etapa.",
+        "# TYPE pipeline_span_seconds_max gauge",
+    ]
+    for (name, labels), agg in sorted(snapshot["spans"].items()):
+        lines.append(f"pipeline_span_seconds_max{_prom_labels((('span', name),) + labels)} {agg['max']:.6f}")
+
+    declared = set()
+    for (name, labels), value in sorted(snapshot["counters"].items()):
+        metric = f"pipeline_{name}_total"
+        if metric not in declared:
+            declared.add(metric)
+            lines.append(f"# TYPE {metric} counter")
+        lines.append(f"{metric}{_prom_labels(labels)} {value:g}")
+
+    lines += [
+        "# HELP process_peak_rss_bytes Pico de memória residente do processo.",
+        "# TYPE process_peak_rss_bytes gauge",
+        f"process_peak_rss_bytes {snapshot['peak_rss_bytes']}",
+    ]
+    return "\n".join(lines) + "\n"
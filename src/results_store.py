@@ -0,0 +1,338 @@
+import os
+import glob
+import json
+import math
+import time
+import uuid
+import argparse
+from urllib.parse import quote
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pyarrow.dataset as ds
+from src.cache import hash_bytes
+
+DEFAULT_RESULTS_DIR = "resultados_benchmark"
+METRICS = ["WER", "CER", "RTF", "BERTScore"]
+PERCENTILES = (50, 95)
+
+# Histograma log-espaçado de 1e-4 a 1e3 (~4% de erro relativo nos percentis);
+# valores abaixo de HIST_MIN (ex: WER 0) ficam no bin 0
+HIST_MIN = 1e-4
+HIST_MAX = 1e3
+HIST_BINS = 200
+_LOG_STEP = math.log(HIST_MAX / HIST_MIN) / HIST_BINS
+
+RESULT_SCHEMA = pa.schema([
+    ("Arquivo", pa.string()),
+    ("ref_hash", pa.string()),
+    ("Hipotese", pa.string()),
+    ("WER", pa.float64()),
+    ("CER", pa.float64()),
+    ("RTF", pa.float64()),
+])
+SCORE_SCHEMA = pa.schema([("Arquivo", pa.string()), ("BERTScore", pa.float64())])
+REFERENCE_SCHEMA = pa.schema([("ref_hash", pa.string()), ("Arquivo", pa.string()), ("Referencia", pa.string())])
+PARTITIONING = ds.partitioning(pa.schema([("run_id", pa.string()), ("engine", pa.string())]), flavor="hive")
+
+class RunningStats:
+    """Contagem, média, desvio, mínimo, máximo e percentis aproximados, atualizados valor a valor."""
+
+    def __init__(self, state=None):
+        state = state or {}
+        self.n = state.get("n", 0)
+        self.sum = state.get("sum", 0.0)
+        self.sumsq = state.get("sumsq", 0.0)
+        self.min = state.get("min", math.inf)
+        self.max = state.get("max", -math.inf)
+        self.hist = {int(k): v for k, v in state.get("hist", {}).items()}
+
+    def add(self, value):
+        if value is None or value != value:
+            return
+        value = float(value)
+        self.n += 1
+        self.sum += value
+        self.sumsq += value * value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        b = _bin(value)
+        self.hist[b] = self.hist.get(b, 0) + 1
+
+    def percentile(self, p) -> float:
+        if not self.n:
+            return math.nan
+        alvo = p / 100 * self.n
+        acumulado = 0
+        for b in sorted(self.hist):
+            acumulado += self.hist[b]
+            if acumulado >= alvo:
+                return min(max(_bin_value(b), self.min), self.max)
+        return self.max
+
+    def summary(self) -> dict:
+        if not self.n:
+            return {"n": 0}
+        media = self.sum / self.n
+        resumo = {
+            "n": self.n,
+            "media": media,
+            "desvio": math.sqrt(max(self.sumsq / self.n - media * media, 0.0)),
+            "min": self.min,
+            "max": self.max,
+        }
+        for p in PERCENTILES:
+            resumo[f"p{p}"] = self.percentile(p)
+        return resumo
+
+    def state(self) -> dict:
+        return {"n": self.n, "sum": self.sum, "sumsq": self.sumsq, "min": self.min, "max": self.max,
+                "hist": {str(k): v for k, v in self.hist.items()}}
+
+def _bin(value) -> int:
+    if value < HIST_MIN:
+        return 0
+    return min(HIST_BINS, 1 + int(math.log(value / HIST_MIN) / _LOG_STEP))
+
+def _bin_value(b) -> float:
+    if b == 0:
+        return 0.0
+    # Centro geométrico do bin
+    return HIST_MIN * math.exp((b - 0.5) * _LOG_STEP)
+
+class ResultsStore:
+    """
+    Resultados do benchmark em Parquet, só com anexação:
+      referencias/part-*.parquet                      (ref_hash, Arquivo, Referencia), cada texto uma vez
+      resultados/run_id=<id>/engine=<m>/part-*.parquet  (Arquivo, ref_hash, Hipotese, WER, CER, RTF)
+      bertscore/run_id=<id>/engine=<m>/part-*.parquet   (Arquivo, BERTScore)
+      agregados/<id>.json                             média, desvio e percentis por engine
+    Linhas ficam em buffer e viram um arquivo por partição a cada flush_rows; os agregados
+    da execução são atualizados a cada linha e regravados a cada flush, de modo que
+    relatórios sobre muitas execuções leem só os JSON (ver compare_runs).
+    """
+
+    def __init__(self, root=DEFAULT_RESULTS_DIR, run_id=None, flush_rows=512):
+        self.root = root
+        self.run_id = run_id or time.strftime("%Y%m%d-%H%M%S")
+        self.flush_rows = flush_rows
+        self._results = {}
+        self._scores = {}
+        self._references = []
+        self._pending = 0
+        for sub in ("referencias", "resultados", "bertscore", "agregados"):
+            os.makedirs(os.path.join(root, sub), exist_ok=True)
+
+        self._known_refs = set(_read_column(os.path.join(root, "referencias"), "ref_hash"))
+        # Pares já gravados nesta execução (retomada com o mesmo run_id) não entram de novo nos agregados
+        self._written = {
+            kind: set(_run_pairs(os.path.join(root, kind), self.run_id)) for kind in ("resultados", "bertscore")
+        }
+        self._aggregates = {
+            engine: {m: RunningStats(s) for m, s in metrics.items()}
+            for engine, metrics in _load_json(self._aggregates_path()).get("engines", {}).items()
+        }
+
+    def write(self, rows):
+        """Linhas (Arquivo, Modelo, Referencia, Hipotese, WER, CER, RTF) como as do benchmark."""
+        for row in rows:
+            arquivo, engine = str(row["Arquivo"]), str(row["Modelo"])
+            if (arquivo, engine) in self._written["resultados"]:
+                continue
+            self._written["resultados"].add((arquivo, engine))
+
+            referencia = "" if row.get("Referencia") is None else str(row["Referencia"])
+            ref_hash = hash_bytes(referencia.encode("utf-8"))
+            if ref_hash not in self._known_refs:
+                self._known_refs.add(ref_hash)
+                self._references.append({"ref_hash": ref_hash, "Arquivo": arquivo, "Referencia": referencia})
+
+            self._results.setdefault(engine, []).append({
+                "Arquivo": arquivo,
+                "ref_hash": ref_hash,
+                "Hipotese": row.get("Hipotese"),
+                "WER": _float(row.get("WER")),
+                "CER": _float(row.get("CER")),
+                "RTF": _float(row.get("RTF")),
+            })
+            stats = self._stats(engine)
+            for metric in ("WER", "CER", "RTF"):
+                stats[metric].add(row.get(metric))
+            self._pending += 1
+
+        if self._pending >= self.flush_rows:
+            self.flush()
+
+    def write_scores(self, scores: dict):
+        """BERTScore por (Arquivo, Modelo), calculado depois das demais métricas."""
+        for (arquivo, engine), value in scores.items():
+            # Só pares desta execução; linhas retomadas de outra execução ficam de fora
+            if (arquivo, engine) in self._written["bertscore"] or (arquivo, engine) not in self._written["resultados"]:
+                continue
+            self._written["bertscore"].add((arquivo, engine))
+            self._scores.setdefault(engine, []).append({"Arquivo": arquivo, "BERTScore": _float(value)})
+            self._stats(engine)["BERTScore"].add(value)
+            self._pending += 1
+
+        if self._pending >= self.flush_rows:
+            self.flush()
+
+    def aggregates(self) -> dict:
+        """{engine: {métrica: {n, media, desvio, min, max, p50, p95}}} desta execução."""
+        return {
+            engine: {m: s.summary() for m, s in metrics.items()}
+            for engine, metrics in self._aggregates.items()
+        }
+
+    def flush(self):
+        if self._references:
+            _write_part(os.path.join(self.root, "referencias"), self._references, REFERENCE_SCHEMA)
+            self._references = []
+        for kind, buffers, schema in (("resultados", self._results, RESULT_SCHEMA),
+                                      ("bertscore", self._scores, SCORE_SCHEMA)):
+            for engine, rows in buffers.items():
+                if rows:
+                    _write_part(self._partition(kind, engine), rows, schema)
+            buffers.clear()
+        self._pending = 0
+
+        payload = {
+            "run_id": self.run_id,
+            "updated_at": time.time(),
+            "engines": {
+                engine: {m: s.state() for m, s in metrics.items()}
+                for engine, metrics in self._aggregates.items()
+            },
+        }
+        path = self._aggregates_path()
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(payload, f)
+        os.replace(tmp_path, path)
+
+    def close(self):
+        self.flush()
+
+    def _stats(self, engine) -> dict:
+        return self._aggregates.setdefault(engine, {m: RunningStats() for m in METRICS})
+
+    def _partition(self, kind, engine) -> str:
+        path = os.path.join(self.root, kind, f"run_id={quote(self.run_id, safe='')}", f"engine={quote(engine, safe='')}")
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def _aggregates_path(self) -> str:
+        return os.path.join(self.root, "agregados", f"{quote(self.run_id, safe='')}.json")
+
+def _float(value):
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return None if value != value else value
+
+def _write_part(directory, rows, schema):
+    name = f"part-{uuid.uuid4().hex}.parquet"
+    # O pyarrow ignora arquivos com prefixo "_": leitores só enxergam a parte completa
+    tmp_path = os.path.join(directory, f"_{name}.tmp")
+    pq.write_table(pa.Table.from_pylist(rows, schema=schema), tmp_path)
+    os.replace(tmp_path, os.path.join(directory, name))
+
+def _load_json(path) -> dict:
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def _dataset(directory, partitioned=True):
+    if not glob.glob(os.path.join(directory, "**", "*.parquet"), recursive=True):
+        return None
+    return ds.dataset(directory, format="parquet", partitioning=PARTITIONING if partitioned else None)
+
+def _read_column(directory, column) -> list:
+    dataset = _dataset(directory, partitioned=False)
+    if dataset is None:
+        return []
+    return dataset.to_table(columns=[column]).column(column).to_pylist()
+
+def _run_pairs(directory, run_id) -> list:
+    dataset = _dataset(directory)
+    if dataset is None:
+        return []
+    table = dataset.to_table(columns=["Arquivo", "engine"], filter=ds.field("run_id") == run_id)
+    return list(zip(table.column("Arquivo").to_pylist(), table.column("engine").to_pylist()))
+
+def list_runs(root=DEFAULT_RESULTS_DIR) -> list:
+    """Execuções com agregados gravados, da mais antiga à mais recente."""
+    runs = [_load_json(p) for p in glob.glob(os.path.join(root, "agregados", "*.json"))]
+    return [r["run_id"] for r in sorted(runs, key=lambda r: r.get("updated_at", 0))]
+
+def compare_runs(root=DEFAULT_RESULTS_DIR, run_ids=None, metrics=None):
+    """
+    Tabela (run_id, Modelo, n, <métrica> média/p50/p95...) só a partir dos agregados JSON:
+    não lê nenhum Parquet, então é instantânea mesmo com muitas execuções.
+    """
+    import pandas as pd
+
+    linhas = []
+    for run_id in run_ids or list_runs(root):
+        payload = _load_json(os.path.join(root, "agregados", f"{quote(run_id, safe='')}.json"))
+        for engine, states in payload.get("engines", {}).items():
+            linha = {"run_id": run_id, "Modelo": engine}
+            for metric in metrics or METRICS:
+                resumo = RunningStats(states.get(metric)).summary()
+                linha["n"] = max(linha.get("n", 0), resumo["n"])
+                for campo in ["media"] + [f"p{p}" for p in PERCENTILES]:
+                    linha[f"{metric} {campo}"] = resumo.get(campo, math.nan)
+            linhas.append(linha)
+    return pd.DataFrame(linhas)
+
+def load_results(root=DEFAULT_RESULTS_DIR, run_ids=None, engines=None, with_references=False):
+    """
+    Linhas detalhadas (run_id, Modelo, Arquivo, Hipotese, WER, CER, RTF, BERTScore) das
+    execuções e engines pedidas, lendo só as partições correspondentes; com
+    with_references, a Referencia é juntada pelo hash.
+    """
+    import pandas as pd
+
+    def ler(kind):
+        dataset = _dataset(os.path.join(root, kind))
+        if dataset is None:
+            return pd.DataFrame()
+        filtro = None
+        if run_ids:
+            filtro = ds.field("run_id").isin(list(run_ids))
+        if engines:
+            por_engine = ds.field("engine").isin(list(engines))
+            filtro = por_engine if filtro is None else filtro & por_engine
+        return dataset.to_table(filter=filtro).to_pandas()
+
+    df = ler("resultados")
+    if df.empty:
+        return df
+    scores = ler("bertscore")
+    if not scores.empty:
+        scores = scores.drop_duplicates(["run_id", "engine", "Arquivo"], keep="last")
+        df = df.merge(scores, on=["run_id", "engine", "Arquivo"], how="left")
+    if with_references:
+        refs = pd.read_parquet(os.path.join(root, "referencias"), columns=["ref_hash", "Referencia"])
+        df = df.merge(refs.drop_duplicates("ref_hash"), on="ref_hash", how="left")
+    return df.rename(columns={"engine": "Modelo"}).drop(columns=["ref_hash"])
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compara execuções do benchmark gravadas no repositório Parquet.")
+    parser.add_argument("--root", default=DEFAULT_RESULTS_DIR, help="Diretório do repositório de resultados.")
+    parser.add_argument("--runs", nargs="+", default=None, help="Execuções a comparar (padrão: todas).")
+    parser.add_argument("--metrics", nargs="+", choices=METRICS, default=None, help="Métricas exibidas (padrão: todas).")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    tabela = compare_runs(args.root, args.runs, args.metrics)
+    if tabela.empty:
+        print(f"Nenhuma execução em '{args.root}'.")
+    else:
+        try:
+            from tabulate import tabulate
+            print(tabulate(tabela, headers="keys", tablefmt="github", showindex=False, floatfmt=".4f"))
+        except Exception:
+            print(tabela)
+        print(f"\n{tabela['run_id'].nunique()} execuções em {(time.perf_counter() - start) * 1000:.1f} ms")
@@ -0,0 +1,146 @@
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from src.audio import SAMPLE_RATE
+
+# Limiar adaptativo nunca fica a menos de VAD_MARGIN_DB do ruído de fundo, e áudio com
+# menos de VAD_MIN_RANGE_DB entre fundo e picos (só ruído ou silêncio) não tem fala
+VAD_MARGIN_DB = 6.0
+VAD_MIN_RANGE_DB = 10.0
+
+def _speech_runs(mask):
+    """Trechos (início, fim) contíguos de True em um vetor booleano de frames."""
+    padded = np.concatenate([[False], mask, [False]])
+    diff = np.diff(padded.astype(np.int8))
+    return list(zip(np.flatnonzero(diff == 1), np.flatnonzero(diff == -1)))
+
+def energy_vad(samples, sample_rate=SAMPLE_RATE, frame_ms=30, threshold_db=None):
+    """
+    Marca frames de fala pela energia (dBFS). Sem threshold explícito, o limiar é
+    adaptativo: 12 dB acima do ruído de fundo (percentil 10), sem passar de 20 dB
+    abaixo dos trechos mais altos (percentil 95), mas sempre ao menos VAD_MARGIN_DB
+    acima do fundo e de -60 dBFS. Se fundo e picos estão a menos de VAD_MIN_RANGE_DB
+    (ruído constante ou silêncio), nenhum frame é fala.
+    Retorna (máscara de fala por frame, energia em dB por frame, amostras por frame).
+    """
+    frame = max(1, int(sample_rate * frame_ms / 1000))
+    n = len(samples) // frame
+    if n == 0:
+        return np.zeros(0, dtype=bool), np.zeros(0), frame
+
+    frames = np.asarray(samples[:n * frame], dtype=np.float64).reshape(n, frame)
+    db = 10 * np.log10(np.mean(frames ** 2, axis=1) + 1e-12)
+
+    if threshold_db is None:
+        floor, peak = np.percentile(db, 10), np.percentile(db, 95)
+        if peak - floor < VAD_MIN_RANGE_DB:
+            return np.zeros(n, dtype=bool), db, frame
+        threshold_db = max(min(floor + 12.0, peak - 20.0), floor + VAD_MARGIN_DB, -60.0)
+
+    return db > threshold_db, db, frame
+
+def webrtc_vad(samples, sample_rate=SAMPLE_RATE, frame_ms=30, aggressiveness=2):
+    """VAD por modelo (webrtcvad, dependência opcional), no mesmo formato do energy_vad."""
+    try:
+        import webrtcvad
+    except ImportError:
+        raise RuntimeError("webrtcvad não instalado. Use method='energy' ou instale com: pip install webrtcvad")
+
+    from src.audio import float_to_pcm16
+
+    vad = webrtcvad.Vad(aggressiveness)
+    frame = int(sample_rate * frame_ms / 1000)
+    n = len(samples) // frame
+    pcm = float_to_pcm16(samples[:n * frame])
+    mask = np.array([
+        vad.is_speech(pcm[i * frame * 2:(i + 1) * frame * 2], sample_rate) for i in range(n)
+    ], dtype=bool)
+    _, db, _ = energy_vad(samples, sample_rate, frame_ms)
+    return mask, db, frame
+
+def detect_speech(samples, sample_rate=SAMPLE_RATE, method="energy", frame_ms=30,
+                  min_silence_ms=400, min_speech_ms=250, pad_ms=150, max_segment_s=30.0,
+                  threshold_db=None) -> list:
+    """
+    Segmentos de fala [(início, fim)] em amostras, cortados nos silêncios:
+    - silêncios menores que min_silence_ms não quebram o segmento;
+    - trechos de fala menores que min_speech_ms são descartados;
+    - cada segmento ganha pad_ms de margem;
+    - segmentos maiores que max_segment_s (janela do Whisper) são divididos
+      no frame mais silencioso da segunda metade da janela.
+    """
+    if method == "webrtc":
+        mask, db, frame = webrtc_vad(samples, sample_rate, frame_ms)
+    else:
+        mask, db, frame = energy_vad(samples, sample_rate, frame_ms, threshold_db)
+
+    to_frames = lambda ms: int(round(ms / frame_ms))
+    runs = _speech_runs(mask)
+
+    merged = []
+    for start, end in runs:
+        if merged and start - merged[-1][1] < to_frames(min_silence_ms):
+            merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    merged = [(s, e) for s, e in merged if e - s >= to_frames(min_speech_ms)]
+
+    pad = to_frames(pad_ms)
+    padded = []
+    for start, end in merged:
+        start, end = max(0, start - pad), min(len(mask), end + pad)
+        if padded and start <= padded[-1][1]:
+            padded[-1] = (padded[-1][0], end)
+        else:
+            padded.append((start, end))
+
+    max_frames = max(2, int(max_segment_s * 1000 / frame_ms))
+    segments = []
+    for start, end in padded:
+        while end - start > max_frames:
+            window = db[start + max_frames // 2:start + max_frames]
+            cut = start + max_frames // 2 + int(np.argmin(window))
+            segments.append((start, cut))
+            start = cut
+        segments.append((start, end))
+
+    total = len(samples)
+    return [(s * frame, min(total, e * frame)) for s, e in segments]
+
+def transcribe_segmented(engine, samples, sample_rate=SAMPLE_RATE, workers=4,
+                         on_progress=None, **vad_options) -> dict:
+    """
+    Transcreve áudio longo por segmentos de fala, pulando os silêncios.
+    Engines thread-safe (ex: Vosk, um recognizer por chamada) transcrevem os segmentos
+    em paralelo num pool de threads; as demais recebem todos os segmentos de uma vez
+    em transcribe_batch (batch real no Whisper e no Wav2Vec2).
+    Retorna o texto costurado na ordem e os segmentos com timestamps em segundos.
+    """
+    bounds = detect_speech(samples, sample_rate, **vad_options)
+    pieces = [np.ascontiguousarray(samples[s:e], dtype=np.float32) for s, e in bounds]
+    textos = [None] * len(pieces)
+
+    if not pieces:
+        return {"text": "", "segments": []}
+
+    if getattr(engine, "thread_safe", False) and workers > 1:
+        feitos = 0
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(engine.transcribe_array, piece): i for i, piece in enumerate(pieces)}
+            for future in futures:
+                textos[futures[future]] = future.result()
+                feitos += 1
+                if on_progress:
+                    on_progress(feitos / len(pieces))
+    else:
+        textos = engine.transcribe_batch(pieces, batch_size=max(1, workers))
+        if on_progress:
+            on_progress(1.0)
+
+    segments = [
+        {"start": s / sample_rate, "end": e / sample_rate, "text": (t or "").strip()}
+        for (s, e), t in zip(bounds, textos)
+    ]
+    return {
+        "text": " ".join(seg["text"] for seg in segments if seg["text"]),
+        "segments": segments,
+    }
@@ -1,11 +1,113 @@
-import os
-from pydub import AudioSegment
-
-def prepare_audio_for_vosk(input_path, output_path="temp_vosk.wav"):
-    """Converte qualquer áudio para WAV Mono 16kHz (requisito do Vosk)"""
-    audio = AudioSegment.from_file(input_path)
-    audio = audio.set_channels(1)
-    audio = audio.set_frame_rate(16000)
-    audio = audio.set_sample_width(2)
-    audio.export(output_path, format="wav")
-    return output_path
\ No newline at end of file
+import sys
+import time
+import importlib
+import threading
+import subprocess
+
+VOSK_SAMPLE_RATE = 16000
+
+def run_ffmpeg(source, sample_rate=VOSK_SAMPLE_RATE, sample_fmt="s16le") -> bytes:
+    """
+    Decodifica qualquer áudio para PCM cru Mono no sample rate pedido, via pipe do FFmpeg.
+    Aceita um caminho de arquivo ou os bytes do arquivo; nada é escrito em disco.
+    """
+    from_bytes = isinstance(source, (bytes, bytearray, memoryview))
+    cmd = _ffmpeg_cmd(source, sample_rate, sample_fmt)
+    try:
+        proc = subprocess.run(
+            cmd,
+            input=bytes(source) if from_bytes else None,
+            capture_output=True,
+            check=True,
+        )
+    except FileNotFoundError:
+        raise RuntimeError("FFmpeg não encontrado. Instale-o e adicione ao PATH.")
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(f"Falha ao decodificar áudio: {e.stderr.decode(errors='ignore').strip()}")
+    return proc.stdout
+
+def stream_ffmpeg(source, sample_rate=VOSK_SAMPLE_RATE, sample_fmt="f32le", block_bytes=1 << 20):
+    """
+    Como run_ffmpeg, mas entrega o PCM em blocos de block_bytes conforme o FFmpeg decodifica:
+    a memória usada não depende da duração do arquivo. Aceita caminho ou bytes.
+    """
+    if block_bytes < 1:
+        # read(0) devolveria b"" de imediato: transcrição vazia e FFmpeg preso escrevendo
+        raise ValueError(f"block_bytes deve ser positivo (recebido {block_bytes})")
+    from_bytes = isinstance(source, (bytes, bytearray, memoryview))
+    try:
+        proc = subprocess.Popen(
+            _ffmpeg_cmd(source, sample_rate, sample_fmt),
+            stdin=subprocess.PIPE if from_bytes else subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        )
+    except FileNotFoundError:
+        raise RuntimeError("FFmpeg não encontrado. Instale-o e adicione ao PATH.")
+
+    if from_bytes:
+        # Escrita em thread separada: o FFmpeg só consome a entrada se a saída for lida
+        def feed():
+            try:
+                proc.stdin.write(bytes(source))
+            except BrokenPipeError:
+                pass
+            finally:
+                proc.stdin.close()
+        threading.Thread(target=feed, daemon=True).start()
+
+    try:
+        while True:
+            block = proc.stdout.read(block_bytes)
+            if not block:
+                break
+            yield block
+        stderr = proc.stderr.read()
+        if proc.wait() != 0:
+            raise RuntimeError(f"Falha ao decodificar áudio: {stderr.decode(errors='ignore').strip()}")
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+            proc.wait()
+
+def _ffmpeg_cmd(source, sample_rate, sample_fmt):
+    from_bytes = isinstance(source, (bytes, bytearray, memoryview))
+    codec = "pcm_f32le" if sample_fmt == "f32le" else "pcm_s16le"
+    return [
+        "ffmpeg", "-nostdin", "-threads", "0",
+        "-i", "pipe:0" if from_bytes else str(source),
+        "-f", sample_fmt, "-ac", "1", "-acodec", codec, "-ar", str(sample_rate),
+        "-loglevel", "error", "pipe:1",
+    ]
+
+def audio_to_pcm16(source, sample_rate=VOSK_SAMPLE_RATE) -> bytes:
+    """Converte qualquer áudio para PCM int16 Mono 16kHz (requisito do Vosk), em memória."""
+    from src.profiling import span
+
+    with span("decode", format="s16le"):
+        return run_ffmpeg(source, sample_rate, "s16le")
+
+# Tempo gasto no primeiro import de cada dependência pesada (ver import_report)
+_import_times = {}
+_import_lock = threading.Lock()
+
+def timed_import(module_name: str):
+    """Importa um módulo registrando quanto tempo o primeiro import levou."""
+    with _import_lock:
+        if module_name in sys.modules:
+            return sys.modules[module_name]
+        start = time.perf_counter()
+        module = importlib.import_module(module_name)
+        _import_times[module_name] = time.perf_counter() - start
+        return module
+
+def import_report() -> dict:
+    """Segundos de import por módulo carregado via timed_import, do mais lento ao mais rápido."""
+    return dict(sorted(_import_times.items(), key=lambda kv: kv[1], reverse=True))
+
+def format_import_report() -> str:
+    report = import_report()
+    if not report:
+        return "Nenhuma dependência pesada importada."
+    linhas = [f"  {nome:<40} {segundos:7.2f}s" for nome, segundos in report.items()]
+    return "Tempo de import:\n" + "\n".join(linhas) + f"\n  {'TOTAL':<40} {sum(report.values()):7.2f}s"
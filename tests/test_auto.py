@@ -0,0 +1,74 @@
+import os
+import multiprocessing
+
+from src.processors.auto import AutoTranscriber, EngineLoad, EngineProfiles
+
+def escrever_benchmark(path, rtf, wer, mtime):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("Arquivo,Modelo,RTF,WER\n")
+        f.write(f"a.wav,Whisper,{rtf},{wer}\n")
+    os.utime(path, (mtime, mtime))
+
+def test_benchmark_mais_novo_semeia_de_novo(tmp_path):
+    csv_path = str(tmp_path / "metricas_finais.csv")
+    profiles = EngineProfiles(path=str(tmp_path / "perfis.json"))
+    escrever_benchmark(csv_path, 0.5, 0.3, mtime=1_000_000)
+    profiles.seed_from_benchmark(csv_path)
+    profiles.observe("Whisper", 1.0, 10.0)
+
+    # Mesmo CSV: o RTF aprendido em uso é mantido, também depois de recarregar do disco
+    EngineProfiles(path=profiles.path).seed_from_benchmark(csv_path)
+    profiles.seed_from_benchmark(csv_path)
+    assert profiles.get("Whisper")["rtf"] != 0.5
+
+    escrever_benchmark(csv_path, 0.2, 0.1, mtime=2_000_000)
+    recarregado = EngineProfiles(path=profiles.path)
+    recarregado.seed_from_benchmark(csv_path)
+    assert recarregado.get("Whisper")["rtf"] == 0.2
+    assert recarregado.get("Whisper")["wer"] == 0.1
+
+def _ocupar(load, name):
+    load.add(name, 2)
+
+def test_carga_compartilhada_entre_processos():
+    ctx = multiprocessing.get_context("spawn")
+    load = EngineLoad(["Whisper", "Vosk"], ctx=ctx)
+    proc = ctx.Process(target=_ocupar, args=(load, "Whisper"))
+    proc.start()
+    proc.join()
+    assert load.snapshot() == {"Whisper": 2, "Vosk": 0}
+
+def test_auto_considera_carga_de_outros_processos():
+    load = EngineLoad(["Whisper", "Vosk"])
+    profiles = EngineProfiles(path=None)
+    profiles._profiles = {"Whisper": {"rtf": 0.5, "wer": 0.2, "samples": 1},
+                          "Vosk": {"rtf": 0.1, "wer": 0.4, "samples": 1}}
+    auto = AutoTranscriber(latency_budget_s=10.0, engines=["Whisper", "Vosk"], profiles=profiles,
+                           pool=object(), benchmark_csv="", load=load)
+    assert auto.choose(10.0)["engine"] == "Whisper"
+    load.add("Whisper", 2)
+    assert auto.choose(10.0)["engine"] == "Vosk"
+
+class Pesos:
+    def __init__(self, mb):
+        self.mb = mb
+
+    def memory_footprint(self):
+        return self.mb * 1024 * 1024
+
+def test_auto_no_pool_compartilhado_nao_conta_as_engines_de_novo():
+    from src.processors.pool import ModelPool
+
+    tamanhos = {"Wav2Vec2": 1200, "Whisper": 300}
+
+    def factory(name, **kwargs):
+        if name == "Auto":
+            return AutoTranscriber(profiles=EngineProfiles(path=None), benchmark_csv="", **kwargs)
+        return Pesos(tamanhos[name])
+
+    pool = ModelPool(budget_mb=2000, factory=factory)
+    pool.get("Wav2Vec2")
+    pool.get("Whisper")
+    pool.get("Auto", pool=pool)
+    assert [e["name"] for e in pool.loaded()] == ["Wav2Vec2", "Whisper", "Auto"]
+    assert pool.evictions == 0
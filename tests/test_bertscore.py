@@ -0,0 +1,35 @@
+import pytest
+
+pytest.importorskip("torch")
+pytest.importorskip("bert_score")
+
+from src.bertscore import StreamingBERTScorer
+
+REFS = [
+    "o gato subiu no telhado da casa",
+    "a reunião foi adiada para a próxima semana",
+    "o gato subiu no telhado da casa",
+]
+HYPS = [
+    "o gato subiu no telhado",
+    "a reunião foi adiada pra semana que vem",
+    "um cachorro latiu na rua",
+]
+
+def test_lotes_iguais_ao_bertscorer_score():
+    streaming = StreamingBERTScorer(lang="pt", batch_size=2)
+    streaming.add([
+        {"Arquivo": f"a{i}", "Modelo": "m", "Referencia": r, "Hipotese": h}
+        for i, (r, h) in enumerate(zip(REFS, HYPS))
+    ])
+    streaming.flush()
+    obtidos = [streaming.scores()[(f"a{i}", "m")] for i in range(len(REFS))]
+
+    # Mesma referência repetida reaproveita o embedding em cache
+    assert streaming.ref_cache_hits >= 1
+
+    _, _, f1 = streaming._load().score(HYPS, REFS)
+    esperados = f1.tolist()
+    assert obtidos == pytest.approx(esperados, abs=1e-4)
+    # Pontuações de verdade, não o 0.0 de uma falha silenciosa
+    assert all(0.0 < v <= 1.0 for v in obtidos)
@@ -0,0 +1,34 @@
+import multiprocessing
+
+from src.cache import LRUCache, TOUCH_BATCH
+
+def _escrever(db_path, rank, n):
+    cache = LRUCache(db_path=db_path, max_memory_items=1)
+    for i in range(n):
+        cache.put(f"{rank}-{i}", {"i": i})
+        cache.get(f"{(rank + 1) % 4}-{i}")
+
+def test_processos_dividem_o_arquivo(tmp_path):
+    db_path = str(tmp_path / "cache.sqlite")
+    LRUCache(db_path=db_path)
+    ctx = multiprocessing.get_context("spawn")
+    procs = [ctx.Process(target=_escrever, args=(db_path, rank, 200)) for rank in range(4)]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join()
+    assert [p.exitcode for p in procs] == [0] * 4
+    assert LRUCache(db_path=db_path).stats()["disk_entries"] == 800
+
+def test_leitura_do_disco_nao_grava_a_cada_acesso(tmp_path):
+    db_path = str(tmp_path / "cache.sqlite")
+    cache = LRUCache(db_path=db_path, max_memory_items=1)
+    for i in range(TOUCH_BATCH + 1):
+        cache.put(str(i), i)
+    mudancas = cache._db.total_changes
+    for i in range(TOUCH_BATCH - 1):
+        assert cache.get(str(i)) == i
+    assert cache._db.total_changes == mudancas
+    # O lote cheio grava o último acesso de todas as leituras de uma vez
+    cache.get(str(TOUCH_BATCH - 1))
+    assert cache._db.total_changes == mudancas + TOUCH_BATCH
@@ -0,0 +1,25 @@
+from src.extractors.chunking import chunk_text
+
+SENTENCA = "Esta é uma sentença longa " + "com muitas palavras " * 20 + "número {i}."
+
+def test_sentencas_que_cabem_no_chunk_ficam_inteiras():
+    sentencas = [SENTENCA.format(i=i) for i in range(30)]
+    inteiras = {s.rstrip(".") for s in sentencas} | set(sentencas)
+    # Sentenças de ~450 caracteres: maiores que a sobreposição padrão, menores que o chunk
+    for overlap in (400, 900):
+        chunks = chunk_text(" ".join(sentencas), max_chars=2000, overlap_chars=overlap)
+        assert len(chunks) > 1
+        for chunk in chunks:
+            # Cada chunk (e a sobreposição no início) é feito só de sentenças inteiras
+            assert set(chunk.split(". ")) <= inteiras
+            assert len(chunk) <= 2000
+    for anterior, chunk in zip(chunks, chunks[1:]):
+        assert chunk.split(". ")[0] + "." in anterior
+
+def test_texto_sem_pontuacao_ainda_tem_sobreposicao():
+    texto = " ".join(f"palavra{i}" for i in range(3000))
+    chunks = chunk_text(texto, max_chars=2000, overlap_chars=400)
+    assert all(len(c) <= 2000 for c in chunks)
+    for anterior, chunk in zip(chunks, chunks[1:]):
+        assert chunk.split()[0] in anterior.split()
+    assert " ".join(chunks).split()[-1] == "palavra2999"
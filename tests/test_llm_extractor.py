@@ -0,0 +1,54 @@
+import pytest
+
+pytest.importorskip("instructor")
+
+from src.extractors.mock_server import MockLLMServer, MockConfig
+from src.extractors.llm_extractor import LLMExtractor
+
+TEXTO = "João nasceu em 1990. Ele mora em São Paulo há dez anos. Trabalha como engenheiro."
+
+@pytest.fixture
+def server():
+    srv = MockLLMServer(config=MockConfig(latency_ms=5, latency_sigma=0.0, tokens_per_s=1e5,
+                                          retry_after_s=0.01, seed=0)).start()
+    yield srv
+    srv.stop()
+
+def extrator(server):
+    return LLMExtractor(provider="local", use_cache=False, base_url=server.base_url)
+
+def test_429_uma_requisicao_http_por_tentativa(server):
+    server.config.rate_429 = 1.0
+    ex = extrator(server)
+    with pytest.raises(RuntimeError):
+        ex.extract_info(TEXTO)
+    # Sem novas tentativas do SDK nem do instructor: 1 requisição + 5 do call_with_retries
+    assert ex.retries == 5
+    assert server.stats["requests"] == ex.retries + 1
+
+def test_5xx_repetido_com_espera(server):
+    server.config.rate_5xx = 0.5
+    ex = extrator(server)
+    for i in range(5):
+        assert ex.extract_info(f"Documento {i}. {TEXTO}")
+    assert server.stats["requests"] == 5 + ex.retries
+    assert ex.retries == server.stats["injected_5xx"]
+
+def test_stream_entrega_itens_antes_do_fim_da_resposta(server):
+    server.config.tokens_per_s = 500
+    ex = extrator(server)
+    stream = ex._stream_single(TEXTO)
+    primeiro = next(stream)
+    # O servidor ainda está enviando a resposta quando o primeiro item chega
+    assert server.stats["ok"] == 0
+    itens = [primeiro, *stream]
+    assert server.stats["requests"] == server.stats["streamed"] == 1
+    assert itens == ex.extract_info(TEXTO)
+
+def test_stream_repete_429_antes_do_primeiro_item(server):
+    server.config.rate_429 = 0.5
+    ex = extrator(server)
+    for i in range(5):
+        assert list(ex.extract_stream(f"Documento {i}. {TEXTO}"))
+    assert ex.retries == server.stats["injected_429"]
+    assert server.stats["streamed"] == 5
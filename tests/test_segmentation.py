@@ -0,0 +1,35 @@
+import numpy as np
+
+from src.segmentation import detect_speech, energy_vad
+
+SR = 16000
+
+def ruido(segundos, dbfs, seed=0):
+    rng = np.random.default_rng(seed)
+    return (rng.standard_normal(int(segundos * SR)) * 10 ** (dbfs / 20)).astype(np.float32)
+
+def fala(segundos, dbfs=-12):
+    # Tom modulado em sílabas de ~200 ms: energia alta com variação, como voz
+    t = np.arange(int(segundos * SR)) / SR
+    envelope = 0.6 + 0.4 * np.abs(np.sin(2 * np.pi * 2.5 * t))
+    return (np.sin(2 * np.pi * 220 * t) * envelope * 10 ** (dbfs / 20) * np.sqrt(2)).astype(np.float32)
+
+def test_ruido_puro_nao_tem_fala():
+    for dbfs in (-60, -40, -20):
+        audio = ruido(10, dbfs)
+        mask, _, _ = energy_vad(audio, SR)
+        assert not mask.any()
+        assert detect_speech(audio, SR) == []
+
+def test_silencio_digital_nao_tem_fala():
+    assert detect_speech(np.zeros(5 * SR, dtype=np.float32), SR) == []
+
+def test_fala_sobre_ruido_e_isolada():
+    audio = ruido(9, -40)
+    audio[3 * SR:6 * SR] += fala(3)
+    segmentos = detect_speech(audio, SR)
+    assert len(segmentos) == 1
+    inicio, fim = segmentos[0]
+    # Só o trecho de fala (mais a margem de pad_ms), não o arquivo inteiro
+    assert 2.7 * SR <= inicio <= 3.1 * SR
+    assert 5.9 * SR <= fim <= 6.3 * SR
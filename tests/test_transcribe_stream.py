@@ -0,0 +1,35 @@
+import numpy as np
+
+from src.audio import float_to_pcm16
+from src.processors.base import Transcriber
+from tests.test_segmentation import SR, fala, ruido
+
+class Contador(Transcriber):
+    def __init__(self):
+        self.chamadas = 0
+
+    def transcribe(self, audio_path):
+        raise AssertionError("transcribe_stream deve usar transcribe_array")
+
+    def transcribe_array(self, samples):
+        self.chamadas += 1
+        return "texto"
+
+def pedacos(samples, ms=100):
+    pcm = float_to_pcm16(samples)
+    passo = SR * ms // 1000 * 2
+    return [pcm[i:i + passo] for i in range(0, len(pcm), passo)]
+
+def test_blocos_silenciosos_nao_chegam_a_engine():
+    for audio in (np.zeros(12 * SR, dtype=np.float32), ruido(12, -40), ruido(12, -25, seed=1)):
+        engine = Contador()
+        assert list(engine.transcribe_stream(pedacos(audio))) == []
+        assert engine.chamadas == 0
+
+def test_bloco_com_fala_e_transcrito():
+    audio = ruido(6, -40)
+    audio[SR:3 * SR] += fala(2)
+    engine = Contador()
+    saida = list(engine.transcribe_stream(pedacos(audio)))
+    assert engine.chamadas >= 1
+    assert all(item["final"] for item in saida)
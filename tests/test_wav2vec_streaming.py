@@ -0,0 +1,69 @@
+from types import SimpleNamespace
+import numpy as np
+import pytest
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("transformers")
+
+from src.processors.wav2vec_engine import Wav2VecTranscriber
+
+STRIDE = 320
+VOCAB = ["<pad>", "|"] + list("abcdefghij")
+
+class ModeloLocal:
+    """Cada frame de logits depende só da amostra no início do seu passo: o resultado
+    por janelas só difere do de uma passada se a indexação dos frames estiver errada."""
+
+    config = SimpleNamespace(inputs_to_logits_ratio=STRIDE)
+    device = "cpu"
+
+    def __call__(self, input_values):
+        x = input_values[0]
+        n = (len(x) - 400) // STRIDE + 1
+        ids = x[torch.arange(n) * STRIDE].round().long()
+        return SimpleNamespace(logits=torch.nn.functional.one_hot(ids, len(VOCAB)).float()[None])
+
+class Tokenizer:
+    pad_token_id = 0
+    word_delimiter_token_id = 1
+
+    def decode(self, ids, group_tokens=False):
+        return "".join(" " if i == 1 else VOCAB[i] for i in ids).strip()
+
+def extrator(window, sampling_rate, return_tensors):
+    return SimpleNamespace(input_values=torch.tensor(np.asarray(window), dtype=torch.float32)[None])
+
+def motor():
+    engine = Wav2VecTranscriber.__new__(Wav2VecTranscriber)
+    engine.pipe = SimpleNamespace(model=ModeloLocal(), tokenizer=Tokenizer(), feature_extractor=extrator)
+    return engine
+
+def greedy(frames):
+    saida, anterior = [], None
+    for token in frames:
+        if token != anterior and token != 0:
+            saida.append(token)
+        anterior = token
+    return Tokenizer().decode(saida).split()
+
+def test_janelas_emendadas_iguais_a_uma_passada():
+    rng = np.random.default_rng(0)
+    frames = []
+    while len(frames) < 5000:  # 100s: várias janelas de 30s
+        for _ in range(rng.integers(2, 7)):
+            # Letras de um frame só: qualquer frame perdido ou repetido na emenda muda o texto
+            letra = int(rng.integers(2, len(VOCAB)))
+            if frames and frames[-1] == letra:
+                frames.append(0)
+            frames.append(letra)
+        frames.append(1)
+    samples = np.repeat(np.array(frames, dtype=np.float32), STRIDE)
+
+    n = (len(samples) - 400) // STRIDE + 1
+    esperado = greedy(frames[:n])
+
+    blocos = [samples[i:i + 70000] for i in range(0, len(samples), 70000)]
+    # Padrão do transcribe_long, do transcribe_stream e um contexto fora do passo de 320
+    for chunk_s, context_s in ((30, 5), (5.0, 1.0), (1.0, 0.25)):
+        palavras = " ".join(motor()._stream_ctc(iter(blocos), chunk_s, context_s)).split()
+        assert palavras == esperado, (chunk_s, context_s)